@@ -0,0 +1,338 @@
+"""Incrementally maintained viewing analytics per profile.
+
+Watch progress writes report how many seconds were added to a title. Those
+increments are coalesced in memory and flushed as ``$inc`` upserts into
+``viewing_rollups`` (one document per profile and UTC day) and
+``viewing_totals`` (one document per profile). Analytics reads touch only
+those documents, never ``watch_history``.
+
+Each flush has an id that is recorded on every document it increments and
+excluded by the update filter, so a failed flush can be retried whole
+without counting the writes that did succeed twice.
+"""
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from datetime import datetime, timedelta
+import asyncio
+import logging
+import os
+import time
+import uuid
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from .cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+ANALYTICS_FLUSH_INTERVAL_SECONDS = float(os.getenv("ANALYTICS_FLUSH_INTERVAL_SECONDS", "10"))
+SESSION_GAP_SECONDS = float(os.getenv("SESSION_GAP_SECONDS", "1800"))
+# Recent flush ids kept per document; a failed flush must be retried before
+# this many other flushes touch the same document
+ANALYTICS_FLUSH_IDS_KEPT = int(os.getenv("ANALYTICS_FLUSH_IDS_KEPT", "32"))
+
+DUPLICATE_KEY_ERROR = 11000
+
+WEEKDAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+
+# TMDB movie and TV genre names
+GENRE_NAMES = {
+    12: "Adventure",
+    14: "Fantasy",
+    16: "Animation",
+    18: "Drama",
+    27: "Horror",
+    28: "Action",
+    35: "Comedy",
+    36: "History",
+    37: "Western",
+    53: "Thriller",
+    80: "Crime",
+    99: "Documentary",
+    878: "Science Fiction",
+    9648: "Mystery",
+    10402: "Music",
+    10749: "Romance",
+    10751: "Family",
+    10752: "War",
+    10759: "Action & Adventure",
+    10762: "Kids",
+    10763: "News",
+    10764: "Reality",
+    10765: "Sci-Fi & Fantasy",
+    10766: "Soap",
+    10767: "Talk",
+    10768: "War & Politics",
+    10770: "TV Movie"
+}
+
+RollupKey = Tuple[str, str]
+
+def genre_name(genre_id: int) -> str:
+    return GENRE_NAMES.get(genre_id, f"Genre {genre_id}")
+
+def _new_delta(weekday: int) -> Dict[str, Any]:
+    return {"weekday": weekday, "seconds": 0, "sessions": 0, "titles": 0, "content": {}, "new_content": set()}
+
+def backfill_deltas(rows: Iterable[Dict[str, Any]]) -> Dict[RollupKey, Dict[str, Any]]:
+    """Rollup deltas rebuilt from watch history rows.
+
+    History keeps only the latest state of each title, so a row counts as one
+    session on the day it was last watched.
+    """
+    deltas: Dict[RollupKey, Dict[str, Any]] = {}
+    for row in rows:
+        watched = row["last_watched"]
+        key = (row["profile_id"], watched.strftime("%Y-%m-%d"))
+        delta = deltas.get(key)
+        if delta is None:
+            delta = deltas[key] = _new_delta(watched.weekday())
+        seconds = max(0, row.get("watch_time") or 0)
+        delta["seconds"] += seconds
+        delta["sessions"] += 1
+        delta["titles"] += 1
+        delta["content"][row["content_id"]] = delta["content"].get(row["content_id"], 0) + seconds
+        delta["new_content"].add(row["content_id"])
+    return deltas
+
+def rollup_updates(
+    deltas: Dict[RollupKey, Dict[str, Any]],
+    genres: Dict[str, List[int]],
+    now: datetime,
+    flush_id: Optional[str] = None,
+    upsert: bool = True
+) -> Tuple[List[UpdateOne], List[UpdateOne]]:
+    """$inc upserts for the daily rollups and the per-profile totals.
+
+    With flush_id, documents that already record it are left alone and the
+    others record it, which makes the updates safe to repeat.
+    """
+    applied_once: Dict[str, Any] = {}
+    recorded: Dict[str, Any] = {}
+    if flush_id is not None:
+        applied_once = {"flushes": {"$ne": flush_id}}
+        recorded = {"$push": {"flushes": {"$each": [flush_id], "$slice": -ANALYTICS_FLUSH_IDS_KEPT}}}
+    daily, totals = [], []
+    for (profile_id, day), delta in deltas.items():
+        increments: Dict[str, Any] = {
+            "watch_seconds": delta["seconds"],
+            "sessions": delta["sessions"],
+            "content_watched": delta["titles"]
+        }
+        for content_id, seconds in delta["content"].items():
+            for genre_id in genres.get(content_id, []):
+                increments[f"genres.{genre_id}.seconds"] = increments.get(f"genres.{genre_id}.seconds", 0) + seconds
+        for content_id in delta["new_content"]:
+            for genre_id in genres.get(content_id, []):
+                increments[f"genres.{genre_id}.views"] = increments.get(f"genres.{genre_id}.views", 0) + 1
+
+        daily.append(UpdateOne(
+            {"profile_id": profile_id, "day": day, **applied_once},
+            {"$inc": increments, "$set": {"weekday": delta["weekday"], "updated_at": now}, **recorded},
+            upsert=upsert
+        ))
+        totals.append(UpdateOne(
+            {"profile_id": profile_id, **applied_once},
+            {
+                "$inc": {**increments, f"weekdays.{delta['weekday']}": delta["seconds"]},
+                "$set": {"updated_at": now},
+                **recorded
+            },
+            upsert=upsert
+        ))
+    return daily, totals
+
+def summarize(documents: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Add up rollup or totals documents into one summary."""
+    summary = {"watch_seconds": 0, "sessions": 0, "content_watched": 0, "weekdays": {}, "genres": {}}
+    for document in documents:
+        summary["watch_seconds"] += document.get("watch_seconds", 0)
+        summary["sessions"] += document.get("sessions", 0)
+        summary["content_watched"] += document.get("content_watched", 0)
+        weekdays = document.get("weekdays")
+        if weekdays is None and "weekday" in document:
+            weekdays = {str(document["weekday"]): document.get("watch_seconds", 0)}
+        for weekday, seconds in (weekdays or {}).items():
+            summary["weekdays"][int(weekday)] = summary["weekdays"].get(int(weekday), 0) + seconds
+        for genre_id, values in (document.get("genres") or {}).items():
+            genre = summary["genres"].setdefault(int(genre_id), {"seconds": 0, "views": 0})
+            genre["seconds"] += values.get("seconds", 0)
+            genre["views"] += values.get("views", 0)
+    return summary
+
+def genre_preferences(summary: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """GenrePreference rows, most watched first; the score is the share of genre watch time."""
+    total = sum(genre["seconds"] for genre in summary["genres"].values())
+    preferences = [
+        {
+            "genre_id": genre_id,
+            "genre_name": genre_name(genre_id),
+            "watch_count": genre["views"],
+            "total_time": genre["seconds"] // 60,
+            "preference_score": round(genre["seconds"] / total, 4) if total else 0.0
+        }
+        for genre_id, genre in summary["genres"].items()
+    ]
+    preferences.sort(key=lambda genre: (-genre["preference_score"], -genre["watch_count"], genre["genre_id"]))
+    return preferences
+
+def viewing_stats(summary: Dict[str, Any], favorite_count: int = 5) -> Dict[str, Any]:
+    """ViewingStats fields from a summary."""
+    weekdays = summary["weekdays"]
+    most_watched = max(weekdays, key=lambda weekday: (weekdays[weekday], -weekday)) if weekdays else None
+    sessions = summary["sessions"]
+    return {
+        "total_watch_time": summary["watch_seconds"] // 60,
+        "content_watched": summary["content_watched"],
+        "favorite_genres": [
+            {"genre_id": genre["genre_id"], "genre_name": genre["genre_name"], "total_time": genre["total_time"]}
+            for genre in genre_preferences(summary)[:favorite_count]
+        ],
+        "most_watched_day": WEEKDAYS[most_watched] if most_watched is not None else "",
+        "avg_session_time": summary["watch_seconds"] // sessions // 60 if sessions else 0
+    }
+
+class ViewingAnalytics:
+    """Coalesces watch time increments and flushes them to the rollup collections.
+
+    A session starts when a profile reports progress after more than
+    ``session_gap`` seconds of silence. Content genres are resolved once per
+    flush with a single ``$in`` query. A batch that fails to write keeps its
+    flush id and is retried as is before newer increments.
+    """
+
+    def __init__(
+        self,
+        db: AsyncIOMotorDatabase,
+        flush_interval: float = ANALYTICS_FLUSH_INTERVAL_SECONDS,
+        session_gap: float = SESSION_GAP_SECONDS
+    ):
+        self.db = db
+        self.flush_interval = flush_interval
+        self.session_gap = session_gap
+        self._pending: Dict[RollupKey, Dict[str, Any]] = {}
+        # (flush id, deltas) of batches not yet known to be fully written
+        self._unapplied: List[Tuple[str, Dict[RollupKey, Dict[str, Any]]]] = []
+        self._last_seen = TTLCache(maxsize=100000, ttl=session_gap)
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+        self.tracked = 0
+        self.flushes = 0
+        self.flushed_rollups = 0
+
+    async def start(self) -> None:
+        """Start the periodic flush task."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flush task and write out pending increments."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    def track(self, profile_id: str, content_id: str, seconds: int, new_title: bool) -> None:
+        """Record watch time added to a title, and whether the title is new to the profile."""
+        self.tracked += 1
+        now = datetime.utcnow()
+        key = (profile_id, now.strftime("%Y-%m-%d"))
+        delta = self._pending.get(key)
+        if delta is None:
+            delta = self._pending[key] = _new_delta(now.weekday())
+
+        if self._last_seen.get(profile_id) is None:
+            delta["sessions"] += 1
+        self._last_seen.set(profile_id, time.monotonic())
+
+        if seconds > 0:
+            delta["seconds"] += seconds
+            delta["content"][content_id] = delta["content"].get(content_id, 0) + seconds
+        if new_title:
+            delta["titles"] += 1
+            delta["new_content"].add(content_id)
+
+    async def discard_profile(self, profile_id: str) -> None:
+        """Drop pending increments of a deleted profile, waiting out any flush in flight."""
+        for pending in [self._pending] + [batch for _, batch in self._unapplied]:
+            for key in [key for key in pending if key[0] == profile_id]:
+                del pending[key]
+        self._last_seen.delete(profile_id)
+        async with self._flush_lock:
+            pass
+
+    async def flush(self) -> int:
+        """Write pending increments; returns the number of daily rollups touched."""
+        async with self._flush_lock:
+            if self._pending:
+                self._unapplied.append((uuid.uuid4().hex, self._pending))
+                self._pending = {}
+            touched = 0
+            while self._unapplied:
+                flush_id, pending = self._unapplied[0]
+                touched += await self._write(flush_id, pending)
+                self._unapplied.pop(0)
+                self.flushes += 1
+            self.flushed_rollups += touched
+            return touched
+
+    async def _write(self, flush_id: str, pending: Dict[RollupKey, Dict[str, Any]]) -> int:
+        content_ids = list({
+            content_id for delta in pending.values()
+            for content_id in list(delta["content"]) + list(delta["new_content"])
+        })
+        content = await self.db.content.find(
+            {"id": {"$in": content_ids}},
+            {"_id": 0, "id": 1, "genre_ids": 1}
+        ).to_list(None)
+        genres = {item["id"]: item.get("genre_ids") or [] for item in content}
+        now = datetime.utcnow()
+        daily, totals = rollup_updates(pending, genres, now, flush_id)
+        for collection, updates in ((self.db.viewing_rollups, daily), (self.db.viewing_totals, totals)):
+            if not updates:
+                continue
+            try:
+                await collection.bulk_write(updates, ordered=False)
+            except BulkWriteError as error:
+                details = error.details
+                if details.get("writeConcernErrors") or any(
+                    write_error["code"] != DUPLICATE_KEY_ERROR for write_error in details.get("writeErrors", [])
+                ):
+                    raise
+                # An upsert hit an existing document: either it already
+                # records this flush or another worker created it first.
+                # Without upserts the update applies only in the second case.
+                plain = rollup_updates(pending, genres, now, flush_id, upsert=False)
+                await collection.bulk_write(plain[0] if updates is daily else plain[1], ordered=False)
+        return len(daily)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Flushing viewing analytics failed")
+
+    async def summary(self, profile_id: str, days: Optional[int] = None) -> Dict[str, Any]:
+        """Summary over all time from the totals document, or over the last days from rollups."""
+        if days is None:
+            totals = await self.db.viewing_totals.find_one({"profile_id": profile_id}, {"_id": 0})
+            return summarize([totals] if totals else [])
+        since = (datetime.utcnow() - timedelta(days=days - 1)).strftime("%Y-%m-%d")
+        rollups = await self.db.viewing_rollups.find(
+            {"profile_id": profile_id, "day": {"$gte": since}},
+            {"_id": 0}
+        ).to_list(None)
+        return summarize(rollups)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return pending size and flush counters."""
+        return {
+            "pending": len(self._pending),
+            "unapplied": len(self._unapplied),
+            "tracked": self.tracked,
+            "flushes": self.flushes,
+            "flushed_rollups": self.flushed_rollups
+        }
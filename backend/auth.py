@@ -1,25 +1,114 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Any, Callable, Dict, Optional, Tuple
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 from motor.motor_asyncio import AsyncIOMotorDatabase
+import asyncio
 import os
+import time
 from .models import User, TokenData
 from .database import get_database
+from .cache import cache_backend, model_codec
 
 # Configuration
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-this-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30 * 24 * 60  # 30 days
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "30"))
+USER_CACHE_MAX_SIZE = int(os.getenv("USER_CACHE_MAX_SIZE", "10000"))
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", "4"))
+PASSWORD_MAX_PENDING = int(os.getenv("PASSWORD_MAX_PENDING", "64"))
+PROFILE_OWNER_CACHE_TTL_SECONDS = float(os.getenv("PROFILE_OWNER_CACHE_TTL_SECONDS", "3600"))
+PROFILE_OWNER_CACHE_MAX_SIZE = int(os.getenv("PROFILE_OWNER_CACHE_MAX_SIZE", "100000"))
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing. Hashes created with a different cost are flagged by
+# needs_update and transparently rehashed on the next successful login.
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS
+)
+
+class PasswordWorkPool:
+    """Bounded thread pool for bcrypt work so it never blocks the event loop.
+    
+    bcrypt releases the GIL while hashing, so threads give real parallelism.
+    Requests beyond ``max_pending`` queued or running jobs are rejected with a
+    503 instead of piling up behind a login burst.
+    """
+    
+    def __init__(self, max_workers: int, max_pending: int):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="password-worker"
+        )
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+    
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Run func(*args) on the pool and await its result."""
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Authentication service busy, please retry",
+                headers={"Retry-After": "1"},
+            )
+        
+        self.pending += 1
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, func, *args)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.pending -= 1
+            self.completed += 1
+            self.total_seconds += elapsed
+            self.max_seconds = max(self.max_seconds, elapsed)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return queue depth and timing counters."""
+        return {
+            "workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "total_seconds": self.total_seconds,
+            "max_seconds": self.max_seconds
+        }
+    
+    def shutdown(self) -> None:
+        """Stop the worker threads."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+password_pool = PasswordWorkPool(PASSWORD_WORKERS, PASSWORD_MAX_PENDING)
 
 # HTTP Bearer scheme
 security = HTTPBearer()
 
+# Authenticated users keyed by user ID, shared by all workers
+user_cache = cache_backend.namespace(
+    "users", ttl=USER_CACHE_TTL_SECONDS, maxsize=USER_CACHE_MAX_SIZE, codec=model_codec(User)
+)
+
+# Owning user ID keyed by profile ID
+profile_owner_cache = cache_backend.namespace(
+    "profile_owners", ttl=PROFILE_OWNER_CACHE_TTL_SECONDS, maxsize=PROFILE_OWNER_CACHE_MAX_SIZE
+)
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash."""
     return pwd_context.verify(plain_password, hashed_password)
@@ -28,6 +117,17 @@ def get_password_hash(password: str) -> str:
     """Hash a password."""
     return pwd_context.hash(password)
 
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password on the password worker pool."""
+    return await password_pool.run(pwd_context.hash, password)
+
+async def verify_and_update_password(
+    plain_password: str,
+    hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    """Verify a password on the worker pool, returning a new hash if it needs an upgrade."""
+    return await password_pool.run(pwd_context.verify_and_update, plain_password, hashed_password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create a JWT access token."""
     to_encode = data.copy()
@@ -54,6 +154,19 @@ async def get_user_by_id(db: AsyncIOMotorDatabase, user_id: str) -> Optional[Use
         return User(**user_data)
     return None
 
+async def get_cached_user_by_id(db: AsyncIOMotorDatabase, user_id: str) -> Optional[User]:
+    """Get user by ID, serving repeated lookups from the user cache."""
+    user = await user_cache.get(user_id)
+    if user is None:
+        user = await get_user_by_id(db, user_id)
+        if user is not None:
+            await user_cache.set(user_id, user)
+    return user
+
+async def invalidate_cached_user(user_id: str) -> None:
+    """Drop a user from the cache after their document changes."""
+    await user_cache.delete(user_id)
+
 async def get_user_by_username(db: AsyncIOMotorDatabase, username: str) -> Optional[User]:
     """Get user by username."""
     user_data = await db.users.find_one({"username": username})
@@ -66,8 +179,18 @@ async def authenticate_user(db: AsyncIOMotorDatabase, email: str, password: str)
     user = await get_user_by_email(db, email)
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    valid, new_hash = await verify_and_update_password(password, user.hashed_password)
+    if not valid:
         return None
+    
+    # Rehash with the current cost parameters
+    if new_hash:
+        await db.users.update_one(
+            {"id": user.id},
+            {"$set": {"hashed_password": new_hash, "updated_at": datetime.utcnow()}}
+        )
+        user.hashed_password = new_hash
+        await invalidate_cached_user(user.id)
     return user
 
 async def get_current_user(
@@ -91,7 +214,7 @@ async def get_current_user(
     except JWTError:
         raise credentials_exception
     
-    user = await get_user_by_id(db, user_id=token_data.user_id)
+    user = await get_cached_user_by_id(db, user_id=token_data.user_id)
     if user is None:
         raise credentials_exception
     return user
@@ -109,4 +232,56 @@ def verify_admin_user(current_user: User = Depends(get_current_active_user)):
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions"
         )
-    return current_user
\ No newline at end of file
+    return current_user
+
+async def remember_profile_owner(profile_id: str, user_id: str) -> None:
+    """Record the owner of a newly created profile."""
+    await profile_owner_cache.set(profile_id, user_id)
+
+async def forget_profile_owner(profile_id: str) -> None:
+    """Drop a deleted profile from the ownership cache."""
+    await profile_owner_cache.delete(profile_id)
+
+async def user_owns_profile(db: AsyncIOMotorDatabase, user: User, profile_id: str) -> bool:
+    """Check profile ownership, using the cache and the user's profile list first."""
+    owner_id = await profile_owner_cache.get(profile_id)
+    if owner_id is None:
+        if profile_id in user.profiles:
+            owner_id = user.id
+        else:
+            profile = await db.profiles.find_one({"id": profile_id}, {"_id": 0, "user_id": 1})
+            if not profile:
+                return False
+            owner_id = profile["user_id"]
+        await profile_owner_cache.set(profile_id, owner_id)
+    return owner_id == user.id
+
+async def ensure_profile_access(db: AsyncIOMotorDatabase, user: User, profile_id: str) -> str:
+    """Raise 403 unless the user owns the profile."""
+    if not await user_owns_profile(db, user, profile_id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Profile not found or access denied"
+        )
+    return profile_id
+
+async def verify_profile_access(
+    profile_id: str,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
+) -> str:
+    """Dependency for routes acting on a profile's data; 403 if not owned."""
+    return await ensure_profile_access(db, current_user, profile_id)
+
+async def verify_profile_owner(
+    profile_id: str,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
+) -> str:
+    """Dependency for routes managing a profile itself; 404 if not owned."""
+    if not await user_owns_profile(db, current_user, profile_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile not found"
+        )
+    return profile_id
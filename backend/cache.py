@@ -0,0 +1,420 @@
+"""Caches shared by the API: an in-process TTL/LRU cache and pluggable backends.
+
+A CacheBackend holds named namespaces, each with its own TTL, size bound and
+counters. MemoryCacheBackend keeps everything in this process.
+RedisCacheBackend stores entries in a Redis-protocol server, so every
+uvicorn worker sees the same values. It also keeps a short-lived local copy
+of hot keys, which invalidations published on a pub/sub channel drop in
+every worker. Shared values are stored as JSON; each namespace has a codec
+that turns its values into JSON-compatible data and back, so nothing read
+from the shared server is ever unpickled.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Callable, Dict, Hashable, Iterable, List, NamedTuple, Optional, Type
+import orjson
+from pydantic import BaseModel
+from .serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+CACHE_KEY_PREFIX = os.getenv("CACHE_KEY_PREFIX", "netflix")
+# Upper bound on how long a worker serves its local copy of a shared entry
+CACHE_NEAR_TTL_SECONDS = float(os.getenv("CACHE_NEAR_TTL_SECONDS", "5"))
+
+class TTLCache:
+    """Bounded in-process cache with per-entry expiry and LRU eviction."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for key, or default if missing or expired."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store value under key, evicting the least recently used entries."""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        """Remove key from the cache if present."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """Remove every entry."""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit, miss and eviction counters."""
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
+
+_MISSING = object()
+
+InvalidationCallback = Callable[[Optional[List[Hashable]]], None]
+
+class CacheCodec(NamedTuple):
+    """Converts a namespace's values to JSON-compatible data and back."""
+    encode: Callable[[Any], Any]
+    decode: Callable[[Any], Any]
+
+def _unchanged(value: Any) -> Any:
+    return value
+
+# For values that are already plain JSON data
+JSON_CODEC = CacheCodec(_unchanged, _unchanged)
+
+def model_codec(model: Type[BaseModel]) -> CacheCodec:
+    """Codec for Pydantic model instances; decoding validates the data again."""
+    return CacheCodec(lambda value: value.dict(), model.model_validate)
+
+class CacheNamespace:
+    """Handle on one namespace of a backend; keys never collide across namespaces."""
+
+    def __init__(
+        self,
+        backend: "CacheBackend",
+        name: str,
+        ttl: float,
+        maxsize: int,
+        codec: CacheCodec = JSON_CODEC
+    ):
+        self.backend = backend
+        self.name = name
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.codec = codec
+        self.hits = 0
+        self.misses = 0
+        self.sets = 0
+        self.invalidations = 0
+        self._listeners: List[InvalidationCallback] = []
+
+    async def get(self, key: Hashable, default: Any = None) -> Any:
+        found = await self.get_many([key])
+        return found.get(key, default)
+
+    async def get_many(self, keys: Iterable[Hashable]) -> Dict[Hashable, Any]:
+        """Values of the keys that are cached; missing keys are left out."""
+        keys = list(keys)
+        found = await self.backend.get_many(self, keys) if keys else {}
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    async def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        await self.set_many({key: value}, ttl)
+
+    async def set_many(self, items: Dict[Hashable, Any], ttl: Optional[float] = None) -> None:
+        if items:
+            self.sets += len(items)
+            await self.backend.set_many(self, items, self.ttl if ttl is None else ttl)
+
+    async def delete(self, key: Hashable) -> None:
+        await self.delete_many([key])
+
+    async def delete_many(self, keys: Iterable[Hashable]) -> None:
+        """Remove keys here and in every other process sharing the backend."""
+        keys = list(keys)
+        if keys:
+            await self.backend.invalidate(self, keys)
+
+    async def clear(self) -> None:
+        """Remove every key of the namespace everywhere."""
+        await self.backend.invalidate(self, None)
+
+    def on_invalidate(self, callback: InvalidationCallback) -> None:
+        """Call callback with the invalidated keys (None for a clear), whichever process invalidated.
+
+        Invalidations from other processes pass the keys as stored strings.
+        """
+        self._listeners.append(callback)
+
+    def _notify(self, keys: Optional[List[Hashable]]) -> None:
+        self.invalidations += 1
+        for callback in self._listeners:
+            try:
+                callback(keys)
+            except Exception:
+                logger.exception("Cache invalidation listener for %s failed", self.name)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit ratio, eviction and invalidation counters."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "sets": self.sets,
+            "evictions": self.backend.evictions(self),
+            "invalidations": self.invalidations
+        }
+
+class CacheBackend(ABC):
+    """Storage behind cache namespaces; subclasses implement get_many, set_many and invalidate."""
+
+    def __init__(self):
+        self.namespaces: Dict[str, CacheNamespace] = {}
+
+    def namespace(self, name: str, ttl: float, maxsize: int, codec: CacheCodec = JSON_CODEC) -> CacheNamespace:
+        """Create or return the named namespace; codec says how shared backends store its values."""
+        if name not in self.namespaces:
+            self.namespaces[name] = CacheNamespace(self, name, ttl, maxsize, codec)
+            self._register(self.namespaces[name])
+        return self.namespaces[name]
+
+    def _register(self, namespace: CacheNamespace) -> None:
+        pass
+
+    async def start(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    @abstractmethod
+    async def get_many(self, namespace: CacheNamespace, keys: List[Hashable]) -> Dict[Hashable, Any]:
+        """Values of the cached keys; missing keys are left out."""
+
+    @abstractmethod
+    async def set_many(self, namespace: CacheNamespace, items: Dict[Hashable, Any], ttl: float) -> None:
+        """Store items for ttl seconds."""
+
+    @abstractmethod
+    async def invalidate(self, namespace: CacheNamespace, keys: Optional[List[Hashable]]) -> None:
+        """Remove keys, or every key when None, and notify the namespace listeners."""
+
+    def evictions(self, namespace: CacheNamespace) -> int:
+        return 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return counters per namespace."""
+        return {name: namespace.stats() for name, namespace in self.namespaces.items()}
+
+class MemoryCacheBackend(CacheBackend):
+    """Namespaces backed by TTLCache instances in this process."""
+
+    def __init__(self):
+        super().__init__()
+        self._caches: Dict[str, TTLCache] = {}
+
+    def _register(self, namespace: CacheNamespace) -> None:
+        self._caches[namespace.name] = TTLCache(maxsize=namespace.maxsize, ttl=namespace.ttl)
+
+    async def get_many(self, namespace: CacheNamespace, keys: List[Hashable]) -> Dict[Hashable, Any]:
+        cache = self._caches[namespace.name]
+        found = {}
+        for key in keys:
+            value = cache.get(key, _MISSING)
+            if value is not _MISSING:
+                found[key] = value
+        return found
+
+    async def set_many(self, namespace: CacheNamespace, items: Dict[Hashable, Any], ttl: float) -> None:
+        cache = self._caches[namespace.name]
+        for key, value in items.items():
+            cache.set(key, value, ttl)
+
+    async def invalidate(self, namespace: CacheNamespace, keys: Optional[List[Hashable]]) -> None:
+        cache = self._caches[namespace.name]
+        if keys is None:
+            cache.clear()
+        else:
+            for key in keys:
+                cache.delete(key)
+        namespace._notify(keys)
+
+    def evictions(self, namespace: CacheNamespace) -> int:
+        return self._caches[namespace.name].evictions
+
+class RedisCacheBackend(CacheBackend):
+    """Namespaces stored in a Redis-protocol server and shared by all workers.
+
+    ``client`` is a ``redis.asyncio.Redis`` or anything with the same
+    get/set/pipeline/pubsub subset, such as a local fake in tests. Values are
+    stored as JSON through the namespace codec; keys are ``prefix:namespace:key``. Each namespace keeps a set of
+    its keys so clear() needs no SCAN. Redis applies its own eviction policy;
+    evictions counted here are those of the local copies.
+    """
+
+    def __init__(
+        self,
+        client: Any = None,
+        url: str = CACHE_REDIS_URL,
+        prefix: str = CACHE_KEY_PREFIX,
+        near_ttl: float = CACHE_NEAR_TTL_SECONDS
+    ):
+        super().__init__()
+        if client is None:
+            try:
+                import redis.asyncio as redis
+            except ImportError as exc:
+                raise RuntimeError("CACHE_BACKEND=redis requires the redis package") from exc
+            client = redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+        self.near_ttl = near_ttl
+        self.channel = f"{prefix}:cache-invalidations"
+        self.origin = uuid.uuid4().hex
+        self._near: Dict[str, TTLCache] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def _register(self, namespace: CacheNamespace) -> None:
+        self._near[namespace.name] = TTLCache(maxsize=namespace.maxsize, ttl=min(namespace.ttl, self.near_ttl))
+
+    def _key(self, namespace: CacheNamespace, key: Hashable) -> str:
+        return f"{self.prefix}:{namespace.name}:{key if isinstance(key, str) else repr(key)}"
+
+    def _index(self, namespace: CacheNamespace) -> str:
+        return f"{self.prefix}:{namespace.name}:__keys__"
+
+    async def start(self) -> None:
+        """Start listening for invalidations from other workers."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.client.aclose()
+
+    async def get_many(self, namespace: CacheNamespace, keys: List[Hashable]) -> Dict[Hashable, Any]:
+        near = self._near[namespace.name]
+        found = {}
+        remote = {}
+        for key in keys:
+            stored_key = self._key(namespace, key)
+            value = near.get(stored_key, _MISSING)
+            if value is _MISSING:
+                remote[stored_key] = key
+            else:
+                found[key] = value
+        if remote:
+            values = await self.client.mget(list(remote))
+            for (stored_key, key), data in zip(remote.items(), values):
+                if data is not None:
+                    found[key] = namespace.codec.decode(orjson.loads(data))
+                    near.set(stored_key, found[key])
+        return found
+
+    async def set_many(self, namespace: CacheNamespace, items: Dict[Hashable, Any], ttl: float) -> None:
+        near = self._near[namespace.name]
+        stored = {self._key(namespace, key): value for key, value in items.items()}
+        index = self._index(namespace)
+        expire = max(1, int(ttl + 0.999))
+        async with self.client.pipeline(transaction=False) as pipe:
+            for stored_key, value in stored.items():
+                pipe.set(stored_key, dumps(namespace.codec.encode(value)), ex=expire)
+            pipe.sadd(index, *stored)
+            pipe.expire(index, expire)
+            await pipe.execute()
+        for stored_key, value in stored.items():
+            near.set(stored_key, value, min(ttl, self.near_ttl))
+
+    async def invalidate(self, namespace: CacheNamespace, keys: Optional[List[Hashable]]) -> None:
+        stored_keys = None if keys is None else [self._key(namespace, key) for key in keys]
+        if stored_keys is None:
+            index = self._index(namespace)
+            await self.client.delete(index, *await self.client.smembers(index))
+        else:
+            await self.client.delete(*stored_keys)
+        self._drop_near(namespace, stored_keys)
+        namespace._notify(keys)
+        await self.client.publish(self.channel, json.dumps({
+            "origin": self.origin,
+            "namespace": namespace.name,
+            "keys": stored_keys
+        }))
+
+    def _drop_near(self, namespace: CacheNamespace, stored_keys: Optional[List[str]]) -> None:
+        near = self._near[namespace.name]
+        if stored_keys is None:
+            near.clear()
+        else:
+            for stored_key in stored_keys:
+                near.delete(stored_key)
+
+    def _apply_message(self, data: Any) -> None:
+        """Drop local copies another worker invalidated; listeners get the stored key strings."""
+        message = json.loads(data)
+        namespace = self.namespaces.get(message["namespace"])
+        if namespace is None or message["origin"] == self.origin:
+            return
+        self._drop_near(namespace, message["keys"])
+        namespace._notify(message["keys"])
+
+    async def _listen(self) -> None:
+        while True:
+            pubsub = self.client.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                # Messages may have been missed while disconnected
+                for namespace in self.namespaces.values():
+                    self._near[namespace.name].clear()
+                async for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        self._apply_message(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Cache invalidation subscription failed; reconnecting")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+    def evictions(self, namespace: CacheNamespace) -> int:
+        return self._near[namespace.name].evictions
+
+def create_cache_backend(kind: str = CACHE_BACKEND) -> CacheBackend:
+    """Backend selected by CACHE_BACKEND: ``memory`` or ``redis``."""
+    if kind == "redis":
+        return RedisCacheBackend()
+    if kind == "memory":
+        return MemoryCacheBackend()
+    raise ValueError(f"Unknown CACHE_BACKEND {kind!r}")
+
+cache_backend = create_cache_backend()
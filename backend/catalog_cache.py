@@ -0,0 +1,154 @@
+"""Shared cache for the profile-independent part of catalog responses."""
+from typing import Any, Dict, Hashable, List, NamedTuple, Optional, Tuple
+import hashlib
+import os
+from fastapi import Response, status
+import orjson
+from .cache import CacheBackend, CacheCodec, cache_backend
+from .serialization import dumps
+
+CATALOG_CACHE_MAX_SIZE = int(os.getenv("CATALOG_CACHE_MAX_SIZE", "2000"))
+CATALOG_CACHE_TTL_SECONDS = float(os.getenv("CATALOG_CACHE_TTL_SECONDS", "300"))
+
+class CatalogEntry(NamedTuple):
+    """A cached catalog response: data for overlays, bytes and ETag for reuse."""
+    data: Any
+    body: bytes
+    etag: str
+    next_cursor: Optional[str] = None
+
+# Shared backends store the body only; data is the body parsed back
+CATALOG_ENTRY_CODEC = CacheCodec(
+    lambda entry: {"body": entry.body.decode(), "etag": entry.etag, "next_cursor": entry.next_cursor},
+    lambda value: CatalogEntry(
+        orjson.loads(value["body"]), value["body"].encode(), value["etag"], value["next_cursor"]
+    )
+)
+
+def make_etag(body: bytes) -> str:
+    """Strong ETag for a response body."""
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches etag (weak comparison, RFC 9110)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+def conditional_response(
+    body: bytes,
+    etag: str,
+    if_none_match: Optional[str],
+    headers: Optional[Dict[str, str]] = None,
+    shared: bool = True
+) -> Response:
+    """200 with body, or 304 when the client already holds this ETag.
+
+    Shared responses may be stored by CDNs; profile-specific ones only by the client.
+    """
+    headers = {
+        **(headers or {}),
+        "ETag": etag,
+        "Cache-Control": "public, no-cache" if shared else "private, no-cache"
+    }
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+class CatalogCache:
+    """LRU caches of catalog pages and single items keyed by normalized parameters.
+
+    Any content write clears every page, since ratings change page order,
+    and the written item. A fill started before an invalidation is dropped
+    rather than stored, using a generation counter that also advances when
+    another worker invalidates.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = CATALOG_CACHE_MAX_SIZE,
+        ttl: float = CATALOG_CACHE_TTL_SECONDS,
+        backend: CacheBackend = cache_backend
+    ):
+        self.pages = backend.namespace("catalog_pages", ttl=ttl, maxsize=maxsize, codec=CATALOG_ENTRY_CODEC)
+        self.items = backend.namespace("catalog_items", ttl=ttl, maxsize=maxsize, codec=CATALOG_ENTRY_CODEC)
+        self.pages.on_invalidate(self._advance_generation)
+        self.generation = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def page_key(
+        content_type: Optional[str],
+        genre_ids: Optional[List[int]],
+        limit: int,
+        cursor: Optional[str],
+        skip: int
+    ) -> Tuple[Hashable, ...]:
+        """Cache key for a catalog page; genre order and duplicates do not matter."""
+        return (
+            getattr(content_type, "value", content_type),
+            tuple(sorted(set(genre_ids))) if genre_ids else (),
+            limit,
+            cursor,
+            0 if cursor else skip
+        )
+
+    async def get_page(self, key: Hashable) -> Optional[CatalogEntry]:
+        return await self.pages.get(key)
+
+    async def get_item(self, content_id: str) -> Optional[CatalogEntry]:
+        return await self.items.get(content_id)
+
+    async def set_page(
+        self,
+        key: Hashable,
+        data: List[Dict[str, Any]],
+        next_cursor: Optional[str],
+        generation: int
+    ) -> CatalogEntry:
+        entry = self._entry(data, next_cursor)
+        if generation == self.generation:
+            await self.pages.set(key, entry)
+        return entry
+
+    async def set_item(self, content_id: str, data: Dict[str, Any], generation: int) -> CatalogEntry:
+        entry = self._entry(data)
+        if generation == self.generation:
+            await self.items.set(content_id, entry)
+        return entry
+
+    @staticmethod
+    def _entry(data: Any, next_cursor: Optional[str] = None) -> CatalogEntry:
+        body = dumps(data)
+        return CatalogEntry(data, body, make_etag(body), next_cursor)
+
+    def _advance_generation(self, keys: Optional[List[Hashable]]) -> None:
+        self.generation += 1
+
+    async def invalidate(self, content_id: Optional[str] = None) -> None:
+        """Drop cached responses after a content write; all items if no ID is given."""
+        self.generation += 1
+        self.invalidations += 1
+        await self.pages.clear()
+        if content_id is None:
+            await self.items.clear()
+        else:
+            await self.items.delete(content_id)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return per-cache counters."""
+        return {
+            "pages": self.pages.stats(),
+            "items": self.items.stats(),
+            "invalidations": self.invalidations
+        }
+
+catalog_cache = CatalogCache()
@@ -0,0 +1,420 @@
+"""Maintenance commands for the Netflix Clone backend.
+
+Run with ``python -m backend.cli --help``.
+"""
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+from datetime import datetime
+from pathlib import Path
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+import asyncio
+import multiprocessing
+import os
+import time
+import typer
+from bson import decode
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+from pymongo import InsertOne, DeleteMany, MongoClient
+from .database import mongo_url, db_name
+from .analytics import backfill_deltas, rollup_updates
+from .cache import CACHE_BACKEND, create_cache_backend
+from .catalog_cache import CATALOG_CACHE_TTL_SECONDS, CatalogCache
+from .collaborative import REVIEW_PROJECTION, RatingMatrix
+from .content_index import CONTENT_INDEX_BLOCK_SIZE, CONTENT_INDEX_PATH, FEATURE_PROJECTION, ContentSimilarityIndex
+from .ingest import Checkpoint, detect_format, read_csv, read_jsonl, upsert_requests, validate_batch, write_batch
+from .projections import (
+    CONTENT_CARD_PROJECTION,
+    CONTENT_DETAIL_PROJECTION,
+    CONTENT_ENGINE_PROJECTION,
+    WATCH_HISTORY_FIELDS,
+    content_lookup_stages
+)
+from .recommendation_engine import build_recommendation_documents
+from .reviews import AGGREGATE_PROJECTION, expected_aggregates, reaction_reconcile_requests, reconcile_requests
+from .trending import TRENDING_SNAPSHOT_ID, trending_pipeline
+
+cli = typer.Typer(help="Netflix Clone maintenance commands.")
+
+def get_sync_database(url: str = mongo_url, name: str = db_name):
+    """Blocking PyMongo handle for batch jobs."""
+    return MongoClient(url)[name]
+
+def chunked(iterable, size: int) -> Iterator[List[Any]]:
+    """Yield lists of up to size items."""
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+# Read-only state shared by batch workers. Set once per worker process by
+# _init_recommendation_worker; with the fork start method the matrices are
+# inherited copy-on-write rather than pickled.
+_worker_state: Dict[str, Any] = {}
+
+def _init_recommendation_worker(
+    ratings: RatingMatrix,
+    content_index: ContentSimilarityIndex,
+    trending: List[str],
+    url: str,
+    name: str,
+    write_batch_size: int
+) -> None:
+    _worker_state.update(
+        ratings=ratings,
+        content_index=content_index,
+        trending=trending,
+        db=get_sync_database(url, name),
+        write_batch_size=write_batch_size
+    )
+
+def _recommend_batch(profile_ids: List[str]) -> int:
+    """Compute and store recommendations for a batch of profiles."""
+    db = _worker_state["db"]
+    ratings: RatingMatrix = _worker_state["ratings"]
+    content_index: ContentSimilarityIndex = _worker_state["content_index"]
+    trending: List[str] = _worker_state["trending"]
+
+    query = {"profile_id": {"$in": profile_ids}}
+    watched: Dict[str, set] = {profile_id: set() for profile_id in profile_ids}
+    rated: Dict[str, Dict[str, float]] = {profile_id: {} for profile_id in profile_ids}
+    for item in db.watch_history.find(query, {"_id": 0, "profile_id": 1, "content_id": 1}):
+        watched[item["profile_id"]].add(item["content_id"])
+    for review in db.reviews.find(query, REVIEW_PROJECTION):
+        rated[review["profile_id"]][review["content_id"]] = review["rating"]
+
+    documents = []
+    for profile_id in profile_ids:
+        user_ratings = rated[profile_id]
+        user_content_ids = list(watched[profile_id] | set(user_ratings))
+
+        content_based = content_index.recommend(user_content_ids, 15) if user_content_ids else []
+        if not content_based:
+            content_based = trending[:15]
+        collaborative = ratings.recommend(profile_id, user_ratings, 15) if user_ratings else trending[:15]
+
+        documents.extend(build_recommendation_documents(
+            profile_id, content_based, collaborative, trending[:10]
+        ))
+
+    # Ordered writes: the new rows land before the old ones are removed
+    requests = [InsertOne(document) for document in documents]
+    requests.append(DeleteMany({
+        "profile_id": {"$in": profile_ids},
+        "id": {"$nin": [document["id"] for document in documents]}
+    }))
+    for batch in chunked(requests, _worker_state["write_batch_size"]):
+        db.recommendations.bulk_write(batch, ordered=True)
+
+    return len(profile_ids)
+
+def _load_content_index(db, rebuild: bool) -> ContentSimilarityIndex:
+    if not rebuild and os.path.exists(CONTENT_INDEX_PATH):
+        return ContentSimilarityIndex.load(CONTENT_INDEX_PATH)
+    index = ContentSimilarityIndex.from_documents(db.content.find({}, FEATURE_PROJECTION))
+    index.save(CONTENT_INDEX_PATH)
+    return index
+
+@cli.command("build-content-index")
+def build_content_index(
+    n_components: int = typer.Option(128, help="SVD dimensions per item."),
+    n_neighbours: int = typer.Option(50, help="Neighbours precomputed per item."),
+    block_size: int = typer.Option(
+        CONTENT_INDEX_BLOCK_SIZE, help="Similarity rows computed at once; lower it to bound memory."
+    )
+):
+    """Build the content similarity index and save it for the API servers."""
+    db = get_sync_database()
+    started = time.perf_counter()
+    index = ContentSimilarityIndex.from_documents(
+        db.content.find({}, FEATURE_PROJECTION),
+        n_components=n_components,
+        n_neighbours=n_neighbours,
+        block_size=block_size
+    )
+    index.save(CONTENT_INDEX_PATH)
+    typer.echo(
+        f"Indexed {len(index)} items in {time.perf_counter() - started:.1f}s "
+        f"-> {CONTENT_INDEX_PATH}"
+    )
+
+@cli.command("recommend-all")
+def recommend_all(
+    workers: int = typer.Option(os.cpu_count() or 1, help="Worker processes."),
+    batch_size: int = typer.Option(500, help="Profiles per worker task."),
+    write_batch_size: int = typer.Option(1000, help="Write requests per bulk_write call."),
+    rebuild_index: bool = typer.Option(False, help="Rebuild the content index first.")
+):
+    """Regenerate stored recommendations for every profile."""
+    db = get_sync_database()
+    started = time.perf_counter()
+
+    ratings = RatingMatrix()
+    ratings.load(
+        (review["profile_id"], review["content_id"], review["rating"])
+        for review in db.reviews.find({}, REVIEW_PROJECTION, batch_size=10000)
+    )
+    content_index = _load_content_index(db, rebuild_index)
+    snapshot = db.trending.find_one({"id": TRENDING_SNAPSHOT_ID}, {"_id": 0, "content_ids": 1})
+    if snapshot and len(snapshot["content_ids"]) >= 15:
+        trending = snapshot["content_ids"][:15]
+    else:
+        trending = [item["id"] for item in db.content.aggregate(trending_pipeline(15))]
+    typer.echo(
+        f"Loaded {ratings.shape[0]}x{ratings.shape[1]} rating matrix and "
+        f"{len(content_index)} indexed items in {time.perf_counter() - started:.1f}s"
+    )
+
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in methods else None)
+    profiles = (
+        profile["id"]
+        for profile in db.profiles.find({}, {"_id": 0, "id": 1}, batch_size=batch_size)
+    )
+
+    done = 0
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=context,
+        initializer=_init_recommendation_worker,
+        initargs=(ratings, content_index, trending, mongo_url, db_name, write_batch_size)
+    ) as executor:
+        in_flight: set = set()
+        for batch in chunked(profiles, batch_size):
+            # Keep a bounded number of batches queued so profiles are streamed
+            if len(in_flight) >= workers * 2:
+                finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                done += sum(future.result() for future in finished)
+            in_flight.add(executor.submit(_recommend_batch, batch))
+        done += sum(future.result() for future in wait(in_flight).done)
+
+    elapsed = time.perf_counter() - started
+    typer.echo(f"Generated recommendations for {done} profiles in {elapsed:.1f}s")
+
+@cli.command("ingest-content")
+def ingest_content(
+    path: Path = typer.Argument(
+        ..., exists=True, dir_okay=False, readable=True, help="Catalog dump, .jsonl or .csv."
+    ),
+    file_format: str = typer.Option("auto", "--format", help="jsonl, csv or auto (by extension)."),
+    batch_size: int = typer.Option(1000, help="Rows validated and written per bulk_write."),
+    checkpoint: str = typer.Option("", help="Checkpoint file; defaults to PATH.checkpoint."),
+    resume: bool = typer.Option(True, help="Continue from the checkpoint if one exists."),
+    rejects: str = typer.Option("", help="Append validation errors to this file.")
+):
+    """Upsert content from a catalog dump, keyed on tmdb_id.
+    
+    The file is streamed batch by batch. Each batch is written with an
+    unordered bulk_write while the next one is read and validated, and the
+    checkpoint is saved once a batch is written.
+    """
+    source = str(path)
+    file_format = detect_format(source) if file_format == "auto" else file_format
+    if file_format not in ("jsonl", "csv"):
+        raise typer.BadParameter("format must be jsonl, csv or auto")
+
+    progress = Checkpoint(checkpoint or source + ".checkpoint", source)
+    try:
+        resumed = resume and progress.load()
+    except ValueError as exc:
+        raise typer.BadParameter(f"{exc}; pass --no-resume to start over") from exc
+    if resumed:
+        typer.echo(f"Resuming after {progress.rows} rows")
+    rows = read_jsonl(source, progress.offset) if file_format == "jsonl" else read_csv(source, progress.rows)
+
+    collection = get_sync_database().content
+    totals = {"read": 0, "invalid": 0, "inserted": 0, "matched": 0, "failed": 0}
+    reject_file = open(rejects, "a") if rejects else None
+    started = time.perf_counter()
+
+    def finish(pending, read_to: int, offset: int) -> None:
+        """Wait for a batch write, then record it and save the checkpoint."""
+        for key, value in pending.result().items():
+            totals[key] += value
+        progress.save(read_to, offset)
+
+    try:
+        with ThreadPoolExecutor(max_workers=1) as writer:
+            pending = None
+            read = progress.rows
+            reported = 0.0
+            for batch in chunked(rows, batch_size):
+                offset = batch[-1][0]
+                read += len(batch)
+                documents, errors = validate_batch([row for _, row in batch])
+                totals["read"] += len(batch)
+                totals["invalid"] += len(errors)
+                if reject_file:
+                    reject_file.writelines(error + "\n" for error in errors)
+
+                if pending is not None:
+                    finish(*pending)
+                future = writer.submit(write_batch, collection, upsert_requests(documents))
+                pending = (future, read, offset)
+
+                elapsed = time.perf_counter() - started
+                if elapsed - reported >= 5:
+                    reported = elapsed
+                    typer.echo(f"{totals['read']} rows, {totals['read'] / elapsed:.0f} rows/s", err=True)
+            if pending is not None:
+                finish(*pending)
+    finally:
+        if reject_file:
+            reject_file.close()
+
+    elapsed = time.perf_counter() - started
+    typer.echo(
+        f"Read {totals['read']} rows in {elapsed:.1f}s ({totals['read'] / max(elapsed, 1e-9):.0f} rows/s): "
+        f"{totals['inserted']} inserted, {totals['matched']} updated, "
+        f"{totals['invalid']} invalid, {totals['failed']} failed writes"
+    )
+    progress.clear()
+    if totals["inserted"] or totals["matched"]:
+        invalidate_catalog_caches()
+
+def invalidate_catalog_caches() -> None:
+    """Clear the catalog caches the API workers share, so written content shows up at once."""
+    if CACHE_BACKEND == "memory":
+        typer.echo(
+            f"API workers cache catalog pages in memory; changes show within {CATALOG_CACHE_TTL_SECONDS:.0f}s",
+            err=True
+        )
+        return
+
+    async def invalidate():
+        backend = create_cache_backend()
+        try:
+            await CatalogCache(backend=backend).invalidate()
+        finally:
+            await backend.close()
+
+    asyncio.run(invalidate())
+    typer.echo("Cleared the shared catalog caches")
+
+@cli.command("reconcile-ratings")
+def reconcile_ratings(
+    batch_size: int = typer.Option(1000, help="Repairs per bulk_write call."),
+    dry_run: bool = typer.Option(False, help="Only count drifted documents.")
+):
+    """Recompute content rating aggregates and review reaction counts, fixing drift."""
+    db = get_sync_database()
+    started = time.perf_counter()
+
+    expected = expected_aggregates(
+        db.reviews.find({}, {"_id": 0, "content_id": 1, "rating": 1, "review_text": 1}, batch_size=10000)
+    )
+    counts: Dict[str, Dict[str, int]] = {}
+    for item in db.review_reactions.aggregate([
+        {"$group": {"_id": {"review_id": "$review_id", "reaction_type": "$reaction_type"}, "count": {"$sum": 1}}}
+    ]):
+        counts.setdefault(item["_id"]["review_id"], {})[item["_id"]["reaction_type"]] = item["count"]
+
+    repairs = [
+        (db.content, reconcile_requests(db.content.find({}, AGGREGATE_PROJECTION, batch_size=10000), expected)),
+        (db.reviews, reaction_reconcile_requests(
+            db.reviews.find({}, {"_id": 0, "id": 1, "likes": 1, "dislikes": 1}, batch_size=10000), counts
+        ))
+    ]
+    for collection, requests in repairs:
+        fixed = 0
+        for batch in chunked(requests, batch_size):
+            fixed += len(batch)
+            if not dry_run:
+                collection.bulk_write(batch, ordered=False)
+        verb = "drifted" if dry_run else "repaired"
+        typer.echo(f"{collection.name}: {fixed} documents {verb}")
+
+    typer.echo(f"Finished in {time.perf_counter() - started:.1f}s")
+
+@cli.command("backfill-analytics")
+def backfill_analytics(
+    batch_size: int = typer.Option(500, help="Profiles rebuilt per batch."),
+    profile_id: str = typer.Option("", help="Only rebuild this profile.")
+):
+    """Rebuild viewing rollups and totals from watch history."""
+    db = get_sync_database()
+    started = time.perf_counter()
+    query = {"id": profile_id} if profile_id else {}
+    profiles = (profile["id"] for profile in db.profiles.find(query, {"_id": 0, "id": 1}, batch_size=10000))
+
+    rebuilt = rollups = 0
+    for batch in chunked(profiles, batch_size):
+        rows = list(db.watch_history.find(
+            {"profile_id": {"$in": batch}},
+            {"_id": 0, "profile_id": 1, "content_id": 1, "watch_time": 1, "last_watched": 1}
+        ))
+        content_ids = list({row["content_id"] for row in rows})
+        genres = {
+            item["id"]: item.get("genre_ids") or []
+            for item in db.content.find({"id": {"$in": content_ids}}, {"_id": 0, "id": 1, "genre_ids": 1})
+        }
+        daily, totals = rollup_updates(backfill_deltas(rows), genres, datetime.utcnow())
+
+        db.viewing_rollups.delete_many({"profile_id": {"$in": batch}})
+        db.viewing_totals.delete_many({"profile_id": {"$in": batch}})
+        if daily:
+            db.viewing_rollups.bulk_write(daily, ordered=False)
+            db.viewing_totals.bulk_write(totals, ordered=False)
+        rebuilt += len(batch)
+        rollups += len(daily)
+        typer.echo(f"Rebuilt {rebuilt} profiles ({rollups} daily rollups)")
+
+    typer.echo(f"Finished in {time.perf_counter() - started:.1f}s")
+
+def _measure(documents: Iterable[RawBSONDocument]) -> Tuple[int, int, float]:
+    """Count, total BSON bytes and decode seconds of raw documents."""
+    raw = [document.raw for document in documents]
+    started = time.perf_counter()
+    for data in raw:
+        decode(data)
+    return len(raw), sum(len(data) for data in raw), time.perf_counter() - started
+
+@cli.command("bench-projections")
+def bench_projections(
+    limit: int = typer.Option(1000, help="Documents read per query."),
+    profile_id: str = typer.Option("", help="Profile for the watch history join; defaults to the most active.")
+):
+    """Compare bytes and decode time of full documents against projections."""
+    db = get_sync_database()
+    raw_options = CodecOptions(document_class=RawBSONDocument)
+    content = db.content.with_options(codec_options=raw_options)
+    watch_history = db.watch_history.with_options(codec_options=raw_options)
+
+    if not profile_id:
+        busiest = list(db.watch_history.aggregate([
+            {"$group": {"_id": "$profile_id", "count": {"$sum": 1}}},
+            {"$sort": {"count": -1}},
+            {"$limit": 1}
+        ]))
+        profile_id = busiest[0]["_id"] if busiest else ""
+
+    lookup = {"$lookup": {"from": "content", "localField": "content_id", "foreignField": "id", "as": "content"}}
+    history = [{"$match": {"profile_id": profile_id}}, {"$limit": limit}]
+    cases = [
+        ("content full", lambda: content.find({}).limit(limit)),
+        ("content detail", lambda: content.find({}, CONTENT_DETAIL_PROJECTION).limit(limit)),
+        ("content card", lambda: content.find({}, CONTENT_CARD_PROJECTION).limit(limit)),
+        ("content engine", lambda: content.find({}, CONTENT_ENGINE_PROJECTION).limit(limit)),
+        ("watch history full join", lambda: watch_history.aggregate(history + [lookup, {"$unwind": "$content"}])),
+        ("watch history card join", lambda: watch_history.aggregate(
+            history + content_lookup_stages(WATCH_HISTORY_FIELDS)
+        ))
+    ]
+
+    baselines: Dict[str, int] = {}
+    typer.echo(f"{'query':<26}{'docs':>7}{'bytes':>12}{'bytes/doc':>11}{'decode ms':>11}{'saved':>8}")
+    for name, query in cases:
+        count, size, seconds = _measure(query())
+        group = name.split(" ")[0]
+        baseline = baselines.setdefault(group, size)
+        saved = f"{1 - size / baseline:.0%}" if baseline else "-"
+        typer.echo(
+            f"{name:<26}{count:>7}{size:>12}{size // max(count, 1):>11}"
+            f"{seconds * 1000:>11.2f}{saved:>8}"
+        )
+
+if __name__ == "__main__":
+    cli()
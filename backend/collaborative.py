@@ -0,0 +1,239 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+from datetime import datetime
+import asyncio
+import time
+import numpy as np
+import scipy.sparse as sp
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+# Similarity rules of the original Pearson implementation
+MIN_COMMON_ITEMS = 2
+SIMILARITY_THRESHOLD = 0.3
+NEIGHBOUR_COUNT = 10
+MIN_NEIGHBOUR_RATING = 4.0
+
+REVIEW_PROJECTION = {"_id": 0, "profile_id": 1, "content_id": 1, "rating": 1}
+
+class RatingMatrix:
+    """Profile x content rating matrix in CSR form for collaborative filtering.
+
+    The matrix is built once from ``reviews`` and then kept current by applying
+    reviews whose ``updated_at`` is newer than the last sync. A periodic full
+    rebuild picks up deletes that happened outside this process.
+    """
+
+    def __init__(self, refresh_interval: float = 30.0, rebuild_interval: float = 3600.0):
+        self.refresh_interval = refresh_interval
+        self.rebuild_interval = rebuild_interval
+        self.profile_index: Dict[str, int] = {}
+        self.content_index: Dict[str, int] = {}
+        self.content_ids: List[str] = []
+        self.ratings = sp.csr_matrix((0, 0), dtype=np.float64)
+        self._mask = self.ratings
+        self._squares = self.ratings
+        self.synced_at: Optional[datetime] = None
+        self._built_at = 0.0
+        self._refreshed_at = 0.0
+        self._lock = asyncio.Lock()
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.ratings.shape
+
+    async def refresh(self, db: AsyncIOMotorDatabase, force: bool = False) -> None:
+        """Bring the matrix up to date with the reviews collection."""
+        now = time.monotonic()
+        if not force and self.synced_at is not None and now - self._refreshed_at < self.refresh_interval:
+            return
+
+        async with self._lock:
+            if self.synced_at is None or now - self._built_at >= self.rebuild_interval:
+                await self._rebuild(db)
+            else:
+                await self._apply_changes(db)
+            self._refreshed_at = time.monotonic()
+
+    async def _rebuild(self, db: AsyncIOMotorDatabase) -> None:
+        """Load every review into a fresh matrix."""
+        synced_at = datetime.utcnow()
+        entries = []
+        async for review in db.reviews.find({}, REVIEW_PROJECTION, batch_size=10000):
+            entries.append((review["profile_id"], review["content_id"], review["rating"]))
+        self.load(entries)
+        self.synced_at = synced_at
+        self._built_at = time.monotonic()
+
+    def load(self, entries: Iterable[Tuple[str, str, float]]) -> None:
+        """Replace the matrix with (profile_id, content_id, rating) triples."""
+        profile_index: Dict[str, int] = {}
+        content_index: Dict[str, int] = {}
+        content_ids: List[str] = []
+        rows: List[int] = []
+        cols: List[int] = []
+        values: List[float] = []
+
+        for profile_id, content_id, rating in entries:
+            rows.append(profile_index.setdefault(profile_id, len(profile_index)))
+            col = content_index.get(content_id)
+            if col is None:
+                col = content_index[content_id] = len(content_ids)
+                content_ids.append(content_id)
+            cols.append(col)
+            values.append(rating)
+
+        ratings = sp.csr_matrix(
+            (np.asarray(values, dtype=np.float64), (np.asarray(rows), np.asarray(cols))),
+            shape=(len(profile_index), len(content_ids))
+        )
+        ratings.sum_duplicates()
+
+        self.profile_index = profile_index
+        self.content_index = content_index
+        self.content_ids = content_ids
+        self._set_ratings(ratings)
+
+    async def _apply_changes(self, db: AsyncIOMotorDatabase) -> None:
+        """Apply reviews written since the last sync."""
+        synced_at = datetime.utcnow()
+        changes = await db.reviews.find(
+            {"updated_at": {"$gte": self.synced_at}},
+            REVIEW_PROJECTION
+        ).to_list(None)
+        self.update((c["profile_id"], c["content_id"], c["rating"]) for c in changes)
+        self.synced_at = synced_at
+
+    def update(self, entries: Iterable[Tuple[str, str, float]]) -> None:
+        """Set ratings for (profile_id, content_id, rating) triples."""
+        rows, cols, values = [], [], []
+        for profile_id, content_id, rating in entries:
+            rows.append(self.profile_index.setdefault(profile_id, len(self.profile_index)))
+            col = self.content_index.get(content_id)
+            if col is None:
+                col = self.content_index[content_id] = len(self.content_ids)
+                self.content_ids.append(content_id)
+            cols.append(col)
+            values.append(rating)
+        if not rows:
+            return
+
+        shape = (len(self.profile_index), len(self.content_ids))
+        ratings = self.ratings.copy()
+        ratings.resize(shape)
+        updated = sp.csr_matrix((np.asarray(values, dtype=np.float64), (rows, cols)), shape=shape)
+        positions = updated.copy()
+        positions.data[:] = 1.0
+        ratings = ratings - ratings.multiply(positions) + updated
+        ratings.eliminate_zeros()
+        self._set_ratings(sp.csr_matrix(ratings))
+
+    def discard(self, profile_id: str, content_id: Optional[str] = None) -> None:
+        """Remove one rating, or every rating of a profile when content_id is None."""
+        row = self.profile_index.get(profile_id)
+        if row is None:
+            return
+        if content_id is None:
+            keep = np.ones(self.ratings.shape[0])
+            keep[row] = 0.0
+            ratings = sp.diags(keep) @ self.ratings
+        else:
+            col = self.content_index.get(content_id)
+            if col is None:
+                return
+            ratings = self.ratings.tolil()
+            ratings[row, col] = 0.0
+        ratings = sp.csr_matrix(ratings)
+        ratings.eliminate_zeros()
+        self._set_ratings(ratings)
+
+    def _set_ratings(self, ratings: sp.csr_matrix) -> None:
+        """Swap in a new matrix together with its derived mask and squares."""
+        mask = ratings.copy()
+        mask.data[:] = 1.0
+        squares = ratings.copy()
+        squares.data **= 2
+        self.ratings, self._mask, self._squares = ratings, mask, squares
+
+    def similarities(self, profile_id: str, user_ratings: Dict[str, float]) -> np.ndarray:
+        """Pearson correlation over co-rated items between a profile and every row.
+
+        Rows sharing fewer than ``MIN_COMMON_ITEMS`` items, and the profile's own
+        row, get a similarity of 0.
+        """
+        n_items = self.ratings.shape[1]
+        target = np.zeros(n_items)
+        rated = np.zeros(n_items)
+        for content_id, rating in user_ratings.items():
+            col = self.content_index.get(content_id)
+            if col is not None:
+                target[col] = rating
+                rated[col] = 1.0
+
+        # Sums restricted to the items both sides rated, one sparse product each
+        common = self._mask @ rated
+        sum_user = self._mask @ target
+        sum_other = self.ratings @ rated
+        sum_user_sq = self._mask @ (target ** 2)
+        sum_other_sq = self._squares @ rated
+        sum_products = self.ratings @ target
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            numerator = sum_products - sum_user * sum_other / common
+            variance = (sum_user_sq - sum_user ** 2 / common) * (sum_other_sq - sum_other ** 2 / common)
+            denominator = np.sqrt(np.clip(variance, 0.0, None))
+            correlation = np.where(denominator > 0, numerator / denominator, 0.0)
+        # Round away summation noise so exact ties (common with two shared
+        # items) rank by matrix position rather than by floating point error
+        correlation = np.round(correlation, 12)
+
+        correlation[common < MIN_COMMON_ITEMS] = 0.0
+        own_row = self.profile_index.get(profile_id)
+        if own_row is not None:
+            correlation[own_row] = 0.0
+        return correlation
+
+    def recommend(self, profile_id: str, user_ratings: Dict[str, float], limit: int = 20) -> List[str]:
+        """Score items rated highly by the most similar profiles.
+
+        Reproduces the original algorithm: neighbours need a correlation above
+        ``SIMILARITY_THRESHOLD``, the top ``NEIGHBOUR_COUNT`` are kept, and each
+        of their ratings of at least ``MIN_NEIGHBOUR_RATING`` on an item the
+        profile has not rated adds ``rating * similarity``. Ties are broken by
+        matrix position so results are deterministic.
+        """
+        if not user_ratings or self.ratings.shape[0] == 0:
+            return []
+
+        correlation = self.similarities(profile_id, user_ratings)
+        candidates = np.flatnonzero(correlation > SIMILARITY_THRESHOLD)
+        if candidates.size == 0:
+            return []
+
+        neighbours = top_k_indices(candidates, correlation[candidates], NEIGHBOUR_COUNT)
+        weights = correlation[neighbours]
+
+        neighbour_ratings = self.ratings[neighbours]
+        neighbour_ratings.data[neighbour_ratings.data < MIN_NEIGHBOUR_RATING] = 0.0
+        neighbour_ratings.eliminate_zeros()
+        scores = np.asarray(neighbour_ratings.T @ weights).ravel()
+
+        for content_id in user_ratings:
+            col = self.content_index.get(content_id)
+            if col is not None:
+                scores[col] = 0.0
+
+        items = np.flatnonzero(scores > 0)
+        if items.size == 0:
+            return []
+
+        return [self.content_ids[col] for col in top_k_indices(items, scores[items], limit)]
+
+def top_k_indices(indices: np.ndarray, scores: np.ndarray, k: int) -> np.ndarray:
+    """Return up to k indices with the highest scores, best first, ties by index."""
+    if indices.size > k:
+        kth_score = -np.partition(-scores, k - 1)[k - 1]
+        above = np.flatnonzero(scores > kth_score)
+        tied = np.flatnonzero(scores == kth_score)[:k - above.size]
+        selected = np.concatenate([above, tied])
+        indices, scores = indices[selected], scores[selected]
+    order = np.lexsort((indices, -scores))
+    return indices[order]
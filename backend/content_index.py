@@ -0,0 +1,183 @@
+from typing import Any, Dict, Iterable, List, Optional
+from datetime import datetime
+from pathlib import Path
+import os
+import re
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.decomposition import TruncatedSVD
+from sklearn.preprocessing import normalize
+from .collaborative import top_k_indices
+
+CONTENT_INDEX_PATH = os.getenv(
+    "CONTENT_INDEX_PATH",
+    str(Path(__file__).parent / "content_index.npz")
+)
+# Rows of the item-item similarity matrix held at once while building; a
+# block takes about block_size * n_items * 12 bytes (float32 scores plus
+# int64 partition indices), so 256 rows of 100k items is about 300 MB
+CONTENT_INDEX_BLOCK_SIZE = int(os.getenv("CONTENT_INDEX_BLOCK_SIZE", "256"))
+
+# Fields read from content documents to build the index
+FEATURE_PROJECTION = {"_id": 0, "id": 1, "overview": 1, "genre_ids": 1, "director": 1, "cast": 1}
+
+def _token(prefix: str, value: str) -> str:
+    """Turn a name into a single TF-IDF token, e.g. ``director_christopher_nolan``."""
+    return prefix + "_" + re.sub(r"\W+", "_", value.strip().lower())
+
+def content_document(content: Dict[str, Any]) -> str:
+    """Text used to embed a content item.
+
+    Genres, director and cast become whole-word tokens so that a shared
+    director or actor counts as one strong feature rather than several
+    common first and last names.
+    """
+    tokens = [content.get("overview") or ""]
+    tokens.extend(f"genre_{genre_id}" for genre_id in content.get("genre_ids") or [])
+    if content.get("director"):
+        tokens.append(_token("director", content["director"]))
+    tokens.extend(_token("cast", name) for name in content.get("cast") or [])
+    return " ".join(tokens)
+
+class ContentSimilarityIndex:
+    """Item-item similarity index over SVD-reduced TF-IDF content embeddings.
+
+    ``embeddings`` is a C-contiguous float32 array with one L2-normalised row
+    per item, and ``neighbours``/``neighbour_scores`` hold each item's top-k
+    most similar items, best first. Query time is a gather over those rows.
+    """
+
+    def __init__(self, n_components: int = 128, n_neighbours: int = 50):
+        self.n_components = n_components
+        self.n_neighbours = n_neighbours
+        self.content_ids: List[str] = []
+        self.positions: Dict[str, int] = {}
+        self.embeddings: Optional[np.ndarray] = None
+        self.neighbours: Optional[np.ndarray] = None
+        self.neighbour_scores: Optional[np.ndarray] = None
+        self.svd_model: Optional[TruncatedSVD] = None
+        self.built_at: Optional[datetime] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.neighbours is not None
+
+    def __len__(self) -> int:
+        return len(self.content_ids)
+
+    @classmethod
+    def from_documents(
+        cls,
+        documents: Iterable[Dict[str, Any]],
+        n_components: int = 128,
+        n_neighbours: int = 50,
+        block_size: int = CONTENT_INDEX_BLOCK_SIZE
+    ) -> "ContentSimilarityIndex":
+        """Build an index from content documents projected with FEATURE_PROJECTION."""
+        index = cls(n_components=n_components, n_neighbours=n_neighbours)
+        documents = list(documents)
+        index.content_ids = [doc["id"] for doc in documents]
+        index.positions = {content_id: i for i, content_id in enumerate(index.content_ids)}
+        if not documents:
+            index.embeddings = np.zeros((0, 0), dtype=np.float32)
+            index.neighbours = np.zeros((0, 0), dtype=np.int32)
+            index.neighbour_scores = np.zeros((0, 0), dtype=np.float32)
+            index.built_at = datetime.utcnow()
+            return index
+
+        vectorizer = TfidfVectorizer(stop_words="english", sublinear_tf=True, max_features=100000)
+        tfidf = vectorizer.fit_transform(content_document(doc) for doc in documents)
+
+        components = min(n_components, tfidf.shape[1] - 1, tfidf.shape[0] - 1)
+        if components >= 2:
+            index.svd_model = TruncatedSVD(n_components=components, random_state=42)
+            features = index.svd_model.fit_transform(tfidf)
+        else:
+            features = tfidf.toarray()
+
+        index.embeddings = np.ascontiguousarray(normalize(features), dtype=np.float32)
+        index._compute_neighbours(block_size)
+        index.built_at = datetime.utcnow()
+        return index
+
+    def _compute_neighbours(self, block_size: int) -> None:
+        """Precompute the top-k neighbours of every item, one block of rows at a time."""
+        n_items = self.embeddings.shape[0]
+        k = min(self.n_neighbours, n_items - 1)
+        self.neighbours = np.zeros((n_items, k), dtype=np.int32)
+        self.neighbour_scores = np.zeros((n_items, k), dtype=np.float32)
+        if k == 0:
+            return
+
+        for start in range(0, n_items, block_size):
+            stop = min(start + block_size, n_items)
+            similarity = self.embeddings[start:stop] @ self.embeddings.T
+            similarity[np.arange(stop - start), np.arange(start, stop)] = -np.inf
+
+            # Partitioning for the k largest in place of negating avoids a copy of the block
+            candidates = np.argpartition(similarity, n_items - k, axis=1)[:, n_items - k:]
+            scores = np.take_along_axis(similarity, candidates, axis=1)
+            order = np.argsort(-scores, axis=1, kind="stable")
+            self.neighbours[start:stop] = np.take_along_axis(candidates, order, axis=1)
+            self.neighbour_scores[start:stop] = np.take_along_axis(scores, order, axis=1)
+
+    def recommend(
+        self,
+        seed_ids: Iterable[str],
+        limit: int = 20,
+        exclude_ids: Iterable[str] = ()
+    ) -> List[str]:
+        """Items most similar to the seed items, summing similarity over seeds."""
+        if not self.ready:
+            return []
+        seeds = [self.positions[c] for c in seed_ids if c in self.positions]
+        if not seeds:
+            return []
+
+        candidates = self.neighbours[seeds].ravel()
+        scores = self.neighbour_scores[seeds].ravel()
+        positive = scores > 0
+        items, inverse = np.unique(candidates[positive], return_inverse=True)
+        totals = np.bincount(inverse, weights=scores[positive], minlength=items.size)
+
+        excluded = set(seeds)
+        excluded.update(self.positions[c] for c in exclude_ids if c in self.positions)
+        keep = np.fromiter((item not in excluded for item in items), dtype=bool, count=items.size)
+        items, totals = items[keep], totals[keep]
+        if items.size == 0:
+            return []
+
+        return [self.content_ids[i] for i in top_k_indices(items, totals, limit)]
+
+    def save(self, path: str = CONTENT_INDEX_PATH) -> None:
+        """Write the index arrays to an ``.npz`` file.
+
+        The file is written under a temporary name and renamed into place, so
+        a concurrent load() never sees a partial file.
+        """
+        # np.savez appends ".npz" to names without it
+        temporary = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(
+            temporary,
+            content_ids=np.asarray(self.content_ids, dtype=str),
+            embeddings=self.embeddings,
+            neighbours=self.neighbours,
+            neighbour_scores=self.neighbour_scores,
+            built_at=np.asarray(self.built_at.isoformat() if self.built_at else "")
+        )
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path: str = CONTENT_INDEX_PATH) -> "ContentSimilarityIndex":
+        """Read an index written by save()."""
+        with np.load(path) as data:
+            index = cls(n_neighbours=data["neighbours"].shape[1])
+            index.content_ids = [str(c) for c in data["content_ids"]]
+            index.positions = {content_id: i for i, content_id in enumerate(index.content_ids)}
+            index.embeddings = np.ascontiguousarray(data["embeddings"], dtype=np.float32)
+            index.neighbours = np.ascontiguousarray(data["neighbours"], dtype=np.int32)
+            index.neighbour_scores = np.ascontiguousarray(data["neighbour_scores"], dtype=np.float32)
+            built_at = str(data["built_at"])
+            index.built_at = datetime.fromisoformat(built_at) if built_at else None
+        index.n_components = index.embeddings.shape[1]
+        return index
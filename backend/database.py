@@ -2,6 +2,7 @@ from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 import os
 from pathlib import Path
 from dotenv import load_dotenv
+from .metrics import mongo_command_metrics
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -10,7 +11,8 @@ load_dotenv(ROOT_DIR / '.env')
 mongo_url = os.environ['MONGO_URL']
 db_name = os.environ.get('DB_NAME', 'netflix_clone')
 
-client = AsyncIOMotorClient(mongo_url)
+# Command timings feed the /metrics endpoint
+client = AsyncIOMotorClient(mongo_url, event_listeners=[mongo_command_metrics])
 database = client[db_name]
 
 async def get_database() -> AsyncIOMotorDatabase:
@@ -37,28 +39,45 @@ async def create_indexes():
     await database.content.create_index("content_type")
     await database.content.create_index("genre_ids")
     await database.content.create_index("average_rating")
+    await database.content.create_index("updated_at")
+    await database.content.create_index([("average_rating", -1), ("id", -1)])
+    await database.content.create_index([("content_type", 1), ("average_rating", -1), ("id", -1)])
+    await database.content.create_index([("total_ratings", -1), ("average_rating", -1)])
     
     # Watch history indexes
     await database.watch_history.create_index([("profile_id", 1), ("content_id", 1)], unique=True)
     await database.watch_history.create_index("profile_id")
     await database.watch_history.create_index("last_watched")
+    await database.watch_history.create_index([("profile_id", 1), ("last_watched", -1), ("id", -1)])
     
     # My list indexes
     await database.my_list.create_index([("profile_id", 1), ("content_id", 1)], unique=True)
     await database.my_list.create_index("profile_id")
+    await database.my_list.create_index([("profile_id", 1), ("added_at", -1), ("id", -1)])
     
     # Review indexes
     await database.reviews.create_index([("profile_id", 1), ("content_id", 1)], unique=True)
     await database.reviews.create_index("content_id")
+    await database.reviews.create_index([("content_id", 1), ("created_at", -1), ("id", -1)])
     await database.reviews.create_index("created_at")
+    await database.reviews.create_index("updated_at")
     
     # Review reaction indexes
     await database.review_reactions.create_index([("profile_id", 1), ("review_id", 1)], unique=True)
     await database.review_reactions.create_index("review_id")
     
+    # Viewing analytics indexes
+    await database.viewing_rollups.create_index([("profile_id", 1), ("day", 1)], unique=True)
+    await database.viewing_totals.create_index("profile_id", unique=True)
+    
+    # Trending snapshot indexes
+    await database.trending.create_index("id", unique=True)
+    
     # Recommendation indexes
     await database.recommendations.create_index("profile_id")
     await database.recommendations.create_index("score")
     await database.recommendations.create_index("created_at")
+    await database.recommendations.create_index([("profile_id", 1), ("score", -1)])
+    await database.recommendations.create_index([("profile_id", 1), ("created_at", -1)])
     
     print("Database indexes created successfully")
\ No newline at end of file
@@ -0,0 +1,163 @@
+"""Streaming bulk ingestion of catalog dumps into ``content``."""
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from datetime import datetime
+import csv
+import json
+import os
+import uuid
+from pydantic import ValidationError
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from .models import ContentBase
+
+# CSV columns holding lists; cells are JSON arrays or "|"-separated values
+CSV_LIST_FIELDS = {"genre_ids", "cast", "production_companies"}
+
+# Rating aggregates start at zero and are only ever set by review writes
+CONTENT_INSERT_DEFAULTS = {"average_rating": 0.0, "rating_sum": 0.0, "total_ratings": 0, "total_reviews": 0}
+
+def detect_format(path: str) -> str:
+    return "csv" if path.lower().endswith(".csv") else "jsonl"
+
+def _parse_csv_row(row: Dict[str, str]) -> Dict[str, Any]:
+    parsed: Dict[str, Any] = {}
+    for field, value in row.items():
+        if value is None or value == "":
+            continue
+        if field in CSV_LIST_FIELDS:
+            value = json.loads(value) if value.startswith("[") else [item.strip() for item in value.split("|") if item.strip()]
+        parsed[field] = value
+    return parsed
+
+def read_jsonl(path: str, offset: int = 0) -> Iterator[Tuple[int, Any]]:
+    """Yield (offset after the line, parsed row or error) for each non-blank line."""
+    with open(path, "rb") as file:
+        file.seek(offset)
+        for line in iter(file.readline, b""):
+            offset += len(line)
+            if not line.strip():
+                continue
+            try:
+                yield offset, json.loads(line)
+            except ValueError as exc:
+                yield offset, exc
+
+def read_csv(path: str, skip_rows: int = 0) -> Iterator[Tuple[int, Any]]:
+    """Yield (0, parsed row or error) for each CSV row after the first skip_rows."""
+    with open(path, newline="", encoding="utf-8") as file:
+        for number, row in enumerate(csv.DictReader(file)):
+            if number < skip_rows:
+                continue
+            try:
+                yield 0, _parse_csv_row(row)
+            except ValueError as exc:
+                yield 0, exc
+
+def validate_batch(rows: List[Any]) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """Validate raw rows against ContentBase; returns (documents, error messages).
+
+    Documents hold only the fields the row gave, so a refresh row with a
+    blank column does not overwrite what is stored.
+    """
+    documents = []
+    errors = []
+    for row in rows:
+        if isinstance(row, Exception):
+            errors.append(f"invalid JSON: {row}")
+            continue
+        if not isinstance(row, dict):
+            errors.append(f"not an object: {row!r}")
+            continue
+        try:
+            documents.append(ContentBase(**row).dict(exclude_unset=True))
+        except ValidationError as exc:
+            problems = "; ".join(
+                f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in exc.errors()
+            )
+            errors.append(f"tmdb_id={row.get('tmdb_id')}: {problems}")
+    return documents, errors
+
+def missing_defaults(document: Dict[str, Any]) -> Dict[str, Any]:
+    """ContentBase defaults of the optional fields document does not give."""
+    return {
+        name: field.get_default(call_default_factory=True)
+        for name, field in ContentBase.model_fields.items()
+        if name not in document and not field.is_required()
+    }
+
+def upsert_requests(documents: List[Dict[str, Any]], now: Optional[datetime] = None) -> List[UpdateOne]:
+    """One upsert per document keyed on tmdb_id.
+
+    Given fields are set; defaults of the others, the ID and the rating
+    aggregates are only written when the document is inserted.
+    """
+    now = now or datetime.utcnow()
+    return [
+        UpdateOne(
+            {"tmdb_id": document["tmdb_id"]},
+            {
+                "$set": {**document, "updated_at": now},
+                "$setOnInsert": {
+                    **missing_defaults(document),
+                    "id": str(uuid.uuid4()),
+                    "created_at": now,
+                    **CONTENT_INSERT_DEFAULTS
+                }
+            },
+            upsert=True
+        )
+        for document in documents
+    ]
+
+def write_batch(collection, requests: List[UpdateOne]) -> Dict[str, int]:
+    """Run an unordered bulk upsert; per-row write errors are counted, not raised."""
+    if not requests:
+        return {"inserted": 0, "matched": 0, "failed": 0}
+    try:
+        result = collection.bulk_write(requests, ordered=False)
+        details = result.bulk_api_result
+    except BulkWriteError as exc:
+        details = exc.details
+    return {
+        "inserted": details.get("nUpserted", 0),
+        "matched": details.get("nMatched", 0),
+        "failed": len(details.get("writeErrors", []))
+    }
+
+class Checkpoint:
+    """Progress of an ingestion run, saved atomically after each written batch.
+
+    ``rows`` counts rows read so far; for JSONL ``offset`` is the byte
+    position to resume from. The file size and mtime guard against resuming
+    into a different dump.
+    """
+
+    def __init__(self, path: str, source: str):
+        self.path = path
+        stat = os.stat(source)
+        self.source = {"path": os.path.abspath(source), "size": stat.st_size, "mtime": stat.st_mtime}
+        self.rows = 0
+        self.offset = 0
+
+    def load(self) -> bool:
+        """Restore saved progress; False if there is none for this source file."""
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path) as file:
+            saved = json.load(file)
+        if saved.get("source") != self.source:
+            raise ValueError(f"Checkpoint {self.path} belongs to a different catalog file")
+        self.rows = saved["rows"]
+        self.offset = saved["offset"]
+        return True
+
+    def save(self, rows: int, offset: int) -> None:
+        self.rows, self.offset = rows, offset
+        temporary = self.path + ".tmp"
+        with open(temporary, "w") as file:
+            json.dump({"source": self.source, "rows": rows, "offset": offset}, file)
+        os.replace(temporary, self.path)
+
+    def clear(self) -> None:
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,345 @@
+"""In-process metrics rendered in the Prometheus text exposition format.
+
+Three sources feed the registry: MetricsMiddleware times every HTTP request
+by route template, MongoCommandMetrics (a PyMongo command listener) times
+every data command by collection and operation, and EventLoopLagMonitor
+samples how late the event loop wakes up. Components that already keep
+counters in a ``stats()`` method are exported as gauges when scraped.
+Recording is a dictionary lookup, a bisection and a few additions under a
+lock, cheap enough to leave on in production.
+"""
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+from bisect import bisect_left
+from threading import Lock
+import asyncio
+import logging
+import math
+import os
+import re
+import time
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+METRICS_LOOP_LAG_INTERVAL_SECONDS = float(os.getenv("METRICS_LOOP_LAG_INTERVAL_SECONDS", "0.5"))
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Upper bounds in seconds, from sub-millisecond cache hits to slow exports
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LOOP_LAG_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+Labels = Tuple[str, ...]
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _label_text(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """Monotonic counter per label combination."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values: Dict[Labels, float] = {}
+        self._lock = Lock()
+
+    def inc(self, labels: Labels = (), amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in values:
+            yield f"{self.name}{_label_text(self.label_names, labels)} {_number(value)}"
+
+class Histogram:
+    """Cumulative bucket counts, sum and count per label combination."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        # Per label set: [count per bucket (last is +Inf), sum]
+        self._values: Dict[Labels, List[Any]] = {}
+        self._lock = Lock()
+
+    def observe(self, labels: Labels, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = [(labels, list(counts), total) for labels, (counts, total) in self._values.items()]
+        for labels, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                bucket = _label_text(self.label_names, labels, f'le="{_number(bound)}"')
+                yield f"{self.name}_bucket{bucket} {cumulative}"
+            label_text = _label_text(self.label_names, labels)
+            yield f"{self.name}_sum{label_text} {_number(total)}"
+            yield f"{self.name}_count{label_text} {cumulative}"
+
+class Gauge:
+    """Last value per label combination."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values: Dict[Labels, float] = {}
+
+    def set(self, labels: Labels, value: float) -> None:
+        self._values[labels] = value
+
+    def samples(self) -> Iterator[str]:
+        for labels, value in list(self._values.items()):
+            yield f"{self.name}{_label_text(self.label_names, labels)} {_number(value)}"
+
+_NAME_RE = re.compile(r"[^a-zA-Z0-9_]")
+
+def _flatten(prefix: str, stats: Dict[str, Any]) -> Iterator[Tuple[str, float]]:
+    """Numeric leaves of a nested stats() dict, with names joined by underscores."""
+    for key, value in stats.items():
+        name = f"{prefix}_{_NAME_RE.sub('_', str(key))}"
+        if isinstance(value, dict):
+            yield from _flatten(name, value)
+        elif isinstance(value, bool):
+            yield name, int(value)
+        elif isinstance(value, (int, float)):
+            yield name, value
+
+class MetricsRegistry:
+    """Metric families and stats() providers rendered together on scrape."""
+
+    def __init__(self, prefix: str = "app"):
+        self.prefix = prefix
+        self._metrics: List[Any] = []
+        self._stats: Dict[str, Callable[[], Optional[Dict[str, Any]]]] = {}
+
+    def register(self, metric: Any) -> Any:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help_text: str, label_names: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help_text, label_names))
+
+    def histogram(self, name: str, help_text: str, label_names: Sequence[str] = (), **kwargs: Any) -> Histogram:
+        return self.register(Histogram(name, help_text, label_names, **kwargs))
+
+    def gauge(self, name: str, help_text: str, label_names: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, help_text, label_names))
+
+    def register_stats(self, component: str, provider: Callable[[], Optional[Dict[str, Any]]]) -> None:
+        """Export the numeric values of a component's stats() as gauges on every scrape."""
+        self._stats[component] = provider
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        for component, provider in self._stats.items():
+            try:
+                stats = provider()
+            except Exception:
+                logger.exception("Collecting %s stats failed", component)
+                continue
+            for name, value in _flatten(f"{self.prefix}_{component}", stats or {}):
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template, method and status.",
+    ("route", "method", "status")
+)
+http_requests_in_progress = registry.gauge("http_requests_in_progress", "HTTP requests being served.")
+mongodb_command_duration = registry.histogram(
+    "mongodb_command_duration_seconds",
+    "MongoDB command latency by collection and operation.",
+    ("collection", "operation")
+)
+mongodb_command_documents = registry.counter(
+    "mongodb_command_documents_total",
+    "Documents returned or written by MongoDB commands.",
+    ("collection", "operation")
+)
+mongodb_command_failures = registry.counter(
+    "mongodb_command_failures_total",
+    "Failed MongoDB commands by collection and operation.",
+    ("collection", "operation")
+)
+event_loop_lag = registry.histogram(
+    "event_loop_lag_seconds",
+    "Delay between when a sleep was due to end and when the event loop resumed it.",
+    buckets=LOOP_LAG_BUCKETS
+)
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency and status per route template.
+
+    Routes are labelled by their path template (``/api/content/{content_id}``)
+    so label cardinality stays bounded; requests no route matched share one
+    label. Latency covers the whole response, including streamed bodies.
+    """
+
+    def __init__(self, app: Callable):
+        self.app = app
+        self.in_progress = 0
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_with_status(message: Dict[str, Any]) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        self.in_progress += 1
+        http_requests_in_progress.set((), self.in_progress)
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            self.in_progress -= 1
+            http_requests_in_progress.set((), self.in_progress)
+            route = scope.get("route")
+            http_request_duration.observe(
+                (getattr(route, "path", "unmatched"), scope["method"], str(status_code)),
+                time.perf_counter() - started
+            )
+
+# Commands that read or write collection data; others (handshakes, pings) are ignored
+DATA_COMMANDS = {
+    "find", "aggregate", "getMore", "insert", "update", "delete",
+    "findAndModify", "count", "distinct", "createIndexes"
+}
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """PyMongo command listener timing data commands per collection and operation.
+
+    PyMongo calls listeners on the threads that run commands (Motor's
+    executor), so only the collection name of a started command is kept,
+    keyed by request and connection, until it succeeds or fails.
+    """
+
+    def __init__(self):
+        self._started: Dict[Tuple[int, Any], str] = {}
+        self._lock = Lock()
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        if event.command_name not in DATA_COMMANDS:
+            return
+        if event.command_name == "getMore":
+            collection = event.command.get("collection", "")
+        else:
+            collection = event.command.get(event.command_name, "")
+        with self._lock:
+            self._started[(event.request_id, event.connection_id)] = str(collection)
+
+    def _finish(self, event: Any) -> Optional[Labels]:
+        if event.command_name not in DATA_COMMANDS:
+            return None
+        with self._lock:
+            collection = self._started.pop((event.request_id, event.connection_id), "")
+        labels = (collection, event.command_name)
+        mongodb_command_duration.observe(labels, event.duration_micros / 1e6)
+        return labels
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        labels = self._finish(event)
+        if labels is not None:
+            documents = _document_count(event.reply)
+            if documents:
+                mongodb_command_documents.inc(labels, documents)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        labels = self._finish(event)
+        if labels is not None:
+            mongodb_command_failures.inc(labels)
+
+def _document_count(reply: Dict[str, Any]) -> int:
+    """Documents in a cursor batch, or affected by a write."""
+    cursor = reply.get("cursor")
+    if isinstance(cursor, dict):
+        return len(cursor.get("firstBatch") or cursor.get("nextBatch") or ())
+    if "value" in reply:
+        return 1 if reply["value"] is not None else 0
+    n = reply.get("n")
+    return n if isinstance(n, int) else 0
+
+mongo_command_metrics = MongoCommandMetrics()
+
+class EventLoopLagMonitor:
+    """Samples event loop lag: how much later than requested a sleep returns."""
+
+    def __init__(self, interval: float = METRICS_LOOP_LAG_INTERVAL_SECONDS):
+        self.interval = interval
+        self.max_lag = 0.0
+        self.last_lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            event_loop_lag.observe((), lag)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the latest and largest lag seen, in seconds."""
+        return {"last_seconds": self.last_lag, "max_seconds": self.max_lag}
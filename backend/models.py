@@ -129,6 +129,7 @@ class Content(ContentBase):
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     average_rating: float = 0.0
+    rating_sum: float = 0.0  # Sum of review ratings, kept with total_ratings for the average
     total_ratings: int = 0
     total_reviews: int = 0
 
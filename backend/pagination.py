@@ -0,0 +1,58 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from fastapi import HTTPException, status
+
+# Response header carrying the opaque token for the next page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(sort_value: Any, item_id: str) -> str:
+    """Encode the sort key of the last row of a page as an opaque token."""
+    if isinstance(sort_value, datetime):
+        payload = {"v": sort_value.isoformat(), "t": "dt", "id": item_id}
+    else:
+        payload = {"v": sort_value, "id": item_id}
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[Any, str]:
+    """Decode a cursor token back into its (sort value, id) pair."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        sort_value = payload["v"]
+        if payload.get("t") == "dt":
+            sort_value = datetime.fromisoformat(sort_value)
+        item_id = payload["id"]
+        if not isinstance(item_id, str):
+            raise ValueError("cursor id must be a string")
+        return sort_value, item_id
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+def keyset_sort(sort_field: str) -> List[Tuple[str, int]]:
+    """Sort order used by keyset pages: sort field then id, both descending."""
+    return [(sort_field, -1), ("id", -1)]
+
+def keyset_filter(sort_field: str, cursor: Optional[str]) -> Dict[str, Any]:
+    """Build the filter selecting rows strictly after the cursor position."""
+    if not cursor:
+        return {}
+    sort_value, item_id = decode_cursor(cursor)
+    return {
+        "$or": [
+            {sort_field: {"$lt": sort_value}},
+            {sort_field: sort_value, "id": {"$lt": item_id}}
+        ]
+    }
+
+def next_cursor(rows: List[Dict[str, Any]], sort_field: str, limit: int) -> Optional[str]:
+    """Return the cursor for the page after ``rows``, or None on the last page."""
+    if not rows or len(rows) < limit:
+        return None
+    last_row = rows[-1]
+    return encode_cursor(last_row.get(sort_field), last_row["id"])
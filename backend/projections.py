@@ -0,0 +1,80 @@
+"""Field sets read from MongoDB, so queries only ship what callers use."""
+from typing import Any, Dict, Iterable, List
+
+# Fields of a content card; matches ContentResponse
+CONTENT_CARD_FIELDS = (
+    "id",
+    "tmdb_id",
+    "title",
+    "overview",
+    "content_type",
+    "genre_ids",
+    "release_date",
+    "poster_path",
+    "backdrop_path",
+    "trailer_url",
+    "average_rating",
+    "total_ratings",
+    "total_reviews"
+)
+
+# Card fields plus the metadata shown on a title's detail page
+CONTENT_DETAIL_FIELDS = CONTENT_CARD_FIELDS + (
+    "original_title",
+    "runtime",
+    "imdb_rating",
+    "tmdb_rating",
+    "language",
+    "country",
+    "director",
+    "cast",
+    "production_companies"
+)
+
+# Fields the recommendation engine reads from content
+CONTENT_ENGINE_FIELDS = ("id", "genre_ids")
+
+WATCH_HISTORY_FIELDS = (
+    "id", "content_id", "profile_id", "progress", "watch_time", "status", "last_watched", "created_at"
+)
+MY_LIST_FIELDS = ("id", "content_id", "profile_id", "added_at")
+REVIEW_RESPONSE_FIELDS = (
+    "id", "profile_name", "rating", "review_text", "is_spoiler", "likes", "dislikes", "created_at"
+)
+RECOMMENDATION_FIELDS = (
+    "id", "profile_id", "content_id", "score", "reason", "algorithm_used", "created_at"
+)
+
+def projection(fields: Iterable[str], prefix: str = "") -> Dict[str, int]:
+    """Inclusion projection for fields, optionally nested under prefix."""
+    result = {} if prefix else {"_id": 0}
+    result.update({f"{prefix}.{field}" if prefix else field: 1 for field in fields})
+    return result
+
+CONTENT_CARD_PROJECTION = projection(CONTENT_CARD_FIELDS)
+CONTENT_DETAIL_PROJECTION = projection(CONTENT_DETAIL_FIELDS)
+CONTENT_ENGINE_PROJECTION = projection(CONTENT_ENGINE_FIELDS)
+RECOMMENDATION_PROJECTION = projection(RECOMMENDATION_FIELDS)
+REVIEW_RESPONSE_PROJECTION = projection(REVIEW_RESPONSE_FIELDS)
+
+def content_lookup_stages(
+    row_fields: Iterable[str],
+    content_fields: Iterable[str] = CONTENT_CARD_FIELDS
+) -> List[Dict[str, Any]]:
+    """$lookup/$unwind/$project stages joining a row to its content as ``content``.
+
+    The trailing ``$project`` keeps only the listed fields, so full content
+    documents never leave the server.
+    """
+    return [
+        {
+            "$lookup": {
+                "from": "content",
+                "localField": "content_id",
+                "foreignField": "id",
+                "as": "content"
+            }
+        },
+        {"$unwind": "$content"},
+        {"$project": {**projection(row_fields), **projection(content_fields, "content")}}
+    ]
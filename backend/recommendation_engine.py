@@ -1,192 +1,180 @@
 from typing import List, Dict, Any, Optional
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-from sklearn.decomposition import TruncatedSVD
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from datetime import datetime, timedelta
 import asyncio
+import logging
+import os
 from .models import Recommendation, Content, Profile, WatchHistory, Review
+from .collaborative import RatingMatrix
+from .content_index import CONTENT_INDEX_PATH, FEATURE_PROJECTION, ContentSimilarityIndex
+from .projections import CONTENT_CARD_PROJECTION, CONTENT_ENGINE_PROJECTION, RECOMMENDATION_PROJECTION
+from .single_flight import SingleFlight
+from .trending import TrendingView, trending_pipeline
+from .watch_buffer import WatchProgressBuffer
+
+logger = logging.getLogger(__name__)
+
+def build_recommendation_documents(
+    profile_id: str,
+    content_based: List[str],
+    collaborative: List[str],
+    trending: List[str]
+) -> List[Dict[str, Any]]:
+    """Build the stored recommendation rows for one profile."""
+    recommendation_data = []
+    
+    # Content-based recommendations
+    for i, content_id in enumerate(content_based):
+        recommendation_data.append(Recommendation(
+            profile_id=profile_id,
+            content_id=content_id,
+            score=0.9 - (i * 0.05),  # Decreasing score
+            reason="Based on your viewing history",
+            algorithm_used="content_based"
+        ).dict())
+    
+    # Collaborative recommendations
+    for i, content_id in enumerate(collaborative):
+        recommendation_data.append(Recommendation(
+            profile_id=profile_id,
+            content_id=content_id,
+            score=0.85 - (i * 0.04),
+            reason="Users with similar taste also liked",
+            algorithm_used="collaborative"
+        ).dict())
+    
+    # Trending recommendations
+    for i, content_id in enumerate(trending):
+        recommendation_data.append(Recommendation(
+            profile_id=profile_id,
+            content_id=content_id,
+            score=0.8 - (i * 0.03),
+            reason="Trending now",
+            algorithm_used="trending"
+        ).dict())
+    
+    return recommendation_data
 
 class RecommendationEngine:
-    def __init__(self, db: AsyncIOMotorDatabase):
+    def __init__(
+        self,
+        db: AsyncIOMotorDatabase,
+        watch_buffer: Optional[WatchProgressBuffer] = None,
+        trending: Optional[TrendingView] = None
+    ):
         self.db = db
-        self.content_features = None
-        self.content_similarity_matrix = None
-        self.user_item_matrix = None
-        self.svd_model = None
-        
+        self.watch_buffer = watch_buffer
+        self.trending = trending
+        self.trending_flight = SingleFlight("trending")
+        self.content_index = ContentSimilarityIndex()
+        self.user_item_matrix = RatingMatrix()
+    
+    async def build_content_index(self) -> ContentSimilarityIndex:
+        """Build the item-item similarity index from the content catalog."""
+        documents = await self.db.content.find({}, FEATURE_PROJECTION).to_list(None)
+        loop = asyncio.get_running_loop()
+        index = await loop.run_in_executor(None, ContentSimilarityIndex.from_documents, documents)
+        self.content_index = index
+        return index
+    
+    async def load_content_index(self, path: str = CONTENT_INDEX_PATH) -> ContentSimilarityIndex:
+        """Load the prebuilt similarity index, building and saving it if no file exists.
+        
+        Saving means only the first start without ``build-content-index`` pays
+        for the build; later starts and the other workers load the file.
+        """
+        loop = asyncio.get_running_loop()
+        if os.path.exists(path):
+            self.content_index = await loop.run_in_executor(None, ContentSimilarityIndex.load, path)
+        else:
+            logger.warning("No content index at %s, building one; run build-content-index ahead of deploys", path)
+            index = await self.build_content_index()
+            try:
+                await loop.run_in_executor(None, index.save, path)
+            except OSError:
+                logger.exception("Saving the content index to %s failed", path)
+        logger.info("Content similarity index ready with %d items", len(self.content_index))
+        return self.content_index
+    
     async def get_user_profiles_data(self, profile_id: str) -> Dict[str, Any]:
         """Get user profile data for recommendations."""
-        # Get watch history
-        watch_history = await self.db.watch_history.find(
-            {"profile_id": profile_id}
-        ).to_list(None)
-        
-        # Get ratings/reviews
-        reviews = await self.db.reviews.find(
-            {"profile_id": profile_id}
-        ).to_list(None)
-        
-        # Get my list
-        my_list = await self.db.my_list.find(
-            {"profile_id": profile_id}
-        ).to_list(None)
-        
+        context = await RecommendationContext.load(self.db, profile_id, self.watch_buffer)
         return {
-            "watch_history": watch_history,
-            "reviews": reviews,
-            "my_list": my_list
+            "watch_history": context.watch_history,
+            "reviews": context.reviews,
+            "my_list": context.my_list
         }
     
     async def get_content_based_recommendations(
         self, 
         profile_id: str, 
-        limit: int = 20
+        limit: int = 20,
+        context: Optional["RecommendationContext"] = None
     ) -> List[str]:
         """Get content-based recommendations."""
-        user_data = await self.get_user_profiles_data(profile_id)
-        
-        # Get user's watched content
-        watched_content_ids = [item["content_id"] for item in user_data["watch_history"]]
-        rated_content_ids = [item["content_id"] for item in user_data["reviews"]]
+        if context is None:
+            context = await RecommendationContext.load(self.db, profile_id, self.watch_buffer)
         
         # Combine watched and rated content
-        user_content_ids = list(set(watched_content_ids + rated_content_ids))
+        user_content_ids = context.user_content_ids
         
         if not user_content_ids:
             return await self.get_trending_recommendations(limit)
         
-        # Get content details
-        user_content = await self.db.content.find(
-            {"id": {"$in": user_content_ids}}
-        ).to_list(None)
+        # Use the precomputed item neighbours when the index is loaded
+        if self.content_index.ready:
+            recommendations = self.content_index.recommend(user_content_ids, limit)
+            if recommendations:
+                return recommendations
         
-        if not user_content:
+        if not any(content_id in context.content for content_id in user_content_ids):
             return await self.get_trending_recommendations(limit)
         
-        # Extract user preferences
-        user_genres = []
-        user_directors = []
-        user_cast = []
-        
-        for content in user_content:
-            user_genres.extend(content.get("genre_ids", []))
-            if content.get("director"):
-                user_directors.append(content["director"])
-            user_cast.extend(content.get("cast", []))
-        
         # Get genre preferences (most common genres)
-        genre_counts = {}
-        for genre in user_genres:
-            genre_counts[genre] = genre_counts.get(genre, 0) + 1
-        
-        top_genres = sorted(genre_counts.items(), key=lambda x: x[1], reverse=True)[:5]
-        preferred_genre_ids = [genre[0] for genre in top_genres]
+        preferred_genre_ids = context.top_genres(user_content_ids, 5)
         
         # Find similar content
         recommendations = await self.db.content.find({
             "id": {"$nin": user_content_ids},
             "genre_ids": {"$in": preferred_genre_ids}
-        }).sort("average_rating", -1).limit(limit).to_list(None)
+        }, {"_id": 0, "id": 1}).sort("average_rating", -1).limit(limit).to_list(None)
         
         return [rec["id"] for rec in recommendations]
     
     async def get_collaborative_recommendations(
         self, 
         profile_id: str, 
-        limit: int = 20
+        limit: int = 20,
+        context: Optional["RecommendationContext"] = None
     ) -> List[str]:
         """Get collaborative filtering recommendations."""
-        # Get users with similar taste
-        user_data = await self.get_user_profiles_data(profile_id)
-        user_ratings = {item["content_id"]: item["rating"] for item in user_data["reviews"]}
+        if context is None:
+            context = await RecommendationContext.load(self.db, profile_id, self.watch_buffer)
+        user_ratings = context.user_ratings
         
         if not user_ratings:
             return await self.get_trending_recommendations(limit)
         
-        # Get all users' ratings
-        all_reviews = await self.db.reviews.find().to_list(None)
-        
-        # Build user-item matrix
-        user_profiles = {}
-        for review in all_reviews:
-            pid = review["profile_id"]
-            if pid not in user_profiles:
-                user_profiles[pid] = {}
-            user_profiles[pid][review["content_id"]] = review["rating"]
-        
-        # Find similar users
-        similar_users = []
-        for other_profile_id, other_ratings in user_profiles.items():
-            if other_profile_id == profile_id:
-                continue
-            
-            # Calculate similarity (Pearson correlation)
-            common_items = set(user_ratings.keys()) & set(other_ratings.keys())
-            if len(common_items) < 2:
-                continue
-            
-            sum1 = sum([user_ratings[item] for item in common_items])
-            sum2 = sum([other_ratings[item] for item in common_items])
-            
-            sum1_sq = sum([user_ratings[item] ** 2 for item in common_items])
-            sum2_sq = sum([other_ratings[item] ** 2 for item in common_items])
-            
-            sum_products = sum([user_ratings[item] * other_ratings[item] for item in common_items])
-            
-            n = len(common_items)
-            numerator = sum_products - (sum1 * sum2 / n)
-            denominator = ((sum1_sq - sum1 ** 2 / n) * (sum2_sq - sum2 ** 2 / n)) ** 0.5
-            
-            if denominator == 0:
-                correlation = 0
-            else:
-                correlation = numerator / denominator
-            
-            if correlation > 0.3:  # Threshold for similarity
-                similar_users.append((other_profile_id, correlation))
-        
-        # Sort by similarity
-        similar_users.sort(key=lambda x: x[1], reverse=True)
-        
-        # Get recommendations from similar users
-        recommendations = {}
-        for similar_user_id, similarity in similar_users[:10]:  # Top 10 similar users
-            similar_user_ratings = user_profiles[similar_user_id]
-            for content_id, rating in similar_user_ratings.items():
-                if content_id not in user_ratings and rating >= 4.0:  # High rating
-                    if content_id not in recommendations:
-                        recommendations[content_id] = 0
-                    recommendations[content_id] += rating * similarity
-        
-        # Sort recommendations by score
-        sorted_recommendations = sorted(
-            recommendations.items(), 
-            key=lambda x: x[1], 
-            reverse=True
-        )
-        
-        return [rec[0] for rec in sorted_recommendations[:limit]]
+        # Score against the shared sparse profile x content matrix
+        await self.user_item_matrix.refresh(self.db)
+        return self.user_item_matrix.recommend(profile_id, user_ratings, limit)
     
     async def get_trending_recommendations(self, limit: int = 20) -> List[str]:
         """Get trending content recommendations."""
-        # Get content with high ratings and recent activity
-        trending = await self.db.content.aggregate([
-            {
-                "$match": {
-                    "total_ratings": {"$gte": 5},
-                    "average_rating": {"$gte": 3.5}
-                }
-            },
-            {
-                "$sort": {
-                    "total_ratings": -1,
-                    "average_rating": -1
-                }
-            },
-            {"$limit": limit}
-        ]).to_list(None)
+        # Served from the materialized snapshot once it has been loaded. A
+        # shorter snapshot is already topped up with every popular title the
+        # fallback could return, and limits beyond TRENDING_SIZE are clamped
+        # to it, so the aggregation only runs before the first refresh
+        if self.trending is not None and self.trending.ready:
+            return self.trending.top(limit)
+        
+        # Get content with high ratings and recent activity; concurrent
+        # fallbacks for the same limit share one aggregation
+        trending = await self.trending_flight.run(
+            limit,
+            lambda: self.db.content.aggregate(trending_pipeline(limit)).to_list(None)
+        )
         
         return [item["id"] for item in trending]
     
@@ -194,101 +182,79 @@ class RecommendationEngine:
         self, 
         profile_id: str, 
         genre_ids: List[int], 
-        limit: int = 20
+        limit: int = 20,
+        context: Optional["RecommendationContext"] = None
     ) -> List[str]:
         """Get recommendations based on specific genres."""
-        user_data = await self.get_user_profiles_data(profile_id)
-        watched_content_ids = [item["content_id"] for item in user_data["watch_history"]]
+        if context is None:
+            context = await RecommendationContext.load(self.db, profile_id, self.watch_buffer)
         
         recommendations = await self.db.content.find({
-            "id": {"$nin": watched_content_ids},
+            "id": {"$nin": context.watched_content_ids},
             "genre_ids": {"$in": genre_ids}
-        }).sort("average_rating", -1).limit(limit).to_list(None)
+        }, {"_id": 0, "id": 1}).sort("average_rating", -1).limit(limit).to_list(None)
         
         return [rec["id"] for rec in recommendations]
     
     async def get_continue_watching_recommendations(
         self, 
         profile_id: str, 
-        limit: int = 10
+        limit: int = 10,
+        context: Optional["RecommendationContext"] = None
     ) -> List[str]:
         """Get continue watching recommendations."""
+        if context is not None:
+            return context.continue_watching(limit)
+        
         continue_watching = await self.db.watch_history.find({
             "profile_id": profile_id,
             "progress": {"$gt": 5, "$lt": 90},  # Between 5% and 90%
             "status": "watching"
-        }).sort("last_watched", -1).limit(limit).to_list(None)
+        }, {"_id": 0, "content_id": 1}).sort("last_watched", -1).limit(limit).to_list(None)
         
         return [item["content_id"] for item in continue_watching]
     
     async def generate_recommendations(self, profile_id: str) -> Dict[str, Any]:
         """Generate comprehensive recommendations for a profile."""
-        # Get different types of recommendations
-        content_based = await self.get_content_based_recommendations(profile_id, 15)
-        collaborative = await self.get_collaborative_recommendations(profile_id, 15)
-        trending = await self.get_trending_recommendations(10)
-        continue_watching = await self.get_continue_watching_recommendations(profile_id, 10)
+        # Load the profile's data once and share it across all algorithms
+        context = await RecommendationContext.load(self.db, profile_id, self.watch_buffer)
         
         # Get user's genre preferences for genre-specific recommendations
-        user_data = await self.get_user_profiles_data(profile_id)
-        user_genres = []
-        for item in user_data["watch_history"]:
-            content = await self.db.content.find_one({"id": item["content_id"]})
-            if content:
-                user_genres.extend(content.get("genre_ids", []))
-        
-        # Get most common genres
-        genre_counts = {}
-        for genre in user_genres:
-            genre_counts[genre] = genre_counts.get(genre, 0) + 1
-        
-        top_genres = sorted(genre_counts.items(), key=lambda x: x[1], reverse=True)[:3]
-        
-        genre_recommendations = {}
-        for genre_id, _ in top_genres:
-            genre_recs = await self.get_genre_based_recommendations(profile_id, [genre_id], 10)
-            genre_recommendations[f"genre_{genre_id}"] = genre_recs
+        top_genres = context.top_genres(context.watched_content_ids, 3, per_view=True)
+        
+        # Run every algorithm concurrently
+        results = await asyncio.gather(
+            self.get_content_based_recommendations(profile_id, 15, context),
+            self.get_collaborative_recommendations(profile_id, 15, context),
+            self.get_trending_recommendations(10),
+            self.get_continue_watching_recommendations(profile_id, 10, context),
+            *[
+                self.get_genre_based_recommendations(profile_id, [genre_id], 10, context)
+                for genre_id in top_genres
+            ]
+        )
+        content_based, collaborative, trending, continue_watching = results[:4]
+        genre_recommendations = {
+            f"genre_{genre_id}": genre_recs
+            for genre_id, genre_recs in zip(top_genres, results[4:])
+        }
         
         # Store recommendations in database
-        recommendation_data = []
-        
-        # Content-based recommendations
-        for i, content_id in enumerate(content_based):
-            recommendation_data.append(Recommendation(
-                profile_id=profile_id,
-                content_id=content_id,
-                score=0.9 - (i * 0.05),  # Decreasing score
-                reason="Based on your viewing history",
-                algorithm_used="content_based"
-            ).dict())
-        
-        # Collaborative recommendations
-        for i, content_id in enumerate(collaborative):
-            recommendation_data.append(Recommendation(
-                profile_id=profile_id,
-                content_id=content_id,
-                score=0.85 - (i * 0.04),
-                reason="Users with similar taste also liked",
-                algorithm_used="collaborative"
-            ).dict())
-        
-        # Trending recommendations
-        for i, content_id in enumerate(trending):
-            recommendation_data.append(Recommendation(
-                profile_id=profile_id,
-                content_id=content_id,
-                score=0.8 - (i * 0.03),
-                reason="Trending now",
-                algorithm_used="trending"
-            ).dict())
-        
-        # Clear old recommendations for this profile
-        await self.db.recommendations.delete_many({"profile_id": profile_id})
+        recommendation_data = build_recommendation_documents(
+            profile_id, content_based, collaborative, trending
+        )
         
-        # Insert new recommendations
+        # Insert new recommendations before clearing the old ones, so readers
+        # never see an empty set while a profile is being regenerated
         if recommendation_data:
             await self.db.recommendations.insert_many(recommendation_data)
         
+        # Clear old recommendations for this profile
+        await self.db.recommendations.delete_many({
+            "profile_id": profile_id,
+            "id": {"$nin": [rec["id"] for rec in recommendation_data]}
+        })
+        
         return {
             "content_based": content_based,
             "collaborative": collaborative,
@@ -308,11 +274,14 @@ class RecommendationEngine:
         if algorithm:
             query["algorithm_used"] = algorithm
         
-        recommendations = await self.db.recommendations.find(query).sort("score", -1).limit(limit).to_list(None)
+        recommendations = await self.db.recommendations.find(query, RECOMMENDATION_PROJECTION).sort("score", -1).limit(limit).to_list(None)
         
         # Get content details
         content_ids = [rec["content_id"] for rec in recommendations]
-        content_list = await self.db.content.find({"id": {"$in": content_ids}}).to_list(None)
+        content_list = await self.db.content.find(
+            {"id": {"$in": content_ids}},
+            CONTENT_CARD_PROJECTION
+        ).to_list(None)
         content_dict = {content["id"]: content for content in content_list}
         
         # Combine recommendations with content details
@@ -325,4 +294,92 @@ class RecommendationEngine:
                     "content": content
                 })
         
-        return result
\ No newline at end of file
+        return result
+
+class RecommendationContext:
+    """Snapshot of one profile's data shared by the algorithms of a single run.
+    
+    Loads watch history, reviews and my list concurrently, then resolves the
+    genres of every referenced title with one bulk content query.
+    """
+    
+    def __init__(
+        self,
+        profile_id: str,
+        watch_history: List[Dict[str, Any]],
+        reviews: List[Dict[str, Any]],
+        my_list: List[Dict[str, Any]],
+        content: Dict[str, Dict[str, Any]]
+    ):
+        self.profile_id = profile_id
+        self.watch_history = watch_history
+        self.reviews = reviews
+        self.my_list = my_list
+        self.content = content
+    
+    @classmethod
+    async def load(
+        cls,
+        db: AsyncIOMotorDatabase,
+        profile_id: str,
+        watch_buffer: Optional[WatchProgressBuffer] = None
+    ) -> "RecommendationContext":
+        """Fetch everything the recommendation algorithms need for a profile."""
+        query = {"profile_id": profile_id}
+        watch_history, reviews, my_list = await asyncio.gather(
+            db.watch_history.find(query, {"_id": 0}).to_list(None),
+            db.reviews.find(query, {"_id": 0}).to_list(None),
+            db.my_list.find(query, {"_id": 0}).to_list(None)
+        )
+        if watch_buffer is not None:
+            watch_buffer.overlay(watch_history)
+        
+        content_ids = list({item["content_id"] for item in watch_history + reviews})
+        content = {}
+        if content_ids:
+            content_list = await db.content.find(
+                {"id": {"$in": content_ids}},
+                CONTENT_ENGINE_PROJECTION
+            ).to_list(None)
+            content = {item["id"]: item for item in content_list}
+        
+        return cls(profile_id, watch_history, reviews, my_list, content)
+    
+    @property
+    def watched_content_ids(self) -> List[str]:
+        return [item["content_id"] for item in self.watch_history]
+    
+    @property
+    def user_content_ids(self) -> List[str]:
+        """Watched and rated content, without duplicates."""
+        return list(set(self.watched_content_ids + [item["content_id"] for item in self.reviews]))
+    
+    @property
+    def user_ratings(self) -> Dict[str, float]:
+        return {item["content_id"]: item["rating"] for item in self.reviews}
+    
+    def top_genres(self, content_ids: List[str], limit: int, per_view: bool = False) -> List[int]:
+        """Most common genres across the given content.
+        
+        With ``per_view`` every entry of ``content_ids`` counts, otherwise each
+        title counts once.
+        """
+        if not per_view:
+            content_ids = list(set(content_ids))
+        
+        genre_counts = {}
+        for content_id in content_ids:
+            for genre in self.content.get(content_id, {}).get("genre_ids", []):
+                genre_counts[genre] = genre_counts.get(genre, 0) + 1
+        
+        top_genres = sorted(genre_counts.items(), key=lambda x: x[1], reverse=True)[:limit]
+        return [genre[0] for genre in top_genres]
+    
+    def continue_watching(self, limit: int) -> List[str]:
+        """Titles between 5% and 90% watched that are still in progress."""
+        in_progress = [
+            item for item in self.watch_history
+            if 5 < item.get("progress", 0) < 90 and item.get("status") == "watching"
+        ]
+        in_progress.sort(key=lambda item: item["last_watched"], reverse=True)
+        return [item["content_id"] for item in in_progress[:limit]]
@@ -0,0 +1,228 @@
+"""Review writes and the content rating aggregates they maintain.
+
+Every write turns into a delta on ``rating_sum``, ``total_ratings`` and
+``total_reviews`` of the reviewed content, applied with a single atomic
+update that also recomputes ``average_rating`` from the new totals. Reaction
+writes apply ``$inc`` deltas to the review's ``likes``/``dislikes``.
+Nothing here rescans the reviews collection; the reconcile-ratings command
+repairs drift in bulk.
+"""
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from datetime import datetime
+import uuid
+from fastapi import HTTPException, status
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument, UpdateOne
+
+REACTION_TYPES = ("like", "dislike")
+REACTION_FIELDS = {"like": "likes", "dislike": "dislikes"}
+
+# Content aggregate fields maintained from reviews
+AGGREGATE_PROJECTION = {"_id": 0, "id": 1, "rating_sum": 1, "total_ratings": 1, "total_reviews": 1}
+
+def has_text(review: Dict[str, Any]) -> bool:
+    """Whether a review counts towards total_reviews, not only total_ratings."""
+    return bool((review.get("review_text") or "").strip())
+
+def aggregate_update(rating_delta: float, ratings_delta: int, reviews_delta: int) -> List[Dict[str, Any]]:
+    """Update pipeline adding deltas to a content's totals and refreshing its average.
+
+    Documents written before ``rating_sum`` existed derive it from their
+    average and count.
+    """
+    def add(field: str, delta: Any, missing: Any = 0) -> Dict[str, Any]:
+        return {"$add": [{"$ifNull": [f"${field}", missing]}, delta]}
+
+    legacy_sum = {"$multiply": [{"$ifNull": ["$average_rating", 0]}, {"$ifNull": ["$total_ratings", 0]}]}
+    return [
+        {
+            "$set": {
+                "rating_sum": add("rating_sum", rating_delta, legacy_sum),
+                "total_ratings": add("total_ratings", ratings_delta),
+                "total_reviews": add("total_reviews", reviews_delta)
+            }
+        },
+        {
+            "$set": {
+                "average_rating": {
+                    "$cond": [
+                        {"$gt": ["$total_ratings", 0]},
+                        {"$round": [{"$divide": ["$rating_sum", "$total_ratings"]}, 4]},
+                        0.0
+                    ]
+                }
+            }
+        }
+    ]
+
+async def apply_review_delta(
+    db: AsyncIOMotorDatabase,
+    content_id: str,
+    rating_delta: float,
+    ratings_delta: int = 0,
+    reviews_delta: int = 0
+) -> None:
+    """Atomically apply one review write to its content's aggregates."""
+    if rating_delta or ratings_delta or reviews_delta:
+        await db.content.update_one(
+            {"id": content_id},
+            aggregate_update(rating_delta, ratings_delta, reviews_delta)
+        )
+
+async def create_review(db: AsyncIOMotorDatabase, review: Dict[str, Any]) -> None:
+    """Insert a review and count it on its content."""
+    await db.reviews.insert_one(review)
+    await apply_review_delta(db, review["content_id"], review["rating"], 1, int(has_text(review)))
+
+async def update_review(
+    db: AsyncIOMotorDatabase,
+    review_id: str,
+    changes: Dict[str, Any]
+) -> Optional[Dict[str, Any]]:
+    """Update a review and apply the difference to its content; returns the new review."""
+    changes = {**changes, "updated_at": datetime.utcnow()}
+    before = await db.reviews.find_one_and_update(
+        {"id": review_id},
+        {"$set": changes},
+        projection={"_id": 0},
+        return_document=ReturnDocument.BEFORE
+    )
+    if before is None:
+        return None
+    after = {**before, **changes}
+    await apply_review_delta(
+        db,
+        before["content_id"],
+        after["rating"] - before["rating"],
+        0,
+        int(has_text(after)) - int(has_text(before))
+    )
+    return after
+
+async def delete_review(db: AsyncIOMotorDatabase, review_id: str) -> Optional[Dict[str, Any]]:
+    """Delete a review and its reactions and uncount it; returns the deleted review."""
+    review = await db.reviews.find_one_and_delete({"id": review_id}, projection={"_id": 0})
+    if review is None:
+        return None
+    await db.review_reactions.delete_many({"review_id": review_id})
+    await apply_review_delta(db, review["content_id"], -review["rating"], -1, -int(has_text(review)))
+    return review
+
+async def set_reaction(
+    db: AsyncIOMotorDatabase,
+    review_id: str,
+    profile_id: str,
+    reaction_type: str
+) -> None:
+    """Record a profile's reaction to a review, moving its count if it changed."""
+    if reaction_type not in REACTION_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Reaction must be 'like' or 'dislike'"
+        )
+    previous = await db.review_reactions.find_one_and_update(
+        {"review_id": review_id, "profile_id": profile_id},
+        {
+            "$set": {"reaction_type": reaction_type},
+            "$setOnInsert": {"id": str(uuid.uuid4()), "created_at": datetime.utcnow()}
+        },
+        projection={"_id": 0, "reaction_type": 1},
+        upsert=True,
+        return_document=ReturnDocument.BEFORE
+    )
+    previous_type = previous["reaction_type"] if previous else None
+    if previous_type == reaction_type:
+        return
+    increments = {REACTION_FIELDS[reaction_type]: 1}
+    if previous_type in REACTION_FIELDS:
+        increments[REACTION_FIELDS[previous_type]] = -1
+    await db.reviews.update_one({"id": review_id}, {"$inc": increments})
+
+async def remove_reaction(db: AsyncIOMotorDatabase, review_id: str, profile_id: str) -> bool:
+    """Withdraw a profile's reaction to a review."""
+    reaction = await db.review_reactions.find_one_and_delete(
+        {"review_id": review_id, "profile_id": profile_id},
+        projection={"_id": 0, "reaction_type": 1}
+    )
+    if reaction is None:
+        return False
+    if reaction["reaction_type"] in REACTION_FIELDS:
+        await db.reviews.update_one(
+            {"id": review_id},
+            {"$inc": {REACTION_FIELDS[reaction["reaction_type"]]: -1}}
+        )
+    return True
+
+async def delete_profile_reviews(db: AsyncIOMotorDatabase, profile_id: str) -> List[str]:
+    """Delete a profile's reviews and reactions, uncounting both; returns affected content IDs."""
+    reactions = await db.review_reactions.find(
+        {"profile_id": profile_id},
+        {"_id": 0, "review_id": 1, "reaction_type": 1}
+    ).to_list(None)
+    await db.review_reactions.delete_many({"profile_id": profile_id})
+    reaction_updates = [
+        UpdateOne({"id": reaction["review_id"]}, {"$inc": {REACTION_FIELDS[reaction["reaction_type"]]: -1}})
+        for reaction in reactions if reaction["reaction_type"] in REACTION_FIELDS
+    ]
+    if reaction_updates:
+        await db.reviews.bulk_write(reaction_updates, ordered=False)
+
+    reviews = await db.reviews.find(
+        {"profile_id": profile_id},
+        {"_id": 0, "id": 1, "content_id": 1, "rating": 1, "review_text": 1}
+    ).to_list(None)
+    if not reviews:
+        return []
+    review_ids = [review["id"] for review in reviews]
+    await db.reviews.delete_many({"id": {"$in": review_ids}})
+    await db.review_reactions.delete_many({"review_id": {"$in": review_ids}})
+    await db.content.bulk_write([
+        UpdateOne({"id": review["content_id"]}, aggregate_update(-review["rating"], -1, -int(has_text(review))))
+        for review in reviews
+    ], ordered=False)
+    return [review["content_id"] for review in reviews]
+
+def expected_aggregates(reviews: Iterable[Dict[str, Any]]) -> Dict[str, Tuple[float, int, int]]:
+    """(rating_sum, total_ratings, total_reviews) per content from review rows."""
+    totals: Dict[str, List[Any]] = {}
+    for review in reviews:
+        entry = totals.setdefault(review["content_id"], [0.0, 0, 0])
+        entry[0] += review["rating"]
+        entry[1] += 1
+        entry[2] += int(has_text(review))
+    return {content_id: tuple(entry) for content_id, entry in totals.items()}
+
+def reconcile_requests(
+    content: Iterable[Dict[str, Any]],
+    expected: Dict[str, Tuple[float, int, int]]
+) -> Iterator[UpdateOne]:
+    """Updates for content whose stored aggregates differ from the expected ones."""
+    for item in content:
+        rating_sum, total_ratings, total_reviews = expected.get(item["id"], (0.0, 0, 0))
+        stored = (item.get("rating_sum"), item.get("total_ratings"), item.get("total_reviews"))
+        if (
+            stored[0] is not None and abs(stored[0] - rating_sum) < 1e-6
+            and stored[1] == total_ratings and stored[2] == total_reviews
+        ):
+            continue
+        yield UpdateOne({"id": item["id"]}, {"$set": {
+            "rating_sum": rating_sum,
+            "total_ratings": total_ratings,
+            "total_reviews": total_reviews,
+            "average_rating": round(rating_sum / total_ratings, 4) if total_ratings else 0.0
+        }})
+
+def reaction_reconcile_requests(
+    reviews: Iterable[Dict[str, Any]],
+    counts: Dict[str, Dict[str, int]]
+) -> Iterator[UpdateOne]:
+    """Updates for reviews whose likes/dislikes differ from their reaction rows."""
+    for review in reviews:
+        expected = counts.get(review["id"], {})
+        changes = {
+            field: expected.get(reaction_type, 0)
+            for reaction_type, field in REACTION_FIELDS.items()
+            if review.get(field) != expected.get(reaction_type, 0)
+        }
+        if changes:
+            yield UpdateOne({"id": review["id"]}, {"$set": changes})
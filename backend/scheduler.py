@@ -0,0 +1,239 @@
+from typing import Any, Dict, List, Set, Tuple
+from datetime import datetime, timedelta, timezone
+import asyncio
+import itertools
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+RECOMMENDATION_WORKERS = int(os.getenv("RECOMMENDATION_WORKERS", "4"))
+RECOMMENDATION_MAX_PENDING = int(os.getenv("RECOMMENDATION_MAX_PENDING", "10000"))
+RECOMMENDATION_DEBOUNCE_SECONDS = float(os.getenv("RECOMMENDATION_DEBOUNCE_SECONDS", "30"))
+RECOMMENDATION_MIN_INTERVAL_SECONDS = float(os.getenv("RECOMMENDATION_MIN_INTERVAL_SECONDS", "300"))
+RECOMMENDATION_STALE_HOURS = float(os.getenv("RECOMMENDATION_STALE_HOURS", "6"))
+RECOMMENDATION_SWEEP_SECONDS = float(os.getenv("RECOMMENDATION_SWEEP_SECONDS", "600"))
+RECOMMENDATION_ACTIVE_DAYS = float(os.getenv("RECOMMENDATION_ACTIVE_DAYS", "14"))
+RECOMMENDATION_JOB_TIMEOUT_SECONDS = float(os.getenv("RECOMMENDATION_JOB_TIMEOUT_SECONDS", "60"))
+
+# Priority classes, lower runs first. Within a class the most recently active
+# profile runs first.
+PRIORITY_URGENT = 0
+PRIORITY_ACTIVE = 1
+PRIORITY_STALE = 2
+
+class RecommendationScheduler:
+    """Background precompute of recommendations for stale profiles.
+
+    Writes mark a profile dirty. Dirty profiles are debounced so that a burst
+    of playback heartbeats triggers one regeneration, then moved into a
+    priority queue served by a fixed pool of workers. A periodic sweep queues
+    recently active profiles whose stored recommendations have gone stale.
+    The queue is bounded: once ``max_pending`` profiles are waiting, non-urgent
+    work is dropped and left for the next sweep.
+    """
+
+    def __init__(
+        self,
+        engine: Any,
+        workers: int = RECOMMENDATION_WORKERS,
+        max_pending: int = RECOMMENDATION_MAX_PENDING,
+        debounce_seconds: float = RECOMMENDATION_DEBOUNCE_SECONDS,
+        min_interval_seconds: float = RECOMMENDATION_MIN_INTERVAL_SECONDS,
+        stale_after: timedelta = timedelta(hours=RECOMMENDATION_STALE_HOURS),
+        sweep_seconds: float = RECOMMENDATION_SWEEP_SECONDS,
+        active_window: timedelta = timedelta(days=RECOMMENDATION_ACTIVE_DAYS),
+        job_timeout_seconds: float = RECOMMENDATION_JOB_TIMEOUT_SECONDS
+    ):
+        self.engine = engine
+        self.db = engine.db
+        self.workers = workers
+        self.max_pending = max_pending
+        self.debounce_seconds = debounce_seconds
+        self.min_interval_seconds = min_interval_seconds
+        self.stale_after = stale_after
+        self.sweep_seconds = sweep_seconds
+        self.active_window = active_window
+        self.job_timeout_seconds = job_timeout_seconds
+
+        self._queue: "asyncio.PriorityQueue[Tuple[int, float, int, str]]" = asyncio.PriorityQueue()
+        self._counter = itertools.count()
+        self._pending: Dict[str, Tuple[int, float]] = {}
+        self._dirty: Dict[str, float] = {}
+        self._running: Set[str] = set()
+        self._rerun: Set[str] = set()
+        self._last_generated: Dict[str, float] = {}
+        self._tasks: List[asyncio.Task] = []
+
+        self.enqueued = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.completed = 0
+        self.failed = 0
+        self.total_seconds = 0.0
+
+    async def start(self) -> None:
+        """Start the worker pool, the debounce loop and the staleness sweep."""
+        if self._tasks:
+            return
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._debounce_loop()))
+        self._tasks.append(asyncio.create_task(self._sweep_loop()))
+        logger.info("Recommendation scheduler started with %d workers", self.workers)
+
+    async def stop(self) -> None:
+        """Cancel all background tasks."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def mark_dirty(self, profile_id: str) -> None:
+        """Record that a profile's inputs changed; it is queued after the debounce."""
+        self._dirty[profile_id] = time.time()
+
+    def request(self, profile_id: str) -> None:
+        """Queue a profile ahead of everything else, e.g. when it has no recommendations."""
+        now = time.time()
+        if now - self._last_generated.get(profile_id, 0.0) < self.min_interval_seconds:
+            return
+        self._enqueue(profile_id, PRIORITY_URGENT, now)
+
+    def _enqueue(self, profile_id: str, priority: int, last_active: float) -> bool:
+        """Add a profile to the queue, coalescing with any entry already waiting."""
+        if profile_id in self._running:
+            self._rerun.add(profile_id)
+            self.coalesced += 1
+            return True
+
+        key = (priority, -last_active)
+        current = self._pending.get(profile_id)
+        if current is not None:
+            if current <= key:
+                self.coalesced += 1
+                return True
+        elif priority != PRIORITY_URGENT and len(self._pending) >= self.max_pending:
+            self.dropped += 1
+            return False
+
+        # A better entry supersedes the old one, which is skipped when popped
+        self._pending[profile_id] = key
+        self._queue.put_nowait((priority, -last_active, next(self._counter), profile_id))
+        self.enqueued += 1
+        return True
+
+    async def _debounce_loop(self) -> None:
+        """Move dirty profiles into the queue, at most once per min interval each."""
+        while True:
+            await asyncio.sleep(self.debounce_seconds)
+            now = time.time()
+            self._last_generated = {
+                profile_id: generated for profile_id, generated in self._last_generated.items()
+                if now - generated < self.min_interval_seconds
+            }
+            for profile_id, last_active in list(self._dirty.items()):
+                if now - self._last_generated.get(profile_id, 0.0) < self.min_interval_seconds:
+                    continue
+                del self._dirty[profile_id]
+                self._enqueue(profile_id, PRIORITY_ACTIVE, last_active)
+
+    async def _sweep_loop(self) -> None:
+        """Periodically queue active profiles whose recommendations are stale."""
+        while True:
+            try:
+                await self.sweep()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Recommendation staleness sweep failed")
+            await asyncio.sleep(self.sweep_seconds)
+
+    async def sweep(self) -> int:
+        """Queue recently active profiles with missing or stale recommendations."""
+        now = datetime.utcnow()
+        capacity = self.max_pending - len(self._pending)
+        if capacity <= 0:
+            return 0
+
+        active = await self.db.watch_history.aggregate([
+            {"$match": {"last_watched": {"$gte": now - self.active_window}}},
+            {"$group": {"_id": "$profile_id", "last_active": {"$max": "$last_watched"}}},
+            {"$sort": {"last_active": -1}},
+            {"$limit": capacity}
+        ]).to_list(None)
+        if not active:
+            return 0
+
+        profile_ids = [item["_id"] for item in active]
+        generated = await self.db.recommendations.aggregate([
+            {"$match": {"profile_id": {"$in": profile_ids}}},
+            {"$group": {"_id": "$profile_id", "created_at": {"$max": "$created_at"}}}
+        ]).to_list(None)
+        generated_at = {item["_id"]: item["created_at"] for item in generated}
+
+        queued = 0
+        for item in active:
+            created_at = generated_at.get(item["_id"])
+            if created_at is None or created_at < now - self.stale_after:
+                last_active = item["last_active"].replace(tzinfo=timezone.utc).timestamp()
+                if self._enqueue(item["_id"], PRIORITY_STALE, last_active):
+                    queued += 1
+        return queued
+
+    async def _worker(self, worker_id: int) -> None:
+        """Regenerate recommendations for queued profiles, one at a time."""
+        while True:
+            priority, negative_active, _, profile_id = await self._queue.get()
+            try:
+                if self._pending.get(profile_id) != (priority, negative_active):
+                    continue
+                del self._pending[profile_id]
+                await self._generate(profile_id)
+            finally:
+                self._queue.task_done()
+
+    async def _generate(self, profile_id: str) -> None:
+        self._running.add(profile_id)
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(
+                self.engine.generate_recommendations(profile_id),
+                timeout=self.job_timeout_seconds
+            )
+            self.completed += 1
+            self._last_generated[profile_id] = time.time()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.failed += 1
+            logger.exception("Generating recommendations for profile %s failed", profile_id)
+        finally:
+            self.total_seconds += time.perf_counter() - started
+            self._running.discard(profile_id)
+
+        if profile_id in self._rerun:
+            self._rerun.discard(profile_id)
+            self.mark_dirty(profile_id)
+
+    def forget(self, profile_id: str) -> None:
+        """Drop all scheduling state for a deleted profile."""
+        self._dirty.pop(profile_id, None)
+        self._pending.pop(profile_id, None)
+        self._rerun.discard(profile_id)
+        self._last_generated.pop(profile_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue depth and job counters."""
+        return {
+            "workers": self.workers,
+            "pending": len(self._pending),
+            "dirty": len(self._dirty),
+            "running": len(self._running),
+            "enqueued": self.enqueued,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+            "completed": self.completed,
+            "failed": self.failed,
+            "total_seconds": self.total_seconds
+        }
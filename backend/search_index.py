@@ -0,0 +1,231 @@
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from bisect import bisect_left, insort
+from datetime import datetime
+import asyncio
+import heapq
+import logging
+import math
+import os
+import re
+import unicodedata
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+logger = logging.getLogger(__name__)
+
+SEARCH_SYNC_SECONDS = float(os.getenv("SEARCH_SYNC_SECONDS", "60"))
+
+# Weight of a term by the field it appears in; a term keeps its best field
+FIELD_WEIGHTS = {"title": 3.0, "original_title": 2.0, "director": 1.5, "cast": 1.0}
+
+# Prefix matches count less than whole-word matches
+PREFIX_DISCOUNT = 0.7
+
+# A prefix expands to at most this many terms, the most frequent first;
+# one- and two-letter prefixes expand to fewer
+MAX_PREFIX_TERMS = 64
+SHORT_PREFIX_TERMS = 8
+
+SEARCH_PROJECTION = {
+    "_id": 0,
+    "id": 1,
+    "title": 1,
+    "original_title": 1,
+    "cast": 1,
+    "director": 1,
+    "content_type": 1,
+    "total_ratings": 1
+}
+
+_TOKEN_RE = re.compile(r"\w+")
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase, accent-free word tokens."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return _TOKEN_RE.findall(text)
+
+def _field_values(document: Dict[str, Any], field: str) -> List[str]:
+    value = document.get(field)
+    if not value:
+        return []
+    return value if isinstance(value, list) else [value]
+
+class ContentSearchIndex:
+    """In-process inverted index over content titles, cast and director.
+
+    Postings map each term to the weight it has in every title containing
+    it. A sorted vocabulary answers prefix lookups with two bisections, so
+    the last word of a query can be partially typed. Documents are added,
+    replaced and removed one at a time, and sync() applies content changed
+    since the previous sync.
+    """
+
+    def __init__(self, sync_interval: float = SEARCH_SYNC_SECONDS):
+        self.sync_interval = sync_interval
+        self._postings: Dict[str, Dict[str, float]] = {}
+        self._vocabulary: List[str] = []
+        self._documents: Dict[str, Dict[str, Any]] = {}
+        self.synced_at: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.synced_at is not None
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    @classmethod
+    def from_documents(cls, documents: Iterable[Dict[str, Any]], **kwargs: Any) -> "ContentSearchIndex":
+        """Build an index from content documents projected with SEARCH_PROJECTION."""
+        index = cls(**kwargs)
+        for document in documents:
+            index._add(document)
+        index._vocabulary = sorted(index._postings)
+        return index
+
+    def upsert(self, document: Dict[str, Any]) -> None:
+        """Index a content document, replacing any earlier version."""
+        self.remove(document["id"])
+        for term in self._add(document):
+            if len(self._postings[term]) == 1:
+                insort(self._vocabulary, term)
+
+    def remove(self, content_id: str) -> None:
+        """Drop a content item from the index."""
+        entry = self._documents.pop(content_id, None)
+        if entry is None:
+            return
+        for term in entry["terms"]:
+            postings = self._postings[term]
+            del postings[content_id]
+            if not postings:
+                del self._postings[term]
+                del self._vocabulary[bisect_left(self._vocabulary, term)]
+
+    def _add(self, document: Dict[str, Any]) -> List[str]:
+        weights: Dict[str, float] = {}
+        for field, weight in FIELD_WEIGHTS.items():
+            for value in _field_values(document, field):
+                for term in tokenize(value):
+                    if weights.get(term, 0.0) < weight:
+                        weights[term] = weight
+
+        content_id = document["id"]
+        for term, weight in weights.items():
+            self._postings.setdefault(term, {})[content_id] = weight
+        self._documents[content_id] = {
+            "title": document.get("title") or "",
+            "content_type": document.get("content_type"),
+            "boost": 1.0 + math.log1p(document.get("total_ratings") or 0) / 20,
+            "terms": tuple(weights)
+        }
+        return list(weights)
+
+    def _prefix_matches(self, prefix: str) -> Dict[str, float]:
+        """Documents containing a term starting with prefix, with the best weight."""
+        start = bisect_left(self._vocabulary, prefix)
+        stop = bisect_left(self._vocabulary, prefix + "\uffff", start)
+        terms = self._vocabulary[start:stop]
+        max_terms = SHORT_PREFIX_TERMS if len(prefix) <= 2 else MAX_PREFIX_TERMS
+        if len(terms) > max_terms:
+            terms = heapq.nlargest(max_terms, terms, key=lambda term: len(self._postings[term]))
+
+        matches: Dict[str, float] = {}
+        for term in terms:
+            factor = 1.0 if term == prefix else PREFIX_DISCOUNT
+            for content_id, weight in self._postings[term].items():
+                weight *= factor
+                if matches.get(content_id, 0.0) < weight:
+                    matches[content_id] = weight
+        return matches
+
+    def search(self, query: str, limit: int = 20, prefix: bool = True) -> List[Tuple[str, float]]:
+        """Ranked (content_id, score) pairs matching every word of the query.
+
+        With prefix, the last word also matches longer terms, unless the query
+        ends with whitespace.
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        partial = tokens.pop() if prefix and not query[-1:].isspace() else None
+
+        matches = [self._postings.get(term, {}) for term in tokens]
+        if partial is not None:
+            matches.append(self._prefix_matches(partial))
+        matches.sort(key=len)
+        if not matches[0]:
+            return []
+
+        scores: Dict[str, float] = {}
+        for content_id, weight in matches[0].items():
+            total = weight
+            for other in matches[1:]:
+                other_weight = other.get(content_id)
+                if other_weight is None:
+                    break
+                total += other_weight
+            else:
+                scores[content_id] = total * self._documents[content_id]["boost"]
+
+        return heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], item[0]))
+
+    def suggest(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Type-ahead suggestions served entirely from memory."""
+        return [
+            {
+                "id": content_id,
+                "title": self._documents[content_id]["title"],
+                "content_type": self._documents[content_id]["content_type"]
+            }
+            for content_id, _ in self.search(query, limit)
+        ]
+
+    async def sync(self, db: AsyncIOMotorDatabase) -> int:
+        """Index content changed since the last sync; returns the number applied."""
+        synced_at = datetime.utcnow()
+        query = {"updated_at": {"$gte": self.synced_at}} if self.synced_at else {}
+        changed = 0
+        async for document in db.content.find(query, SEARCH_PROJECTION, batch_size=5000):
+            self.upsert(document)
+            changed += 1
+        self.synced_at = synced_at
+        return changed
+
+    async def start(self, db: AsyncIOMotorDatabase) -> None:
+        """Build the index, then keep applying catalog changes in the background."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(db))
+
+    async def stop(self) -> None:
+        """Cancel the sync task."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self, db: AsyncIOMotorDatabase) -> None:
+        if not self.ready:
+            synced_at = datetime.utcnow()
+            documents = await db.content.find({}, SEARCH_PROJECTION).to_list(None)
+            loop = asyncio.get_running_loop()
+            built = await loop.run_in_executor(None, ContentSearchIndex.from_documents, documents)
+            self._postings, self._vocabulary, self._documents = built._postings, built._vocabulary, built._documents
+            self.synced_at = synced_at
+            logger.info("Search index ready with %d items", len(self))
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                await self.sync(db)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Syncing the search index failed")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return index size."""
+        return {
+            "documents": len(self._documents),
+            "terms": len(self._vocabulary)
+        }
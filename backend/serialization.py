@@ -0,0 +1,112 @@
+"""Fast JSON output for Mongo documents.
+
+List endpoints build their wire shape straight from projected documents and
+return a MongoJSONResponse, which skips the per-row Pydantic model round trip
+and the response_model re-validation. The ``response_model`` declared on each
+route still documents the schema in OpenAPI.
+"""
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Mapping, Optional
+from bson import ObjectId
+from fastapi.responses import ORJSONResponse, StreamingResponse
+import orjson
+from .projections import CONTENT_CARD_FIELDS
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Per-profile fields of ContentResponse and their defaults
+CONTENT_OVERLAY_DEFAULTS = {"user_rating": None, "in_my_list": False, "watch_progress": None}
+
+def _default(value: Any) -> Any:
+    """Encode types orjson does not handle natively."""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(content: Any) -> bytes:
+    """Serialize content to JSON bytes with orjson."""
+    return orjson.dumps(
+        content,
+        default=_default,
+        option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+    )
+
+class MongoJSONResponse(ORJSONResponse):
+    """orjson response that also accepts ObjectId values."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+def json_response(content: Any, headers: Optional[Mapping[str, str]] = None) -> MongoJSONResponse:
+    """Wrap already shaped data in a MongoJSONResponse."""
+    return MongoJSONResponse(content, headers=dict(headers) if headers else None)
+
+def wants_ndjson(accept: Optional[str]) -> bool:
+    """Whether an Accept header asks for newline-delimited JSON."""
+    return bool(accept) and NDJSON_MEDIA_TYPE in accept
+
+async def _ndjson_chunks(
+    cursor: Any,
+    transform: Optional[Callable[[Dict[str, Any]], Any]],
+    chunk_rows: int
+) -> AsyncIterator[bytes]:
+    chunk = []
+    async for row in cursor:
+        if transform is not None:
+            transform(row)
+        chunk.append(dumps(row))
+        if len(chunk) >= chunk_rows:
+            yield b"\n".join(chunk) + b"\n"
+            chunk = []
+    if chunk:
+        yield b"\n".join(chunk) + b"\n"
+
+def ndjson_response(
+    cursor: Any,
+    transform: Optional[Callable[[Dict[str, Any]], Any]] = None,
+    chunk_rows: int = 100,
+    headers: Optional[Mapping[str, str]] = None
+) -> StreamingResponse:
+    """Stream a Motor cursor as NDJSON, one row per line.
+    
+    Rows are written as the cursor yields them, so memory use is bounded by
+    the cursor batch rather than the result size. transform is applied to
+    each row in place before it is encoded.
+    """
+    return StreamingResponse(
+        _ndjson_chunks(cursor, transform, chunk_rows),
+        media_type=NDJSON_MEDIA_TYPE,
+        headers=dict(headers) if headers else None
+    )
+
+def strip_id(document: Dict[str, Any]) -> Dict[str, Any]:
+    """Drop Mongo's ``_id`` from a document in place."""
+    document.pop("_id", None)
+    return document
+
+def content_card(document: Mapping[str, Any]) -> Dict[str, Any]:
+    """ContentResponse-shaped dict from a content document."""
+    card = {field: document.get(field) for field in CONTENT_CARD_FIELDS}
+    card.update(CONTENT_OVERLAY_DEFAULTS)
+    return card
+
+def content_cards(documents: Iterable[Mapping[str, Any]]) -> List[Dict[str, Any]]:
+    return [content_card(document) for document in documents]
+
+def overlay_cards(
+    cards: List[Dict[str, Any]],
+    in_my_list: Iterable[str],
+    user_ratings: Mapping[str, float],
+    watch_progress: Mapping[str, float]
+) -> List[Dict[str, Any]]:
+    """Set the per-profile fields of content cards in place."""
+    in_my_list = set(in_my_list)
+    for card in cards:
+        content_id = card["id"]
+        card["in_my_list"] = content_id in in_my_list
+        if content_id in user_ratings:
+            card["user_rating"] = user_ratings[content_id]
+        if content_id in watch_progress:
+            card["watch_progress"] = watch_progress[content_id]
+    return cards
@@ -1,46 +1,121 @@
-from fastapi import FastAPI, APIRouter, Depends, HTTPException, status, Query
+from fastapi import FastAPI, APIRouter, Depends, Header, HTTPException, Request, Response, status, Query
 from fastapi.security import HTTPBearer
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 import os
 import logging
 from pathlib import Path
 from datetime import datetime, timedelta
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 import asyncio
 
 # Import models and utilities
 from models import *
 from auth import *
+from analytics import ViewingAnalytics, genre_preferences, viewing_stats
+from cache import cache_backend
 from database import get_database, create_indexes
+from metrics import PROMETHEUS_CONTENT_TYPE, EventLoopLagMonitor, MetricsMiddleware, registry
+from projections import (
+    CONTENT_CARD_PROJECTION, MY_LIST_FIELDS, REVIEW_RESPONSE_PROJECTION, WATCH_HISTORY_FIELDS,
+    content_lookup_stages
+)
+from serialization import (
+    MongoJSONResponse, content_card, content_cards, dumps, json_response, ndjson_response, overlay_cards,
+    wants_ndjson
+)
+from catalog_cache import CatalogEntry, catalog_cache, conditional_response, make_etag
+from pagination import NEXT_CURSOR_HEADER, keyset_filter, keyset_sort, next_cursor
 from recommendation_engine import RecommendationEngine
+from reviews import create_review, delete_profile_reviews, delete_review, remove_reaction, set_reaction, update_review
+from scheduler import RecommendationScheduler
+from trending import TrendingView
+from search_index import ContentSearchIndex
+from single_flight import SingleFlight, single_flight_stats
+from tmdb_proxy import TMDBProxy
+from watch_buffer import WatchProgressBuffer
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 # Create the main app
-app = FastAPI(title="Netflix Clone API", version="1.0.0")
+app = FastAPI(title="Netflix Clone API", version="1.0.0", default_response_class=MongoJSONResponse)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
 # Initialize recommendation engine
 recommendation_engine = None
+recommendation_scheduler = None
+watch_buffer = None
+trending_view = None
+viewing_analytics = None
+
+# Rows fetched per cursor batch when streaming NDJSON exports
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "500"))
+search_index = ContentSearchIndex()
+# Concurrent identical catalog cache misses share one query; keys include the
+# cache generation so requests after an invalidation never join an older read
+catalog_flight = SingleFlight("catalog")
+tmdb_proxy = TMDBProxy()
+loop_lag_monitor = EventLoopLagMonitor()
 
 @app.on_event("startup")
 async def startup_event():
     """Initialize the application."""
-    global recommendation_engine
+    global recommendation_engine, recommendation_scheduler, watch_buffer, trending_view, viewing_analytics
     db = await get_database()
-    recommendation_engine = RecommendationEngine(db)
+    await cache_backend.start()
+    viewing_analytics = ViewingAnalytics(db)
+    await viewing_analytics.start()
+    watch_buffer = WatchProgressBuffer(db, analytics=viewing_analytics)
+    await watch_buffer.start()
     await create_indexes()
+    trending_view = TrendingView(db)
+    await trending_view.start()
+    recommendation_engine = RecommendationEngine(db, watch_buffer, trending_view)
+    app.state.content_index_task = asyncio.create_task(recommendation_engine.load_content_index())
+    await search_index.start(db)
+    recommendation_scheduler = RecommendationScheduler(recommendation_engine)
+    await recommendation_scheduler.start()
+    await loop_lag_monitor.start()
+    if not tmdb_proxy.key_pool.keys:
+        logging.error("TMDB_API_KEYS is not set; /api/tmdb requests will fail with 503")
+    
+    # Component counters exported on /metrics
+    registry.register_stats("cache", cache_backend.stats)
+    registry.register_stats("catalog_cache", catalog_cache.stats)
+    registry.register_stats("single_flight", single_flight_stats)
+    registry.register_stats("password_pool", password_pool.stats)
+    registry.register_stats("watch_buffer", watch_buffer.stats)
+    registry.register_stats("viewing_analytics", viewing_analytics.stats)
+    registry.register_stats("trending", trending_view.stats)
+    registry.register_stats("search_index", search_index.stats)
+    registry.register_stats("tmdb_proxy", tmdb_proxy.stats)
+    registry.register_stats("recommendation_scheduler", recommendation_scheduler.stats)
+    registry.register_stats("event_loop", loop_lag_monitor.stats)
     logging.info("Application started successfully")
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Cleanup on shutdown."""
     from database import close_database
+    await loop_lag_monitor.stop()
+    if recommendation_scheduler:
+        await recommendation_scheduler.stop()
+    await search_index.stop()
+    await tmdb_proxy.close()
+    if trending_view:
+        await trending_view.stop()
+    if watch_buffer:
+        await watch_buffer.stop()
+    if viewing_analytics:
+        await viewing_analytics.stop()
     await close_database()
+    await cache_backend.close()
+    password_pool.shutdown()
     logging.info("Application shutdown")
 
 # AUTHENTICATION ROUTES
@@ -66,7 +141,7 @@ async def register_user(
         )
     
     # Create user
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash_async(user_data.password)
     user = User(
         email=user_data.email,
         username=user_data.username,
@@ -95,6 +170,8 @@ async def register_user(
         {"id": user.id},
         {"$push": {"profiles": default_profile.id}}
     )
+    await invalidate_cached_user(user.id)
+    await remember_profile_owner(default_profile.id, user.id)
     
     # Return user with profiles
     user_response = UserResponse(
@@ -202,6 +279,8 @@ async def create_profile(
         {"id": current_user.id},
         {"$push": {"profiles": profile.id}}
     )
+    await invalidate_cached_user(current_user.id)
+    await remember_profile_owner(profile.id, current_user.id)
     
     return profile
 
@@ -211,20 +290,16 @@ async def get_user_profiles(
     db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Get all profiles for the current user."""
-    profiles_data = await db.profiles.find({"user_id": current_user.id}).to_list(None)
-    return [Profile(**profile) for profile in profiles_data]
+    profiles_data = await db.profiles.find({"user_id": current_user.id}, {"_id": 0}).to_list(None)
+    return json_response(profiles_data)
 
 @api_router.get("/profiles/{profile_id}", response_model=Profile)
 async def get_profile(
-    profile_id: str,
-    current_user: User = Depends(get_current_active_user),
+    profile_id: str = Depends(verify_profile_owner),
     db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Get a specific profile."""
-    profile_data = await db.profiles.find_one({
-        "id": profile_id,
-        "user_id": current_user.id
-    })
+    profile_data = await db.profiles.find_one({"id": profile_id})
     if not profile_data:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -235,54 +310,36 @@ async def get_profile(
 
 @api_router.put("/profiles/{profile_id}", response_model=Profile)
 async def update_profile(
-    profile_id: str,
     profile_update: ProfileUpdate,
-    current_user: User = Depends(get_current_active_user),
+    profile_id: str = Depends(verify_profile_owner),
     db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Update a profile."""
-    # Check if profile belongs to current user
-    existing_profile = await db.profiles.find_one({
-        "id": profile_id,
-        "user_id": current_user.id
-    })
-    if not existing_profile:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Profile not found"
-        )
-    
-    # Update profile
     update_data = {k: v for k, v in profile_update.dict().items() if v is not None}
     update_data["updated_at"] = datetime.utcnow()
     
-    await db.profiles.update_one(
+    # Update profile and return the new version in one round trip
+    updated_profile = await db.profiles.find_one_and_update(
         {"id": profile_id},
-        {"$set": update_data}
+        {"$set": update_data},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
     )
+    if not updated_profile:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile not found"
+        )
     
-    # Return updated profile
-    updated_profile = await db.profiles.find_one({"id": profile_id})
     return Profile(**updated_profile)
 
 @api_router.delete("/profiles/{profile_id}")
 async def delete_profile(
-    profile_id: str,
+    profile_id: str = Depends(verify_profile_owner),
     current_user: User = Depends(get_current_active_user),
     db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Delete a profile."""
-    # Check if profile belongs to current user
-    existing_profile = await db.profiles.find_one({
-        "id": profile_id,
-        "user_id": current_user.id
-    })
-    if not existing_profile:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Profile not found"
-        )
-    
     # Don't allow deleting the last profile
     profile_count = await db.profiles.count_documents({"user_id": current_user.id})
     if profile_count <= 1:
@@ -293,9 +350,18 @@ async def delete_profile(
     
     # Delete profile and related data
     await db.profiles.delete_one({"id": profile_id})
+    await forget_profile_owner(profile_id)
+    await watch_buffer.discard_profile(profile_id)
+    await viewing_analytics.discard_profile(profile_id)
     await db.watch_history.delete_many({"profile_id": profile_id})
+    await db.viewing_rollups.delete_many({"profile_id": profile_id})
+    await db.viewing_totals.delete_many({"profile_id": profile_id})
     await db.my_list.delete_many({"profile_id": profile_id})
-    await db.reviews.delete_many({"profile_id": profile_id})
+    reviewed_content_ids = await delete_profile_reviews(db, profile_id)
+    if reviewed_content_ids:
+        await catalog_cache.invalidate()
+    recommendation_engine.user_item_matrix.discard(profile_id)
+    recommendation_scheduler.forget(profile_id)
     await db.recommendations.delete_many({"profile_id": profile_id})
     
     # Remove from user's profile list
@@ -303,104 +369,174 @@ async def delete_profile(
         {"id": current_user.id},
         {"$pull": {"profiles": profile_id}}
     )
+    await invalidate_cached_user(current_user.id)
     
     return {"message": "Profile deleted successfully"}
 
 # CONTENT ROUTES
+async def apply_profile_overlay(
+    db: AsyncIOMotorDatabase,
+    profile_id: Optional[str],
+    content_responses: List[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    """Merge my-list, rating and watch progress for a profile onto content rows.
+    
+    Each collection is queried once with ``$in`` over the page and the three
+    queries run concurrently, so the cost does not grow with the page size.
+    """
+    if not profile_id or not content_responses:
+        return content_responses
+    
+    content_ids = [content["id"] for content in content_responses]
+    query = {"profile_id": profile_id, "content_id": {"$in": content_ids}}
+    my_list_entries, user_reviews, watch_entries = await asyncio.gather(
+        db.my_list.find(query, {"_id": 0, "content_id": 1}).to_list(None),
+        db.reviews.find(query, {"_id": 0, "content_id": 1, "rating": 1}).to_list(None),
+        db.watch_history.find(query, {"_id": 0, "content_id": 1, "progress": 1}).to_list(None)
+    )
+    
+    watch_buffer.overlay(watch_entries, profile_id)
+    return overlay_cards(
+        content_responses,
+        (entry["content_id"] for entry in my_list_entries),
+        {review["content_id"]: review["rating"] for review in user_reviews},
+        {entry["content_id"]: entry["progress"] for entry in watch_entries}
+    )
+
+async def load_catalog_page(
+    db: AsyncIOMotorDatabase,
+    cache_key: Tuple[Any, ...],
+    content_type: Optional[ContentType],
+    genre_ids: Optional[List[int]],
+    limit: int,
+    cursor: Optional[str],
+    skip: int
+) -> CatalogEntry:
+    """Query a catalog page and store it in the catalog cache."""
+    generation = catalog_cache.generation
+    query = keyset_filter("average_rating", cursor)
+    if content_type:
+        query["content_type"] = content_type
+    if genre_ids:
+        query["genre_ids"] = {"$in": genre_ids}
+    
+    content_cursor = db.content.find(query, CONTENT_CARD_PROJECTION).sort(keyset_sort("average_rating"))
+    if skip and not cursor:
+        content_cursor = content_cursor.skip(skip)
+    content_list = await content_cursor.limit(limit).to_list(None)
+    
+    page_cursor = next_cursor(content_list, "average_rating", limit)
+    return await catalog_cache.set_page(cache_key, content_cards(content_list), page_cursor, generation)
+
+async def load_catalog_item(db: AsyncIOMotorDatabase, content_id: str) -> CatalogEntry:
+    """Load one content card and store it in the catalog cache; 404 if missing."""
+    generation = catalog_cache.generation
+    content = await db.content.find_one({"id": content_id}, CONTENT_CARD_PROJECTION)
+    if not content:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Content not found"
+        )
+    return await catalog_cache.set_item(content_id, content_card(content), generation)
+
 @api_router.get("/content", response_model=List[ContentResponse])
 async def get_content(
     content_type: Optional[ContentType] = None,
     genre_ids: Optional[List[int]] = Query(None),
     limit: int = 20,
-    skip: int = 0,
+    cursor: Optional[str] = None,
+    skip: int = Query(0, deprecated=True),
     profile_id: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
     current_user: User = Depends(get_current_active_user),
     db: AsyncIOMotorDatabase = Depends(get_database)
 ):
-    """Get content with optional filtering."""
-    query = {}
-    if content_type:
-        query["content_type"] = content_type
-    if genre_ids:
-        query["genre_ids"] = {"$in": genre_ids}
+    """Get content with optional filtering.
+    
+    Results are ordered by ``(average_rating, id)`` descending. Pass the
+    ``X-Next-Cursor`` response header back as ``cursor`` to fetch the next page.
+    Responses carry a strong ``ETag`` and honour ``If-None-Match``.
+    """
+    cache_key = catalog_cache.page_key(content_type, genre_ids, limit, cursor, skip)
+    page = await catalog_cache.get_page(cache_key)
+    if page is None:
+        page = await catalog_flight.run(
+            ("page", catalog_cache.generation, *cache_key),
+            lambda: load_catalog_page(db, cache_key, content_type, genre_ids, limit, cursor, skip)
+        )
     
-    content_list = await db.content.find(query).skip(skip).limit(limit).to_list(None)
-    
-    # If profile_id provided, get user-specific data
-    content_responses = []
-    for content in content_list:
-        content_response = ContentResponse(**content)
-        
-        if profile_id:
-            # Check if in my list
-            my_list_entry = await db.my_list.find_one({
-                "profile_id": profile_id,
-                "content_id": content["id"]
-            })
-            content_response.in_my_list = bool(my_list_entry)
-            
-            # Get user rating
-            user_review = await db.reviews.find_one({
-                "profile_id": profile_id,
-                "content_id": content["id"]
-            })
-            if user_review:
-                content_response.user_rating = user_review["rating"]
-            
-            # Get watch progress
-            watch_history = await db.watch_history.find_one({
-                "profile_id": profile_id,
-                "content_id": content["id"]
-            })
-            if watch_history:
-                content_response.watch_progress = watch_history["progress"]
-        
-        content_responses.append(content_response)
-    
-    return content_responses
+    headers = {NEXT_CURSOR_HEADER: page.next_cursor} if page.next_cursor else None
+    if not profile_id:
+        return conditional_response(page.body, page.etag, if_none_match, headers)
+    
+    # Merge user-specific data onto copies of the cached cards
+    content_responses = [dict(card) for card in page.data]
+    await apply_profile_overlay(db, profile_id, content_responses)
+    body = dumps(content_responses)
+    return conditional_response(body, make_etag(body), if_none_match, headers, shared=False)
 
 @api_router.get("/content/{content_id}", response_model=ContentResponse)
 async def get_content_by_id(
     content_id: str,
     profile_id: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
     current_user: User = Depends(get_current_active_user),
     db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Get specific content by ID."""
-    content = await db.content.find_one({"id": content_id})
-    if not content:
+    item = await catalog_cache.get_item(content_id)
+    if item is None:
+        item = await catalog_flight.run(
+            ("item", catalog_cache.generation, content_id),
+            lambda: load_catalog_item(db, content_id)
+        )
+    
+    if not profile_id:
+        return conditional_response(item.body, item.etag, if_none_match)
+    
+    content_response = dict(item.data)
+    await apply_profile_overlay(db, profile_id, [content_response])
+    body = dumps(content_response)
+    return conditional_response(body, make_etag(body), if_none_match, shared=False)
+
+# SEARCH ROUTES
+@api_router.get("/search", response_model=List[ContentResponse])
+async def search_content(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    profile_id: Optional[str] = None,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Search titles, cast and director; the last word may be partially typed."""
+    if not search_index.ready:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Content not found"
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Search index is loading"
         )
     
-    content_response = ContentResponse(**content)
-    
-    if profile_id:
-        # Check if in my list
-        my_list_entry = await db.my_list.find_one({
-            "profile_id": profile_id,
-            "content_id": content_id
-        })
-        content_response.in_my_list = bool(my_list_entry)
-        
-        # Get user rating
-        user_review = await db.reviews.find_one({
-            "profile_id": profile_id,
-            "content_id": content_id
-        })
-        if user_review:
-            content_response.user_rating = user_review["rating"]
-        
-        # Get watch progress
-        watch_history = await db.watch_history.find_one({
-            "profile_id": profile_id,
-            "content_id": content_id
-        })
-        if watch_history:
-            content_response.watch_progress = watch_history["progress"]
-    
-    return content_response
+    content_ids = [content_id for content_id, _ in search_index.search(q, limit)]
+    if not content_ids:
+        return json_response([])
+    
+    content_list = await db.content.find(
+        {"id": {"$in": content_ids}},
+        CONTENT_CARD_PROJECTION
+    ).to_list(None)
+    cards = {content["id"]: content_card(content) for content in content_list}
+    content_responses = [cards[content_id] for content_id in content_ids if content_id in cards]
+    
+    await apply_profile_overlay(db, profile_id, content_responses)
+    return json_response(content_responses)
+
+@api_router.get("/search/suggest", response_model=List[Dict[str, Any]])
+async def suggest_content(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(10, ge=1, le=50),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Type-ahead title suggestions, answered from the in-memory index."""
+    return json_response(search_index.suggest(q, limit))
 
 # WATCH HISTORY ROUTES
 @api_router.post("/watch-history", response_model=WatchHistory)
@@ -411,80 +547,52 @@ async def update_watch_history(
 ):
     """Update watch history for a profile."""
     # Verify profile belongs to user
-    profile = await db.profiles.find_one({
-        "id": watch_data.profile_id,
-        "user_id": current_user.id
-    })
-    if not profile:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Profile not found or access denied"
-        )
+    await ensure_profile_access(db, current_user, watch_data.profile_id)
     
-    # Update or create watch history
-    existing_history = await db.watch_history.find_one({
-        "profile_id": watch_data.profile_id,
-        "content_id": watch_data.content_id
-    })
+    # Heartbeats are coalesced in the write-behind buffer
+    watch_history = await watch_buffer.record(watch_data)
+    recommendation_scheduler.mark_dirty(watch_data.profile_id)
     
-    if existing_history:
-        # Update existing
-        await db.watch_history.update_one(
-            {"id": existing_history["id"]},
-            {
-                "$set": {
-                    "progress": watch_data.progress,
-                    "watch_time": watch_data.watch_time,
-                    "status": watch_data.status,
-                    "last_watched": datetime.utcnow()
-                }
-            }
-        )
-        updated_history = await db.watch_history.find_one({"id": existing_history["id"]})
-        return WatchHistory(**updated_history)
-    else:
-        # Create new
-        watch_history = WatchHistory(**watch_data.dict())
-        await db.watch_history.insert_one(watch_history.dict())
-        return watch_history
+    return WatchHistory(**watch_history)
 
 @api_router.get("/watch-history/{profile_id}", response_model=List[Dict[str, Any]])
 async def get_watch_history(
-    profile_id: str,
-    limit: int = 50,
-    current_user: User = Depends(get_current_active_user),
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    accept: Optional[str] = Header(None),
+    profile_id: str = Depends(verify_profile_access),
     db: AsyncIOMotorDatabase = Depends(get_database)
 ):
-    """Get watch history for a profile."""
-    # Verify profile belongs to user
-    profile = await db.profiles.find_one({
-        "id": profile_id,
-        "user_id": current_user.id
-    })
-    if not profile:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Profile not found or access denied"
-        )
+    """Get watch history for a profile.
+    
+    With ``Accept: application/x-ndjson`` the full history (or ``limit`` rows)
+    is streamed one row per line instead of returned as one page.
+    """
+    streaming = wants_ndjson(accept)
+    if limit is None and not streaming:
+        limit = 50
     
     # Get watch history with content details
     pipeline = [
-        {"$match": {"profile_id": profile_id}},
-        {"$sort": {"last_watched": -1}},
-        {"$limit": limit},
-        {
-            "$lookup": {
-                "from": "content",
-                "localField": "content_id",
-                "foreignField": "id",
-                "as": "content"
-            }
-        },
-        {"$unwind": "$content"}
+        {"$match": {"profile_id": profile_id, **keyset_filter("last_watched", cursor)}},
+        {"$sort": dict(keyset_sort("last_watched"))},
+        *([{"$limit": limit}] if limit else []),
+        *content_lookup_stages(WATCH_HISTORY_FIELDS)
     ]
     
+    if streaming:
+        rows = db.watch_history.aggregate(pipeline, batchSize=STREAM_BATCH_SIZE)
+        return ndjson_response(rows, lambda row: watch_buffer.overlay([row]))
+    
     watch_history = await db.watch_history.aggregate(pipeline).to_list(None)
-    return watch_history
+    
+    # The cursor must come from stored last_watched values, which keyset_filter
+    # compares against, not from newer buffered ones
+    page_cursor = next_cursor(watch_history, "last_watched", limit)
+    watch_buffer.overlay(watch_history)
+    headers = {NEXT_CURSOR_HEADER: page_cursor} if page_cursor else None
+    
+    return json_response(watch_history, headers)
 
 # MY LIST ROUTES
 @api_router.post("/my-list")
@@ -495,15 +603,7 @@ async def add_to_my_list(
 ):
     """Add content to my list."""
     # Verify profile belongs to user
-    profile = await db.profiles.find_one({
-        "id": my_list_data.profile_id,
-        "user_id": current_user.id
-    })
-    if not profile:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Profile not found or access denied"
-        )
+    await ensure_profile_access(db, current_user, my_list_data.profile_id)
     
     # Check if already in list
     existing = await db.my_list.find_one({
@@ -518,28 +618,17 @@ async def add_to_my_list(
     
     my_list_item = MyList(**my_list_data.dict())
     await db.my_list.insert_one(my_list_item.dict())
+    recommendation_scheduler.mark_dirty(my_list_data.profile_id)
     
     return {"message": "Added to my list"}
 
 @api_router.delete("/my-list/{profile_id}/{content_id}")
 async def remove_from_my_list(
-    profile_id: str,
     content_id: str,
-    current_user: User = Depends(get_current_active_user),
+    profile_id: str = Depends(verify_profile_access),
     db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Remove content from my list."""
-    # Verify profile belongs to user
-    profile = await db.profiles.find_one({
-        "id": profile_id,
-        "user_id": current_user.id
-    })
-    if not profile:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Profile not found or access denied"
-        )
-    
     result = await db.my_list.delete_one({
         "profile_id": profile_id,
         "content_id": content_id
@@ -551,49 +640,272 @@ async def remove_from_my_list(
             detail="Content not found in my list"
         )
     
+    recommendation_scheduler.mark_dirty(profile_id)
+    
     return {"message": "Removed from my list"}
 
 @api_router.get("/my-list/{profile_id}", response_model=List[Dict[str, Any]])
 async def get_my_list(
-    profile_id: str,
-    current_user: User = Depends(get_current_active_user),
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    accept: Optional[str] = Header(None),
+    profile_id: str = Depends(verify_profile_access),
     db: AsyncIOMotorDatabase = Depends(get_database)
 ):
-    """Get my list for a profile."""
-    # Verify profile belongs to user
-    profile = await db.profiles.find_one({
-        "id": profile_id,
-        "user_id": current_user.id
-    })
-    if not profile:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Profile not found or access denied"
-        )
+    """Get my list for a profile.
+    
+    With ``Accept: application/x-ndjson`` the full list (or ``limit`` rows)
+    is streamed one row per line instead of returned as one page.
+    """
+    streaming = wants_ndjson(accept)
+    if limit is None and not streaming:
+        limit = 50
     
     # Get my list with content details
     pipeline = [
-        {"$match": {"profile_id": profile_id}},
-        {"$sort": {"added_at": -1}},
-        {
-            "$lookup": {
-                "from": "content",
-                "localField": "content_id",
-                "foreignField": "id",
-                "as": "content"
-            }
-        },
-        {"$unwind": "$content"}
+        {"$match": {"profile_id": profile_id, **keyset_filter("added_at", cursor)}},
+        {"$sort": dict(keyset_sort("added_at"))},
+        *([{"$limit": limit}] if limit else []),
+        *content_lookup_stages(MY_LIST_FIELDS)
     ]
     
+    if streaming:
+        return ndjson_response(db.my_list.aggregate(pipeline, batchSize=STREAM_BATCH_SIZE))
+    
     my_list = await db.my_list.aggregate(pipeline).to_list(None)
-    return my_list
+    
+    page_cursor = next_cursor(my_list, "added_at", limit)
+    headers = {NEXT_CURSOR_HEADER: page_cursor} if page_cursor else None
+    
+    return json_response(my_list, headers)
+
+# REVIEW ROUTES
+async def after_review_change(profile_id: str, content_id: str, rating: Optional[float]) -> None:
+    """Propagate a review write to the rating matrix, scheduler and catalog cache."""
+    if rating is None:
+        recommendation_engine.user_item_matrix.discard(profile_id, content_id)
+    else:
+        recommendation_engine.user_item_matrix.update([(profile_id, content_id, rating)])
+    recommendation_scheduler.mark_dirty(profile_id)
+    await catalog_cache.invalidate(content_id)
+
+async def get_owned_review(db: AsyncIOMotorDatabase, user: User, review_id: str) -> Dict[str, Any]:
+    """Load a review, raising 404 if missing and 403 if another user's profile wrote it."""
+    review = await db.reviews.find_one({"id": review_id}, {"_id": 0, "profile_id": 1, "content_id": 1})
+    if not review:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Review not found"
+        )
+    await ensure_profile_access(db, user, review["profile_id"])
+    return review
+
+@api_router.get("/content/{content_id}/reviews", response_model=List[ReviewResponse])
+async def get_content_reviews(
+    content_id: str,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    profile_id: Optional[str] = None,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Get reviews of a content item, newest first, with the profile's own reactions."""
+    reviews = await db.reviews.find(
+        {"content_id": content_id, **keyset_filter("created_at", cursor)},
+        REVIEW_RESPONSE_PROJECTION
+    ).sort(keyset_sort("created_at")).limit(limit).to_list(None)
+    
+    reactions = {}
+    if profile_id and reviews:
+        await ensure_profile_access(db, current_user, profile_id)
+        reaction_list = await db.review_reactions.find(
+            {"profile_id": profile_id, "review_id": {"$in": [review["id"] for review in reviews]}},
+            {"_id": 0, "review_id": 1, "reaction_type": 1}
+        ).to_list(None)
+        reactions = {reaction["review_id"]: reaction["reaction_type"] for reaction in reaction_list}
+    
+    page_cursor = next_cursor(reviews, "created_at", limit)
+    for review in reviews:
+        review["user_reaction"] = reactions.get(review["id"])
+    
+    headers = {NEXT_CURSOR_HEADER: page_cursor} if page_cursor else None
+    return json_response(reviews, headers)
+
+@api_router.post("/reviews", response_model=ReviewResponse)
+async def create_content_review(
+    review_data: ReviewCreate,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Review and rate a content item."""
+    # Verify profile belongs to user
+    await ensure_profile_access(db, current_user, review_data.profile_id)
+    
+    content, profile = await asyncio.gather(
+        db.content.find_one({"id": review_data.content_id}, {"_id": 0, "id": 1}),
+        db.profiles.find_one({"id": review_data.profile_id}, {"_id": 0, "name": 1})
+    )
+    if not content:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Content not found"
+        )
+    
+    review = Review(**review_data.dict(), profile_name=profile["name"] if profile else "")
+    try:
+        await create_review(db, review.dict())
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Content already reviewed by this profile"
+        )
+    await after_review_change(review.profile_id, review.content_id, review.rating)
+    
+    return ReviewResponse(**review.dict())
+
+@api_router.put("/reviews/{review_id}", response_model=ReviewResponse)
+async def update_content_review(
+    review_id: str,
+    review_update: ReviewUpdate,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Update a review's rating or text."""
+    await get_owned_review(db, current_user, review_id)
+    
+    changes = {k: v for k, v in review_update.dict().items() if v is not None}
+    review = await update_review(db, review_id, changes)
+    if not review:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Review not found"
+        )
+    await after_review_change(review["profile_id"], review["content_id"], review["rating"])
+    
+    return ReviewResponse(**review)
+
+@api_router.delete("/reviews/{review_id}")
+async def delete_content_review(
+    review_id: str,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Delete a review."""
+    await get_owned_review(db, current_user, review_id)
+    
+    review = await delete_review(db, review_id)
+    if not review:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Review not found"
+        )
+    await after_review_change(review["profile_id"], review["content_id"], None)
+    
+    return {"message": "Review deleted"}
+
+@api_router.post("/review-reactions")
+async def react_to_review(
+    reaction_data: ReviewReactionCreate,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Like or dislike a review; reacting again switches the reaction."""
+    # Verify profile belongs to user
+    await ensure_profile_access(db, current_user, reaction_data.profile_id)
+    
+    review = await db.reviews.find_one({"id": reaction_data.review_id}, {"_id": 0, "id": 1})
+    if not review:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Review not found"
+        )
+    
+    await set_reaction(db, reaction_data.review_id, reaction_data.profile_id, reaction_data.reaction_type)
+    
+    return {"message": "Reaction saved"}
+
+@api_router.delete("/review-reactions/{review_id}/{profile_id}")
+async def remove_review_reaction(
+    review_id: str,
+    profile_id: str = Depends(verify_profile_access),
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Withdraw a reaction to a review."""
+    if not await remove_reaction(db, review_id, profile_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Reaction not found"
+        )
+    
+    return {"message": "Reaction removed"}
+
+# RECOMMENDATION ROUTES
+@api_router.get("/recommendations/{profile_id}", response_model=List[Dict[str, Any]])
+async def get_recommendations(
+    algorithm: Optional[str] = None,
+    limit: int = 20,
+    profile_id: str = Depends(verify_profile_access)
+):
+    """Get precomputed recommendations for a profile."""
+    recommendations = await recommendation_engine.get_recommendations_for_profile(
+        profile_id, algorithm, limit
+    )
+    
+    # Nothing precomputed yet, generate in the background ahead of the queue
+    if not recommendations:
+        recommendation_scheduler.request(profile_id)
+    
+    return json_response(recommendations)
+
+# ANALYTICS ROUTES
+@api_router.get("/analytics/{profile_id}/stats", response_model=ViewingStats)
+async def get_viewing_stats(
+    days: Optional[int] = Query(None, ge=1, le=366),
+    profile_id: str = Depends(verify_profile_access)
+):
+    """Viewing stats for a profile, over all time or the last ``days`` days."""
+    summary = await viewing_analytics.summary(profile_id, days)
+    return ViewingStats(**viewing_stats(summary))
+
+@api_router.get("/analytics/{profile_id}/genres", response_model=List[GenrePreference])
+async def get_genre_preferences(
+    days: Optional[int] = Query(None, ge=1, le=366),
+    limit: int = Query(20, ge=1, le=100),
+    profile_id: str = Depends(verify_profile_access)
+):
+    """Genres a profile watches, ranked by their share of watch time."""
+    summary = await viewing_analytics.summary(profile_id, days)
+    return [GenrePreference(**preference) for preference in genre_preferences(summary)[:limit]]
+
+# TMDB PROXY ROUTES
+@api_router.get("/tmdb/{path:path}")
+async def proxy_tmdb(path: str, request: Request):
+    """Forward a TMDB read through the shared cache, keeping API keys server side."""
+    params = list(request.query_params.multi_items())
+    if not any(key == "language" for key, _ in params):
+        params.append(("language", "en-US"))
+    
+    tmdb_response = await tmdb_proxy.get(path, params)
+    headers = {}
+    if tmdb_response.status_code == 200:
+        headers["Cache-Control"] = f"public, max-age={int(tmdb_proxy.ttl)}"
+    return Response(
+        content=tmdb_response.body,
+        status_code=tmdb_response.status_code,
+        media_type=tmdb_response.media_type,
+        headers=headers
+    )
 
 # Basic route for testing
 @api_router.get("/")
 async def root():
     return {"message": "Netflix Clone API is running"}
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint."""
+    return Response(content=registry.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
 # Include the router in the main app
 app.include_router(api_router)
 
@@ -603,8 +915,12 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag"],
 )
 
+# Outermost, so latency includes every other middleware
+app.add_middleware(MetricsMiddleware)
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
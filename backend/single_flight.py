@@ -0,0 +1,58 @@
+"""Coalescing of identical concurrent reads within one worker."""
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+import asyncio
+
+T = TypeVar("T")
+
+# Every group by name, for reporting
+single_flight_groups: Dict[str, "SingleFlight"] = {}
+
+class SingleFlight:
+    """Runs one call per key at a time and hands its result to every concurrent caller.
+
+    The call runs in its own task, so a caller that gives up (a client
+    disconnecting) does not cancel the work the others are waiting on.
+    Exceptions are shared the same way. Nothing is kept once the call
+    finishes; caching is left to the caller.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.executions = 0
+        self.deduplicated = 0
+        single_flight_groups[name] = self
+
+    async def run(self, key: Hashable, call: Callable[[], Awaitable[T]]) -> T:
+        """Await call(), or the run of it already in flight for key."""
+        self.calls += 1
+        task = self._in_flight.get(key)
+        if task is None:
+            self.executions += 1
+            task = asyncio.ensure_future(call())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+        else:
+            self.deduplicated += 1
+        return await asyncio.shield(task)
+
+    def _finished(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Retrieved here so a run nobody awaited any more does not log a warning
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return call, execution and deduplication counters."""
+        return {
+            "in_flight": len(self._in_flight),
+            "calls": self.calls,
+            "executions": self.executions,
+            "deduplicated": self.deduplicated
+        }
+
+def single_flight_stats() -> Dict[str, Dict[str, Any]]:
+    """Counters of every single-flight group by name."""
+    return {name: group.stats() for name, group in single_flight_groups.items()}
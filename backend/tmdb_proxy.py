@@ -0,0 +1,230 @@
+"""Shared server-side proxy for the TMDB API."""
+from typing import Any, Dict, FrozenSet, Hashable, List, NamedTuple, Optional, Pattern, Sequence, Tuple
+import logging
+import os
+import re
+import time
+import httpx
+from fastapi import HTTPException, status
+from .cache import TTLCache
+from .single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+TMDB_BASE_URL = os.getenv("TMDB_BASE_URL", "https://api.themoviedb.org/3")
+TMDB_API_KEYS = [key.strip() for key in os.getenv("TMDB_API_KEYS", "").split(",") if key.strip()]
+TMDB_CACHE_TTL_SECONDS = float(os.getenv("TMDB_CACHE_TTL_SECONDS", "600"))
+TMDB_CACHE_MAX_SIZE = int(os.getenv("TMDB_CACHE_MAX_SIZE", "5000"))
+TMDB_TIMEOUT_SECONDS = float(os.getenv("TMDB_TIMEOUT_SECONDS", "10"))
+
+LIST_PARAMS = frozenset({"language", "page", "region"})
+
+# Paths the proxy forwards and the query parameters each accepts. Anything
+# else is rejected or dropped, so the route is not an open proxy and callers
+# cannot bypass the cache and coalescing with made-up parameters.
+RESOURCES: List[Tuple[Pattern[str], FrozenSet[str]]] = [
+    (re.compile(r"trending/(all|movie|tv|person)/(day|week)"), frozenset({"language", "page"})),
+    (re.compile(r"(movie|tv)/(popular|top_rated|upcoming|now_playing|airing_today|on_the_air)"), LIST_PARAMS),
+    (re.compile(r"(movie|tv)/\d+"), frozenset({"language"})),
+    (re.compile(r"(movie|tv)/\d+/(videos|credits)"), frozenset({"language"})),
+    (re.compile(r"(movie|tv)/\d+/(similar|recommendations)"), frozenset({"language", "page"})),
+    (re.compile(r"(movie|tv)/\d+/images"), frozenset({"language", "include_image_language"})),
+    (re.compile(r"search/(multi|movie|tv|person)"), frozenset({
+        "query", "language", "page", "include_adult", "region", "year", "primary_release_year",
+        "first_air_date_year"
+    })),
+    (re.compile(r"discover/(movie|tv)"), frozenset({
+        "language", "page", "region", "sort_by", "include_adult", "include_video", "with_genres",
+        "without_genres", "with_original_language", "year", "primary_release_year", "first_air_date_year",
+        "vote_average.gte", "vote_count.gte"
+    })),
+    (re.compile(r"genre/(movie|tv)/list"), frozenset({"language"}))
+]
+
+def allowed_params(path: str) -> Optional[FrozenSet[str]]:
+    """Query parameters accepted for path, or None if the path is not proxied."""
+    for pattern, params in RESOURCES:
+        if pattern.fullmatch(path):
+            return params
+    return None
+
+def forwarded_params(path: str, params: Sequence[Tuple[str, str]]) -> Tuple[Tuple[str, str], ...]:
+    """First non-empty value of each accepted parameter, sorted, for the cache key and upstream."""
+    allowed = allowed_params(path) or frozenset()
+    kept: Dict[str, str] = {}
+    for name, value in params:
+        if name in allowed and value and name not in kept:
+            kept[name] = value
+    return tuple(sorted(kept.items()))
+
+DEFAULT_RETRY_AFTER_SECONDS = 10.0
+
+class TMDBResponse(NamedTuple):
+    status_code: int
+    body: bytes
+    media_type: str
+
+class TMDBKeyPool:
+    """Round-robin API keys that sit out a rate-limit window after a 429.
+
+    Keys rejected with 401 are retired until restart.
+    """
+
+    def __init__(self, keys: Sequence[str]):
+        self.keys = list(keys)
+        self._next = 0
+        self._cooldown_until: Dict[str, float] = {}
+        self._retired: set = set()
+
+    def acquire(self) -> str:
+        """Next usable key; raises 503 with Retry-After when all are cooling down."""
+        now = time.monotonic()
+        for offset in range(len(self.keys)):
+            key = self.keys[(self._next + offset) % len(self.keys)]
+            if key in self._retired or self._cooldown_until.get(key, 0.0) > now:
+                continue
+            self._next = (self._next + offset + 1) % len(self.keys)
+            return key
+
+        waits = [
+            until - now for key, until in self._cooldown_until.items()
+            if key not in self._retired and until > now
+        ]
+        if not waits:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="No usable TMDB API key"
+            )
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="TMDB rate limit reached",
+            headers={"Retry-After": str(max(1, int(min(waits) + 0.999)))}
+        )
+
+    def rate_limited(self, key: str, retry_after: Optional[float]) -> None:
+        self._cooldown_until[key] = time.monotonic() + (retry_after or DEFAULT_RETRY_AFTER_SECONDS)
+
+    def retire(self, key: str) -> None:
+        self._retired.add(key)
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "keys": len(self.keys),
+            "cooling_down": sum(1 for until in self._cooldown_until.values() if until > now),
+            "retired": len(self._retired)
+        }
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    try:
+        return float(response.headers.get("Retry-After", ""))
+    except ValueError:
+        return None
+
+class TMDBProxy:
+    """Cached, coalescing client for TMDB GET requests.
+
+    Successful responses are cached for ``ttl`` seconds keyed by path and
+    its accepted query parameters, and concurrent requests for the same key
+    share one upstream fetch. A 429 moves on to the next key; a 401 retires the key.
+    """
+
+    def __init__(
+        self,
+        keys: Sequence[str] = TMDB_API_KEYS,
+        base_url: str = TMDB_BASE_URL,
+        ttl: float = TMDB_CACHE_TTL_SECONDS,
+        maxsize: int = TMDB_CACHE_MAX_SIZE,
+        timeout: float = TMDB_TIMEOUT_SECONDS
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.ttl = ttl
+        self.timeout = timeout
+        self.key_pool = TMDBKeyPool(keys)
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._client: Optional[httpx.AsyncClient] = None
+        self.flight = SingleFlight("tmdb")
+
+        self.upstream_requests = 0
+        self.rate_limited = 0
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout)
+        return self._client
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @staticmethod
+    def cache_key(path: str, params: Sequence[Tuple[str, str]]) -> Tuple[Hashable, ...]:
+        return (path, forwarded_params(path, params))
+
+    async def get(self, path: str, params: Sequence[Tuple[str, str]] = ()) -> TMDBResponse:
+        """Fetch a TMDB resource through the cache."""
+        path = path.strip("/")
+        if allowed_params(path) is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Unsupported TMDB resource"
+            )
+
+        key = self.cache_key(path, params)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        return await self.flight.run(key, lambda: self._fetch_and_cache(path, key))
+
+    async def _fetch_and_cache(self, path: str, key: Tuple[Hashable, ...]) -> TMDBResponse:
+        response = await self._fetch(path, key[1])
+        if response.status_code == 200:
+            self.cache.set(key, response)
+        return response
+
+    async def _fetch(self, path: str, params: Sequence[Tuple[str, str]]) -> TMDBResponse:
+        """Call TMDB, trying each available key at most once."""
+        for _ in range(max(1, len(self.key_pool.keys))):
+            api_key = self.key_pool.acquire()
+            self.upstream_requests += 1
+            try:
+                response = await self.client.get(f"/{path}", params=[*params, ("api_key", api_key)])
+            except httpx.HTTPError as exc:
+                logger.warning("TMDB request for %s failed: %s", path, exc)
+                raise HTTPException(
+                    status_code=status.HTTP_502_BAD_GATEWAY,
+                    detail="TMDB request failed"
+                )
+
+            if response.status_code == 429:
+                self.rate_limited += 1
+                self.key_pool.rate_limited(api_key, _retry_after(response))
+                continue
+            if response.status_code == 401:
+                logger.error("TMDB rejected an API key; retiring it")
+                self.key_pool.retire(api_key)
+                continue
+
+            media_type = response.headers.get("content-type", "application/json").split(";")[0]
+            return TMDBResponse(response.status_code, response.content, media_type)
+
+        # Every key was rate limited or rejected on this request
+        self.key_pool.acquire()
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail="TMDB request failed"
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """Return cache, coalescing and key counters."""
+        return {
+            "cache": self.cache.stats(),
+            "in_flight": self.flight.stats()["in_flight"],
+            "coalesced": self.flight.deduplicated,
+            "upstream_requests": self.upstream_requests,
+            "rate_limited": self.rate_limited,
+            "keys": self.key_pool.stats()
+        }
@@ -0,0 +1,222 @@
+from typing import Any, Dict, List, Optional
+from datetime import datetime, timedelta
+import asyncio
+import logging
+import math
+import os
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from .cache import CacheCodec, CacheNamespace, cache_backend
+
+logger = logging.getLogger(__name__)
+
+TRENDING_REFRESH_SECONDS = float(os.getenv("TRENDING_REFRESH_SECONDS", "300"))
+TRENDING_WINDOW_DAYS = float(os.getenv("TRENDING_WINDOW_DAYS", "7"))
+TRENDING_HALF_LIFE_HOURS = float(os.getenv("TRENDING_HALF_LIFE_HOURS", "24"))
+# Titles kept in the snapshot; trending reads are clamped to it, so keep it at
+# or above the largest limit requested (20 for recommendations)
+TRENDING_SIZE = int(os.getenv("TRENDING_SIZE", "100"))
+
+# ID of the snapshot document in the trending collection
+TRENDING_SNAPSHOT_ID = "global"
+
+# refreshed_at comes back from the shared cache as an ISO string
+SNAPSHOT_CODEC = CacheCodec(
+    lambda snapshot: snapshot,
+    lambda value: {**value, "refreshed_at": datetime.fromisoformat(value["refreshed_at"])}
+)
+
+def trending_pipeline(limit: int) -> List[Dict[str, Any]]:
+    """Aggregation selecting well-rated content with many ratings."""
+    return [
+        {
+            "$match": {
+                "total_ratings": {"$gte": 5},
+                "average_rating": {"$gte": 3.5}
+            }
+        },
+        {
+            "$sort": {
+                "total_ratings": -1,
+                "average_rating": -1
+            }
+        },
+        {"$limit": limit},
+        {"$project": {"_id": 0, "id": 1}}
+    ]
+
+def activity_pipeline(now: datetime, window: timedelta, half_life: timedelta, limit: int) -> List[Dict[str, Any]]:
+    """Aggregation scoring content by exponentially decayed recent watch activity.
+
+    Each watch history row touched within the window contributes
+    ``exp(-age / tau)``, so a view ``half_life`` ago counts half as much as one now.
+    """
+    tau_ms = half_life.total_seconds() * 1000 / math.log(2)
+    return [
+        {"$match": {"last_watched": {"$gte": now - window}}},
+        {
+            "$group": {
+                "_id": "$content_id",
+                "score": {
+                    "$sum": {"$exp": {"$divide": [{"$subtract": ["$last_watched", now]}, tau_ms]}}
+                }
+            }
+        },
+        {"$sort": {"score": -1, "_id": 1}},
+        {"$limit": limit}
+    ]
+
+class TrendingView:
+    """Materialized trending list, refreshed on a timer.
+
+    Each refresh ranks content by time-decayed watch activity, tops the list
+    up with the best rated popular content, and stores the result both in
+    memory and as one document in the ``trending`` collection so batch jobs
+    and freshly started servers can read it. top() is a slice of the
+    in-memory list.
+
+    The snapshot is also published to a shared cache entry that expires
+    after one interval. Workers that find it still there adopt it, so only
+    one worker per interval runs the aggregation.
+    """
+
+    def __init__(
+        self,
+        db: AsyncIOMotorDatabase,
+        refresh_interval: float = TRENDING_REFRESH_SECONDS,
+        window: timedelta = timedelta(days=TRENDING_WINDOW_DAYS),
+        half_life: timedelta = timedelta(hours=TRENDING_HALF_LIFE_HOURS),
+        size: int = TRENDING_SIZE,
+        cache: Optional[CacheNamespace] = None
+    ):
+        self.db = db
+        self.cache = cache or cache_backend.namespace(
+            "trending", ttl=refresh_interval, maxsize=1, codec=SNAPSHOT_CODEC
+        )
+        self.refresh_interval = refresh_interval
+        self.window = window
+        self.half_life = half_life
+        self.size = size
+        self.content_ids: List[str] = []
+        self.scores: List[float] = []
+        self.refreshed_at: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self.refreshes = 0
+        self.adopted = 0
+        self.failures = 0
+        self.last_refresh_seconds = 0.0
+
+    @property
+    def ready(self) -> bool:
+        return self.refreshed_at is not None
+
+    def top(self, limit: int) -> List[str]:
+        """Return the first limit trending content IDs from the snapshot."""
+        return self.content_ids[:limit]
+
+    async def start(self) -> None:
+        """Load the stored snapshot, then keep it fresh in the background."""
+        if self._task is None:
+            await self.load()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Cancel the refresh task."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def load(self) -> bool:
+        """Read the last stored snapshot, if any."""
+        snapshot = await self.db.trending.find_one({"id": TRENDING_SNAPSHOT_ID}, {"_id": 0})
+        if not snapshot:
+            return False
+        self._apply(snapshot)
+        return True
+
+    async def refresh(self) -> List[str]:
+        """Recompute the trending list and store the new snapshot."""
+        started = asyncio.get_running_loop().time()
+        now = datetime.utcnow()
+
+        activity = await self.db.watch_history.aggregate(
+            activity_pipeline(now, self.window, self.half_life, self.size * 2)
+        ).to_list(None)
+
+        # Only keep content that still exists in the catalog
+        existing = set()
+        if activity:
+            existing = {
+                item["id"] for item in await self.db.content.find(
+                    {"id": {"$in": [item["_id"] for item in activity]}},
+                    {"_id": 0, "id": 1}
+                ).to_list(None)
+            }
+        ranked = [(item["_id"], item["score"]) for item in activity if item["_id"] in existing]
+        ranked = ranked[:self.size]
+
+        # Top up quiet periods with well-rated popular content
+        if len(ranked) < self.size:
+            seen = {content_id for content_id, _ in ranked}
+            popular = await self.db.content.aggregate(
+                trending_pipeline(self.size + len(seen))
+            ).to_list(None)
+            for item in popular:
+                if len(ranked) >= self.size:
+                    break
+                if item["id"] not in seen:
+                    ranked.append((item["id"], 0.0))
+
+        snapshot = {
+            "id": TRENDING_SNAPSHOT_ID,
+            "content_ids": [content_id for content_id, _ in ranked],
+            "scores": [score for _, score in ranked],
+            "refreshed_at": now
+        }
+        await self.db.trending.replace_one({"id": TRENDING_SNAPSHOT_ID}, snapshot, upsert=True)
+        await self.cache.set(TRENDING_SNAPSHOT_ID, snapshot)
+        self._apply(snapshot)
+
+        self.refreshes += 1
+        self.last_refresh_seconds = asyncio.get_running_loop().time() - started
+        return self.content_ids
+
+    async def adopt(self) -> bool:
+        """Use a snapshot another worker refreshed within the interval, if there is one."""
+        snapshot = await self.cache.get(TRENDING_SNAPSHOT_ID)
+        if snapshot is None:
+            return False
+        if snapshot["refreshed_at"] != self.refreshed_at:
+            self._apply(snapshot)
+            self.adopted += 1
+        return True
+
+    def _apply(self, snapshot: Dict[str, Any]) -> None:
+        self.content_ids = list(snapshot["content_ids"])
+        self.scores = list(snapshot["scores"])
+        self.refreshed_at = snapshot["refreshed_at"]
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                if not await self.adopt():
+                    await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.failures += 1
+                logger.exception("Refreshing trending content failed")
+            await asyncio.sleep(self.refresh_interval)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return snapshot size, age and refresh counters."""
+        age = (datetime.utcnow() - self.refreshed_at).total_seconds() if self.refreshed_at else None
+        return {
+            "size": len(self.content_ids),
+            "age_seconds": age,
+            "refreshes": self.refreshes,
+            "adopted": self.adopted,
+            "failures": self.failures,
+            "last_refresh_seconds": self.last_refresh_seconds
+        }
@@ -0,0 +1,236 @@
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import datetime
+import asyncio
+import logging
+import os
+import uuid
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument, UpdateOne
+from .analytics import ViewingAnalytics
+from .cache import TTLCache
+from .models import WatchHistoryCreate
+
+logger = logging.getLogger(__name__)
+
+WATCH_FLUSH_INTERVAL_SECONDS = float(os.getenv("WATCH_FLUSH_INTERVAL_SECONDS", "5"))
+WATCH_FLUSH_MAX_ENTRIES = int(os.getenv("WATCH_FLUSH_MAX_ENTRIES", "5000"))
+
+# Fields a progress heartbeat overwrites
+PROGRESS_FIELDS = ("progress", "watch_time", "status", "last_watched")
+
+WatchKey = Tuple[str, str]
+
+def progress_update(entry: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Update pipeline upserting buffered progress unless the row was watched more recently.
+
+    Another worker may have flushed a later heartbeat for the same row, so
+    each progress field keeps its stored value when the stored
+    ``last_watched`` is not older than the buffered one.
+    """
+    newer = {"$lt": [{"$ifNull": ["$last_watched", None]}, {"$literal": entry["last_watched"]}]}
+    return [{
+        "$set": {
+            **{
+                field: {"$cond": [newer, {"$literal": entry[field]}, f"${field}"]}
+                for field in PROGRESS_FIELDS
+            },
+            "id": {"$ifNull": ["$id", {"$literal": entry["id"]}]},
+            "created_at": {"$ifNull": ["$created_at", {"$literal": entry["created_at"]}]}
+        }
+    }]
+
+class WatchProgressBuffer:
+    """Write-behind buffer that coalesces playback progress heartbeats.
+
+    The first write for a (profile_id, content_id) pair goes straight to the
+    database so the row and its id exist. Later heartbeats only replace the
+    buffered latest values, which are flushed as one unordered ``bulk_write``
+    of upserts every ``flush_interval`` seconds or once ``max_entries`` keys
+    are waiting. Readers merge buffered values with overlay().
+
+    With ``analytics``, every heartbeat also reports the watch time it added
+    since the previous one, so viewing rollups never rescan watch history.
+    """
+
+    def __init__(
+        self,
+        db: AsyncIOMotorDatabase,
+        flush_interval: float = WATCH_FLUSH_INTERVAL_SECONDS,
+        max_entries: int = WATCH_FLUSH_MAX_ENTRIES,
+        analytics: Optional[ViewingAnalytics] = None
+    ):
+        self.db = db
+        self.analytics = analytics
+        self.flush_interval = flush_interval
+        self.max_entries = max_entries
+        self._pending: Dict[WatchKey, Dict[str, Any]] = {}
+        self._flushing: Dict[WatchKey, Dict[str, Any]] = {}
+        # id, created_at and last watch_time of rows already written, so
+        # heartbeats can be answered without reading the row back
+        self._known = TTLCache(maxsize=100000, ttl=3600)
+        self._flush_requested = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+        self.received = 0
+        self.coalesced = 0
+        self.direct_writes = 0
+        self.flushed_rows = 0
+        self.flushes = 0
+
+    async def start(self) -> None:
+        """Start the periodic flush task."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flush task and write out everything still buffered."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    async def record(self, watch_data: WatchHistoryCreate) -> Dict[str, Any]:
+        """Record a progress update and return the resulting watch history row."""
+        self.received += 1
+        key = (watch_data.profile_id, watch_data.content_id)
+        fields = {
+            "progress": watch_data.progress,
+            "watch_time": watch_data.watch_time,
+            "status": watch_data.status,
+            "last_watched": datetime.utcnow()
+        }
+
+        identity = self._known.get(key)
+        entry = self._pending.get(key)
+        if entry is not None:
+            self._track(key, entry["watch_time"], fields["watch_time"])
+            entry.update(fields)
+            self.coalesced += 1
+        elif identity is None:
+            return await self._write_through(key, fields)
+        else:
+            self._track(key, identity["watch_time"], fields["watch_time"])
+            entry = {
+                "id": identity["id"],
+                "created_at": identity["created_at"],
+                "profile_id": watch_data.profile_id,
+                "content_id": watch_data.content_id,
+                **fields
+            }
+            self._pending[key] = entry
+            if len(self._pending) >= self.max_entries:
+                self._flush_requested.set()
+
+        if identity is not None:
+            identity["watch_time"] = fields["watch_time"]
+        return dict(entry)
+
+    def _track(self, key: WatchKey, previous: Optional[int], watch_time: int, new_title: bool = False) -> None:
+        """Report the watch time a heartbeat added; a rewind adds nothing."""
+        if self.analytics is not None:
+            self.analytics.track(key[0], key[1], max(0, watch_time - (previous or 0)), new_title)
+
+    async def _write_through(self, key: WatchKey, fields: Dict[str, Any]) -> Dict[str, Any]:
+        """Upsert a row immediately and remember its identity."""
+        profile_id, content_id = key
+        identity = {"id": str(uuid.uuid4()), "created_at": fields["last_watched"]}
+        before = await self.db.watch_history.find_one_and_update(
+            {"profile_id": profile_id, "content_id": content_id},
+            {"$set": fields, "$setOnInsert": identity},
+            projection={"_id": 0},
+            upsert=True,
+            return_document=ReturnDocument.BEFORE
+        )
+        self.direct_writes += 1
+        if before is None:
+            document = {**identity, "profile_id": profile_id, "content_id": content_id, **fields}
+            self._track(key, 0, fields["watch_time"], new_title=True)
+        else:
+            document = {**before, **fields}
+            self._track(key, before.get("watch_time"), fields["watch_time"])
+        self._known.set(key, {
+            "id": document["id"],
+            "created_at": document["created_at"],
+            "watch_time": fields["watch_time"]
+        })
+        return document
+
+    def lookup(self, profile_id: str, content_id: str) -> Optional[Dict[str, Any]]:
+        """Latest buffered values for a pair, including ones being flushed."""
+        key = (profile_id, content_id)
+        return self._pending.get(key) or self._flushing.get(key)
+
+    def overlay(self, rows: List[Dict[str, Any]], profile_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Patch watch history rows in place with buffered progress values."""
+        if not self._pending and not self._flushing:
+            return rows
+        for row in rows:
+            entry = self.lookup(row.get("profile_id", profile_id), row["content_id"])
+            if entry is not None:
+                for field in PROGRESS_FIELDS:
+                    if field in row:
+                        row[field] = entry[field]
+        return rows
+
+    async def discard_profile(self, profile_id: str) -> None:
+        """Drop buffered writes of a deleted profile so a flush cannot recreate them.
+        
+        Waits for any flush already in flight, so the caller's deletes land after it.
+        """
+        for key in [key for key in self._pending if key[0] == profile_id]:
+            del self._pending[key]
+            self._known.delete(key)
+        async with self._flush_lock:
+            pass
+
+    async def flush(self) -> int:
+        """Write all buffered progress as one unordered bulk upsert that never moves a row back in time."""
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+            self._flushing, self._pending = self._pending, {}
+            requests = [
+                UpdateOne(
+                    {"profile_id": entry["profile_id"], "content_id": entry["content_id"]},
+                    progress_update(entry),
+                    upsert=True
+                )
+                for entry in self._flushing.values()
+            ]
+            try:
+                await self.db.watch_history.bulk_write(requests, ordered=False)
+            except Exception:
+                # Keep anything not superseded by a newer heartbeat for the next flush
+                for key, entry in self._flushing.items():
+                    self._pending.setdefault(key, entry)
+                raise
+            finally:
+                self._flushing = {}
+            self.flushes += 1
+            self.flushed_rows += len(requests)
+            return len(requests)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Flushing buffered watch progress failed")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return buffer size and write counters."""
+        return {
+            "buffered": len(self._pending),
+            "received": self.received,
+            "coalesced": self.coalesced,
+            "direct_writes": self.direct_writes,
+            "flushes": self.flushes,
+            "flushed_rows": self.flushed_rows
+        }
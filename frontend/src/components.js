@@ -17,18 +17,8 @@ import {
 } from 'react-icons/fa';
 import axios from 'axios';
 
-// TMDB API Configuration
-const TMDB_API_KEYS = [
-  'c8dea14dc917687ac631a52620e4f7ad',
-  '3cb41ecea3bf606c56552db3d17adefd'
-];
-let currentApiKeyIndex = 0;
-
-const getApiKey = () => TMDB_API_KEYS[currentApiKeyIndex];
-
-const rotateApiKey = () => {
-  currentApiKeyIndex = (currentApiKeyIndex + 1) % TMDB_API_KEYS.length;
-};
+// TMDB requests go through the backend proxy, which holds the API keys
+const TMDB_PROXY_URL = `${process.env.REACT_APP_BACKEND_URL}/api/tmdb`;
 
 // Netflix Navbar Component
 export const Navbar = ({ onSearch, showSearch, setShowSearch }) => {
@@ -461,24 +451,9 @@ export const useTMDB = () => {
   const fetchData = async (endpoint) => {
     setLoading(true);
     try {
-      const response = await axios.get(
-        `https://api.themoviedb.org/3${endpoint}?api_key=${getApiKey()}&language=en-US`
-      );
+      const response = await axios.get(`${TMDB_PROXY_URL}${endpoint}`);
       return response.data;
     } catch (error) {
-      if (error.response?.status === 429) {
-        rotateApiKey();
-        // Retry with new API key
-        try {
-          const response = await axios.get(
-            `https://api.themoviedb.org/3${endpoint}?api_key=${getApiKey()}&language=en-US`
-          );
-          return response.data;
-        } catch (retryError) {
-          console.error('TMDB API Error after retry:', retryError);
-          return null;
-        }
-      }
       console.error('TMDB API Error:', error);
       return null;
     } finally {
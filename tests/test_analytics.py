@@ -0,0 +1,83 @@
+import asyncio
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+from backend.analytics import ViewingAnalytics
+
+class FailingOnce:
+    """Wraps a collection so its next bulk_write raises after writing nothing."""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.fail = True
+
+    async def bulk_write(self, requests, **kwargs):
+        if self.fail:
+            self.fail = False
+            raise ConnectionError("connection reset")
+        return await self.collection.bulk_write(requests, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+@pytest.fixture
+def db():
+    database = AsyncMongoMockClient()["test"]
+
+    async def setup():
+        await database.viewing_rollups.create_index([("profile_id", 1), ("day", 1)], unique=True)
+        await database.viewing_totals.create_index("profile_id", unique=True)
+        await database.content.insert_one({"id": "content-1", "genre_ids": [18]})
+
+    asyncio.run(setup())
+    return database
+
+def totals(db):
+    return asyncio.run(db.viewing_totals.find_one({"profile_id": "profile-1"}))
+
+def rollup(db):
+    return asyncio.run(db.viewing_rollups.find_one({"profile_id": "profile-1"}))
+
+def test_failed_totals_write_is_retried_without_double_counting_rollups(db):
+    analytics = ViewingAnalytics(db)
+    analytics.track("profile-1", "content-1", 120, new_title=True)
+    failing = FailingOnce(db.viewing_totals)
+    analytics.db = type("Database", (), {
+        "content": db.content, "viewing_rollups": db.viewing_rollups, "viewing_totals": failing
+    })()
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(analytics.flush())
+    assert rollup(db)["watch_seconds"] == 120
+    assert totals(db) is None
+    assert analytics.stats()["unapplied"] == 1
+
+    analytics.track("profile-1", "content-1", 30, new_title=False)
+    assert asyncio.run(analytics.flush()) == 2
+    assert rollup(db)["watch_seconds"] == 150
+    assert rollup(db)["genres"]["18"] == {"seconds": 150, "views": 1}
+    assert totals(db)["watch_seconds"] == 150
+    assert analytics.stats()["unapplied"] == 0
+
+def test_repeated_batch_is_applied_once(db):
+    analytics = ViewingAnalytics(db)
+    analytics.track("profile-1", "content-1", 60, new_title=True)
+    analytics._unapplied.append(("flush-1", analytics._pending))
+    analytics._unapplied.append(("flush-1", analytics._pending))
+    analytics._pending = {}
+
+    asyncio.run(analytics.flush())
+    assert rollup(db)["watch_seconds"] == 60
+    assert rollup(db)["sessions"] == 1
+    assert totals(db)["watch_seconds"] == 60
+
+def test_flushes_of_two_workers_add_up(db):
+    first, second = ViewingAnalytics(db), ViewingAnalytics(db)
+    first.track("profile-1", "content-1", 60, new_title=True)
+    second.track("profile-1", "content-1", 40, new_title=False)
+
+    async def flush_both():
+        await asyncio.gather(first.flush(), second.flush())
+
+    asyncio.run(flush_both())
+    assert rollup(db)["watch_seconds"] == 100
+    assert totals(db)["watch_seconds"] == 100
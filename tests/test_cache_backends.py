@@ -0,0 +1,220 @@
+"""RedisCacheBackend against an in-process fake of the Redis client subset it uses."""
+from datetime import datetime
+import asyncio
+import json
+import time
+import pytest
+from backend.cache import CacheBackend, MemoryCacheBackend, RedisCacheBackend, model_codec
+from backend.catalog_cache import CatalogCache, CatalogEntry
+from backend.models import User
+from backend.trending import SNAPSHOT_CODEC
+
+class FakeRedis:
+    """Strings with expiry, sets and pub/sub, shared by every backend given the same instance."""
+
+    def __init__(self):
+        self.strings = {}
+        self.sets = {}
+        self.subscribers = []
+        self.commands = []
+
+    async def mget(self, keys):
+        self.commands.append("MGET")
+        now = time.monotonic()
+        values = []
+        for key in keys:
+            expires, value = self.strings.get(key, (0, None))
+            values.append(value if expires > now else None)
+        return values
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def smembers(self, key):
+        return set(self.sets.get(key, ()))
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.strings.pop(key, None)
+            self.sets.pop(key, None)
+
+    async def publish(self, channel, message):
+        for subscriber in self.subscribers:
+            if channel in subscriber.channels:
+                subscriber.queue.put_nowait({"type": "message", "channel": channel, "data": message})
+
+    def pubsub(self):
+        return FakePubSub(self)
+
+    async def aclose(self):
+        pass
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+    def set(self, key, value, ex):
+        self.commands.append(lambda: self.redis.strings.__setitem__(key, (time.monotonic() + ex, value)))
+
+    def sadd(self, key, *members):
+        self.commands.append(lambda: self.redis.sets.setdefault(key, set()).update(members))
+
+    def expire(self, key, seconds):
+        pass
+
+    async def execute(self):
+        self.redis.commands.append("EXEC")
+        for command in self.commands:
+            command()
+
+class FakePubSub:
+    def __init__(self, redis):
+        self.redis = redis
+        self.channels = set()
+        self.queue = asyncio.Queue()
+
+    async def subscribe(self, channel):
+        self.channels.add(channel)
+        self.redis.subscribers.append(self)
+
+    async def listen(self):
+        while True:
+            yield await self.queue.get()
+
+    async def aclose(self):
+        if self in self.redis.subscribers:
+            self.redis.subscribers.remove(self)
+
+async def settle():
+    """Let the listener tasks deliver published messages."""
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+def workers(test):
+    """Run test with two backends sharing one fake Redis, as two workers would."""
+    async def main():
+        redis = FakeRedis()
+        first, second = (RedisCacheBackend(client=redis, prefix="cache") for _ in range(2))
+        await first.start()
+        await second.start()
+        await settle()
+        try:
+            await test(redis, first, second)
+        finally:
+            await first.close()
+            await second.close()
+
+    asyncio.run(main())
+
+def test_set_many_and_get_many_round_trip():
+    async def test(redis, first, second):
+        writer = first.namespace("users", ttl=30, maxsize=10)
+        reader = second.namespace("users", ttl=30, maxsize=10)
+        await writer.set_many({"a": {"id": "a"}, ("page", 1): [1, 2], "c": 3})
+        assert redis.commands == ["EXEC"]
+
+        found = await reader.get_many(["a", ("page", 1), "c", "missing"])
+        assert found == {"a": {"id": "a"}, ("page", 1): [1, 2], "c": 3}
+        assert redis.commands == ["EXEC", "MGET"]
+        # Answered from the local copies without another round trip
+        assert await reader.get_many(["a", "c"]) == {"a": {"id": "a"}, "c": 3}
+        assert redis.commands == ["EXEC", "MGET"]
+        assert await reader.get("missing", "default") == "default"
+
+    workers(test)
+
+def test_clear_deletes_through_the_key_index():
+    async def test(redis, first, second):
+        users = first.namespace("users", ttl=30, maxsize=10)
+        other = first.namespace("other", ttl=30, maxsize=10)
+        await users.set_many({"a": 1, "b": 2})
+        await other.set("a", 1)
+
+        await users.clear()
+        assert sorted(redis.strings) == ["cache:other:a"]
+        assert "cache:users:__keys__" not in redis.sets
+        assert await second.namespace("users", ttl=30, maxsize=10).get_many(["a", "b"]) == {}
+        assert await users.get_many(["a", "b"]) == {}
+
+    workers(test)
+
+def test_invalidation_reaches_the_other_worker_and_its_listeners():
+    async def test(redis, first, second):
+        writer = first.namespace("catalog", ttl=30, maxsize=10)
+        reader = second.namespace("catalog", ttl=30, maxsize=10)
+        writer_heard, reader_heard = [], []
+        writer.on_invalidate(writer_heard.append)
+        reader.on_invalidate(reader_heard.append)
+
+        await writer.set_many({"a": 1, "b": 2})
+        assert await reader.get_many(["a", "b"]) == {"a": 1, "b": 2}
+
+        # The reader now holds local copies that only the published message can drop
+        await writer.delete("b")
+        await settle()
+        assert writer_heard == [["b"]]
+        assert reader_heard == [["cache:catalog:b"]]
+        assert await reader.get_many(["a", "b"]) == {"a": 1}
+
+        await writer.clear()
+        await settle()
+        assert writer_heard[-1] is None
+        assert reader_heard[-1] is None
+        assert await reader.get("a") is None
+
+    workers(test)
+
+def test_invalidation_of_unknown_namespace_is_ignored():
+    async def test(redis, first, second):
+        await first.namespace("only_first", ttl=30, maxsize=10).clear()
+        await settle()
+        assert "only_first" not in second.namespaces
+
+    workers(test)
+
+def test_values_are_stored_as_json_and_rebuilt_per_namespace():
+    async def test(redis, first, second):
+        user = User(
+            email="a@example.com", username="ann", first_name="Ann", last_name="Lee",
+            hashed_password="hash", date_of_birth=datetime(1990, 2, 3)
+        )
+        entry = CatalogCache._entry([{"id": "x", "release_date": datetime(2024, 5, 1)}], "cursor")
+        snapshot = {"id": "global", "content_ids": ["x"], "scores": [1.5], "refreshed_at": datetime(2026, 1, 1, 12)}
+        for backend in (first, second):
+            backend.namespace("users", ttl=30, maxsize=10, codec=model_codec(User))
+            CatalogCache(backend=backend)
+            backend.namespace("trending", ttl=30, maxsize=1, codec=SNAPSHOT_CODEC)
+
+        await first.namespaces["users"].set(user.id, user)
+        await first.namespaces["catalog_pages"].set("page", entry)
+        await first.namespaces["trending"].set("global", snapshot)
+        for stored in redis.strings.values():
+            json.loads(stored[1])
+
+        assert await second.namespaces["users"].get(user.id) == user
+        cached = await second.namespaces["catalog_pages"].get("page")
+        assert isinstance(cached, CatalogEntry)
+        assert (cached.body, cached.etag, cached.next_cursor) == (entry.body, entry.etag, "cursor")
+        assert cached.data == [{"id": "x", "release_date": "2024-05-01T00:00:00"}]
+        assert await second.namespaces["trending"].get("global") == snapshot
+
+    workers(test)
+
+def test_incomplete_backend_cannot_be_created():
+    class WithoutInvalidate(CacheBackend):
+        async def get_many(self, namespace, keys):
+            return {}
+
+        async def set_many(self, namespace, items, ttl):
+            pass
+
+    with pytest.raises(TypeError, match="invalidate"):
+        WithoutInvalidate()
+    MemoryCacheBackend()
@@ -0,0 +1,120 @@
+"""RatingMatrix.recommend against the per-profile Pearson loop it replaced."""
+import numpy as np
+import pytest
+from backend.collaborative import RatingMatrix
+
+def pearson_loop(profile_id, user_ratings, user_profiles, limit):
+    """The original collaborative filtering loop, returning (content_id, score) pairs."""
+    similar_users = []
+    for other_profile_id, other_ratings in user_profiles.items():
+        if other_profile_id == profile_id:
+            continue
+
+        common_items = set(user_ratings.keys()) & set(other_ratings.keys())
+        if len(common_items) < 2:
+            continue
+
+        sum1 = sum([user_ratings[item] for item in common_items])
+        sum2 = sum([other_ratings[item] for item in common_items])
+        sum1_sq = sum([user_ratings[item] ** 2 for item in common_items])
+        sum2_sq = sum([other_ratings[item] ** 2 for item in common_items])
+        sum_products = sum([user_ratings[item] * other_ratings[item] for item in common_items])
+
+        n = len(common_items)
+        numerator = sum_products - (sum1 * sum2 / n)
+        denominator = ((sum1_sq - sum1 ** 2 / n) * (sum2_sq - sum2 ** 2 / n)) ** 0.5
+        correlation = 0 if denominator == 0 else numerator / denominator
+        if correlation > 0.3:
+            similar_users.append((other_profile_id, correlation))
+
+    # The only change: profiles sharing two rated items correlate at exactly
+    # +-1, and the loop ranked such ties by floating point error, which decided
+    # who made the top ten. Rounded like RatingMatrix, tied neighbours keep
+    # review order in both.
+    similar_users.sort(key=lambda x: round(x[1], 12), reverse=True)
+
+    recommendations = {}
+    for similar_user_id, similarity in similar_users[:10]:
+        for content_id, rating in user_profiles[similar_user_id].items():
+            if content_id not in user_ratings and rating >= 4.0:
+                recommendations[content_id] = recommendations.get(content_id, 0) + rating * similarity
+
+    return sorted(recommendations.items(), key=lambda x: x[1], reverse=True)[:limit]
+
+def reviews(seed, n_profiles=300, n_items=120):
+    """Half-star ratings from profiles that lean towards one of a few tastes."""
+    rng = np.random.default_rng(seed)
+    tastes = rng.uniform(0.5, 5.0, size=(4, n_items))
+    entries = []
+    for p in range(n_profiles):
+        taste = tastes[p % len(tastes)]
+        for item in rng.choice(n_items, size=rng.integers(3, 30), replace=False):
+            rating = np.clip(np.round((taste[item] + rng.normal(0, 0.8)) * 2) / 2, 0.5, 5.0)
+            entries.append((f"profile-{p}", f"content-{item}", float(rating)))
+    return entries
+
+def by_profile(entries):
+    profiles = {}
+    for profile_id, content_id, rating in entries:
+        profiles.setdefault(profile_id, {})[content_id] = rating
+    return profiles
+
+def assert_same_ranking(ranked_ids, expected, scores=None):
+    """Items ranked by the same scores as expected; only the order of ties may differ.
+
+    scores holds the reference score of every candidate, for lists cut off in
+    the middle of a tie.
+    """
+    scores = scores or dict(expected)
+    assert len(ranked_ids) == len(expected)
+    if len(scores) == len(expected):
+        assert set(ranked_ids) == set(scores)
+    np.testing.assert_allclose(
+        [scores[content_id] for content_id in ranked_ids],
+        [score for _, score in expected],
+        rtol=1e-9
+    )
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_matches_pearson_loop(seed):
+    entries = reviews(seed)
+    profiles = by_profile(entries)
+    matrix = RatingMatrix()
+    matrix.load(entries)
+
+    compared = 0
+    for profile_id in list(profiles)[::7]:
+        user_ratings = profiles[profile_id]
+        everything = pearson_loop(profile_id, user_ratings, profiles, None)
+        assert_same_ranking(matrix.recommend(profile_id, user_ratings, 1000), everything)
+        for limit in (5, 20):
+            assert_same_ranking(
+                matrix.recommend(profile_id, user_ratings, limit),
+                everything[:limit],
+                dict(everything)
+            )
+        compared += bool(everything)
+    assert compared > 20
+
+def test_profile_without_stored_reviews():
+    entries = reviews(4)
+    profiles = by_profile(entries)
+    matrix = RatingMatrix()
+    matrix.load(entries)
+
+    user_ratings = dict(list(profiles["profile-0"].items())[:6])
+    user_ratings["content-unknown"] = 5.0
+    expected = pearson_loop("new-profile", user_ratings, profiles, 1000)
+    assert expected
+    assert_same_ranking(matrix.recommend("new-profile", user_ratings, 1000), expected)
+
+def test_incremental_updates_match_a_fresh_load():
+    entries = reviews(5)
+    matrix = RatingMatrix()
+    matrix.load(entries[:len(entries) // 2])
+    matrix.update(entries[len(entries) // 2:])
+    profiles = by_profile(entries)
+
+    for profile_id in list(profiles)[::25]:
+        expected = pearson_loop(profile_id, profiles[profile_id], profiles, 1000)
+        assert_same_ranking(matrix.recommend(profile_id, profiles[profile_id], 1000), expected)
@@ -0,0 +1,52 @@
+import asyncio
+import os
+import numpy as np
+from mongomock_motor import AsyncMongoMockClient
+from backend.content_index import ContentSimilarityIndex
+from backend.recommendation_engine import RecommendationEngine
+
+WORDS = ["space", "heist", "family", "war", "detective", "ocean", "robot", "comedy", "ghost", "dragon"]
+
+def documents(count=60):
+    rng = np.random.default_rng(7)
+    return [
+        {
+            "id": f"content-{i}",
+            "overview": " ".join(rng.choice(WORDS, size=6)),
+            "genre_ids": [int(g) for g in rng.choice([18, 28, 35, 878], size=2, replace=False)],
+            "director": f"Director {i % 5}",
+            "cast": [f"Actor {i % 7}", f"Actor {i % 11}"]
+        }
+        for i in range(count)
+    ]
+
+def test_neighbours_match_full_similarity_for_any_block_size():
+    reference = ContentSimilarityIndex.from_documents(documents(), n_components=8, n_neighbours=5, block_size=1000)
+    similarity = reference.embeddings @ reference.embeddings.T
+    np.fill_diagonal(similarity, -np.inf)
+    expected = -np.sort(-similarity, axis=1)[:, :5]
+    np.testing.assert_allclose(reference.neighbour_scores, expected, rtol=1e-5)
+
+    for block_size in (1, 7, 16):
+        index = ContentSimilarityIndex.from_documents(
+            documents(), n_components=8, n_neighbours=5, block_size=block_size
+        )
+        np.testing.assert_allclose(index.neighbour_scores, reference.neighbour_scores, rtol=1e-5)
+
+def test_load_content_index_builds_and_saves_once(tmp_path):
+    path = str(tmp_path / "content_index.npz")
+    db = AsyncMongoMockClient()["test"]
+
+    async def run():
+        await db.content.insert_many(documents(20))
+        first = await RecommendationEngine(db).load_content_index(path)
+        assert os.path.exists(path)
+        await db.content.delete_many({})
+        # A second worker loads the saved file instead of rebuilding from the now empty catalog
+        second = await RecommendationEngine(db).load_content_index(path)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert len(second) == len(first) == 20
+    np.testing.assert_array_equal(second.neighbours, first.neighbours)
+    assert not [name for name in os.listdir(tmp_path) if name != "content_index.npz"]
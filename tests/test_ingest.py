@@ -0,0 +1,143 @@
+"""Catalog ingestion: parsing, validation, upserts and checkpoint resume.
+
+The command writes through blocking PyMongo, so it runs against mongomock,
+the in-memory engine behind mongomock_motor.
+"""
+import json
+import os
+import mongomock
+import pytest
+from typer.testing import CliRunner
+from backend import cli
+from backend.ingest import (
+    Checkpoint, read_csv, read_jsonl, upsert_requests, validate_batch, write_batch
+)
+
+CSV_HEADER = "tmdb_id,title,overview,content_type,genre_ids,cast,director\n"
+
+def movie(tmdb_id, **fields):
+    return {"tmdb_id": tmdb_id, "title": f"Movie {tmdb_id}", "overview": "Overview", "content_type": "movie", **fields}
+
+def write_jsonl(path, rows):
+    path.write_text("".join(json.dumps(row) + "\n" for row in rows))
+    return str(path)
+
+@pytest.fixture
+def db(monkeypatch):
+    database = mongomock.MongoClient()["test"]
+    monkeypatch.setattr(cli, "get_sync_database", lambda: database)
+    return database
+
+def ingest(*args):
+    return CliRunner().invoke(cli.cli, ["ingest-content", *args])
+
+def test_csv_list_cells_and_blank_columns(tmp_path):
+    path = tmp_path / "catalog.csv"
+    path.write_text(
+        CSV_HEADER
+        + '1,One,Overview,movie,"[18, 35]",Ann | Bob,\n'
+        + '2,Two,Overview,movie,[bad,Ann,Someone\n'
+        + '3,Three,Overview,tv_show,,,Someone\n'
+    )
+    rows = [row for _, row in read_csv(str(path))]
+
+    assert rows[0]["genre_ids"] == [18, 35]
+    assert rows[0]["cast"] == ["Ann", "Bob"]
+    assert "director" not in rows[0]
+    assert isinstance(rows[1], ValueError)
+    assert rows[2] == {"tmdb_id": "3", "title": "Three", "overview": "Overview", "content_type": "tv_show", "director": "Someone"}
+
+    documents, errors = validate_batch(rows)
+    assert [document["tmdb_id"] for document in documents] == [1, 3]
+    assert len(errors) == 1 and errors[0].startswith("invalid JSON")
+
+def test_invalid_rows_are_reported_not_written():
+    documents, errors = validate_batch([
+        movie(1),
+        ["not", "an", "object"],
+        movie(2, content_type="podcast"),
+        {"tmdb_id": 3, "title": "No overview", "content_type": "movie"},
+        ValueError("Expecting value")
+    ])
+    assert [document["tmdb_id"] for document in documents] == [1]
+    assert len(errors) == 4
+    assert errors[1].startswith("tmdb_id=2: content_type")
+    assert errors[2].startswith("tmdb_id=3: overview")
+
+def test_refresh_keeps_fields_the_row_does_not_give(db):
+    documents, _ = validate_batch([movie(1, director="Someone", cast=["Ann"], runtime=120, language="fr")])
+    write_batch(db.content, upsert_requests(documents))
+    stored = db.content.find_one({"tmdb_id": 1})
+    db.content.update_one({"tmdb_id": 1}, {"$set": {"total_ratings": 4}})
+
+    documents, _ = validate_batch([movie(1, title="Renamed")])
+    assert write_batch(db.content, upsert_requests(documents)) == {"inserted": 0, "matched": 1, "failed": 0}
+    refreshed = db.content.find_one({"tmdb_id": 1})
+    assert refreshed["title"] == "Renamed"
+    assert (refreshed["director"], refreshed["cast"], refreshed["runtime"], refreshed["language"]) == (
+        "Someone", ["Ann"], 120, "fr"
+    )
+    assert refreshed["id"] == stored["id"]
+    assert refreshed["total_ratings"] == 4
+
+def test_insert_fills_model_defaults(db):
+    documents, _ = validate_batch([movie(1)])
+    write_batch(db.content, upsert_requests(documents))
+    stored = db.content.find_one({"tmdb_id": 1}, {"_id": 0})
+    assert stored["cast"] == [] and stored["director"] is None and stored["language"] == "en"
+    assert stored["average_rating"] == 0.0 and stored["total_reviews"] == 0
+    assert stored["id"] and stored["created_at"] == stored["updated_at"]
+
+def test_jsonl_resumes_from_checkpoint_offset(tmp_path, db):
+    path = write_jsonl(tmp_path / "catalog.jsonl", [movie(i) for i in range(1, 6)])
+    offsets = [offset for offset, _ in read_jsonl(path)]
+    # A previous run wrote the first two rows before stopping
+    Checkpoint(path + ".checkpoint", path).save(2, offsets[1])
+    assert [row["tmdb_id"] for _, row in read_jsonl(path, offsets[1])] == [3, 4, 5]
+
+    result = ingest(path, "--batch-size", "2")
+    assert result.exit_code == 0, result.output
+    assert "Resuming after 2 rows" in result.output
+    assert sorted(db.content.distinct("tmdb_id")) == [3, 4, 5]
+    assert not os.path.exists(path + ".checkpoint")
+
+def test_csv_resumes_by_row_count(tmp_path, db):
+    path = tmp_path / "catalog.csv"
+    path.write_text(CSV_HEADER + "".join(f"{i},Movie {i},Overview,movie,,,\n" for i in range(1, 5)))
+    Checkpoint(str(path) + ".checkpoint", str(path)).save(3, 0)
+
+    result = ingest(str(path), "--rejects", str(tmp_path / "rejects.txt"))
+    assert result.exit_code == 0, result.output
+    assert db.content.distinct("tmdb_id") == [4]
+
+def test_bad_rows_do_not_stop_the_run(tmp_path, db):
+    path = tmp_path / "catalog.csv"
+    path.write_text(CSV_HEADER + "1,One,Overview,movie,[bad,,\n2,Two,Overview,movie,[18],,\n")
+    rejects = tmp_path / "rejects.txt"
+
+    result = ingest(str(path), "--rejects", str(rejects))
+    assert result.exit_code == 0, result.output
+    assert "1 inserted" in result.output and "1 invalid" in result.output
+    assert db.content.distinct("tmdb_id") == [2]
+    assert rejects.read_text().startswith("invalid JSON")
+
+def test_checkpoint_of_a_changed_source_is_refused(tmp_path, db):
+    path = write_jsonl(tmp_path / "catalog.jsonl", [movie(1), movie(2)])
+    Checkpoint(path + ".checkpoint", path).save(1, 10)
+    write_jsonl(tmp_path / "catalog.jsonl", [movie(1), movie(2), movie(3)])
+
+    with pytest.raises(ValueError):
+        Checkpoint(path + ".checkpoint", path).load()
+    result = ingest(path)
+    assert result.exit_code == 2
+    assert "different catalog file" in result.output
+    assert db.content.count_documents({}) == 0
+
+    result = ingest(path, "--no-resume")
+    assert result.exit_code == 0, result.output
+    assert db.content.count_documents({}) == 3
+
+def test_missing_source_is_a_usage_error(tmp_path, db):
+    result = ingest(str(tmp_path / "missing.jsonl"))
+    assert result.exit_code == 2
+    assert "does not exist" in result.output
@@ -0,0 +1,141 @@
+"""The fast list paths build JSON from projected documents without the response
+models, so these check that what they emit still validates against them."""
+from datetime import datetime, timedelta
+import asyncio
+import orjson
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+from backend.models import (
+    Content, ContentResponse, MyList, Profile, Recommendation, WatchHistory
+)
+from backend.projections import (
+    CONTENT_CARD_PROJECTION, MY_LIST_FIELDS, WATCH_HISTORY_FIELDS, content_lookup_stages
+)
+from backend.recommendation_engine import RecommendationEngine
+from backend.serialization import content_cards, dumps, overlay_cards
+
+PROFILE_ID = "profile-1"
+
+def wire(value):
+    """What a client receives for value."""
+    return orjson.loads(dumps(value))
+
+def assert_shape(row, model):
+    """row carries exactly the fields of model and validates against it."""
+    assert set(row) == set(model.model_fields)
+    model.model_validate(row)
+
+@pytest.fixture
+def db():
+    database = AsyncMongoMockClient()["test"]
+    now = datetime.utcnow()
+    content = [
+        Content(
+            tmdb_id=100 + index,
+            title=f"Title {index}",
+            overview="Overview",
+            content_type="movie",
+            genre_ids=[18, 35],
+            release_date=now - timedelta(days=365),
+            poster_path="/poster.jpg",
+            average_rating=4.0,
+            rating_sum=8.0,
+            total_ratings=2
+        ).dict()
+        for index in range(3)
+    ]
+    documents = {
+        "content": content,
+        "profiles": [
+            Profile(user_id="user-1", name="Main").dict(),
+            Profile(user_id="user-1", name="Kids", profile_type="kids", maturity_rating="7+").dict()
+        ],
+        "watch_history": [
+            WatchHistory(
+                content_id=content[0]["id"], profile_id=PROFILE_ID, progress=42.5, watch_time=600
+            ).dict(),
+            WatchHistory(
+                content_id=content[1]["id"], profile_id=PROFILE_ID, progress=100.0, watch_time=5400,
+                status="completed", last_watched=now - timedelta(hours=1)
+            ).dict()
+        ],
+        "my_list": [MyList(content_id=content[2]["id"], profile_id=PROFILE_ID).dict()],
+        "recommendations": [
+            Recommendation(
+                profile_id=PROFILE_ID, content_id=item["id"], score=1.0 - index / 10,
+                reason="Because you watched Title 0", algorithm_used="content_based"
+            ).dict()
+            for index, item in enumerate(content)
+        ]
+    }
+
+    async def seed():
+        for collection, rows in documents.items():
+            await database[collection].insert_many(rows)
+
+    asyncio.run(seed())
+    return database
+
+def test_content_cards_with_overlay(db):
+    async def load():
+        return await db.content.find({}, CONTENT_CARD_PROJECTION).to_list(None)
+
+    cards = content_cards(asyncio.run(load()))
+    ids = [card["id"] for card in cards]
+    overlay_cards(cards, [ids[2]], {ids[0]: 4.5}, {ids[0]: 42.5})
+
+    rows = wire(cards)
+    for row in rows:
+        assert_shape(row, ContentResponse)
+    assert rows[0]["user_rating"] == 4.5
+    assert rows[0]["watch_progress"] == 42.5
+    assert rows[0]["in_my_list"] is False
+    assert rows[2]["in_my_list"] is True
+    assert rows[2]["user_rating"] is None
+
+def test_profile_list(db):
+    async def load():
+        return await db.profiles.find({"user_id": "user-1"}, {"_id": 0}).to_list(None)
+
+    rows = wire(asyncio.run(load()))
+    assert len(rows) == 2
+    for row in rows:
+        assert_shape(row, Profile)
+
+@pytest.mark.parametrize("collection, fields, model, sort_field", [
+    ("watch_history", WATCH_HISTORY_FIELDS, WatchHistory, "last_watched"),
+    ("my_list", MY_LIST_FIELDS, MyList, "added_at")
+])
+def test_rows_with_content(db, collection, fields, model, sort_field):
+    pipeline = [
+        {"$match": {"profile_id": PROFILE_ID}},
+        {"$sort": {sort_field: -1, "id": -1}},
+        *content_lookup_stages(fields)
+    ]
+
+    async def load():
+        return await db[collection].aggregate(pipeline).to_list(None)
+
+    rows = wire(asyncio.run(load()))
+    assert rows
+    for row in rows:
+        content = row.pop("content")
+        assert_shape(row, model)
+        assert set(content) | {"user_rating", "in_my_list", "watch_progress"} == set(ContentResponse.model_fields)
+        ContentResponse.model_validate(content)
+
+def test_recommendations(db):
+    engine = RecommendationEngine(db)
+    rows = wire(asyncio.run(engine.get_recommendations_for_profile(PROFILE_ID, limit=10)))
+
+    assert len(rows) == 3
+    assert [row["recommendation"]["score"] for row in rows] == sorted(
+        (row["recommendation"]["score"] for row in rows), reverse=True
+    )
+    for row in rows:
+        assert set(row) == {"recommendation", "content"}
+        # Click tracking fields are not part of the listing
+        Recommendation.model_validate(row["recommendation"])
+        assert set(row["recommendation"]) == set(Recommendation.model_fields) - {"clicked", "clicked_at"}
+        ContentResponse.model_validate(row["content"])
+        assert row["content"]["id"] == row["recommendation"]["content_id"]
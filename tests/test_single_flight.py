@@ -0,0 +1,95 @@
+import asyncio
+import pytest
+from backend.single_flight import SingleFlight, single_flight_stats
+
+def test_cancelled_leader_does_not_cancel_followers():
+    async def main():
+        flight = SingleFlight("test-cancel")
+        release = asyncio.Event()
+        runs = []
+
+        async def load():
+            runs.append(1)
+            await release.wait()
+            return "value"
+
+        leader = asyncio.create_task(flight.run("key", load))
+        await asyncio.sleep(0)
+        followers = [asyncio.create_task(flight.run("key", load)) for _ in range(3)]
+        await asyncio.sleep(0)
+
+        leader.cancel()
+        await asyncio.gather(leader, return_exceptions=True)
+        release.set()
+        results = await asyncio.gather(*followers)
+        return leader, results, runs, flight
+
+    leader, results, runs, flight = asyncio.run(main())
+    assert leader.cancelled()
+    assert results == ["value"] * 3
+    assert runs == [1]
+    assert flight.stats() == {"in_flight": 0, "calls": 4, "executions": 1, "deduplicated": 3}
+
+def test_exception_is_shared_by_every_waiter():
+    async def main():
+        flight = SingleFlight("test-error")
+        release = asyncio.Event()
+
+        async def load():
+            await release.wait()
+            raise LookupError("gone")
+
+        waiters = [asyncio.create_task(flight.run("key", load)) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+        return await asyncio.gather(*waiters, return_exceptions=True), flight
+
+    results, flight = asyncio.run(main())
+    assert [type(result) for result in results] == [LookupError] * 3
+    assert len({id(result) for result in results}) == 1
+    assert flight.executions == 1
+
+def test_key_is_freed_after_completion():
+    async def main():
+        flight = SingleFlight("test-free")
+        calls = []
+
+        async def load():
+            calls.append(1)
+            return len(calls)
+
+        first = await flight.run("key", load)
+        assert flight.stats()["in_flight"] == 0
+        second = await flight.run("key", load)
+
+        async def fail():
+            raise ValueError("boom")
+
+        with pytest.raises(ValueError):
+            await flight.run("other", fail)
+        assert flight.stats()["in_flight"] == 0
+        return first, second, flight
+
+    first, second, flight = asyncio.run(main())
+    # Nothing is cached between runs
+    assert (first, second) == (1, 2)
+    assert flight.deduplicated == 0
+
+def test_deduplicated_counts_per_key():
+    async def main():
+        flight = SingleFlight("test-counts")
+
+        async def load(value):
+            await asyncio.sleep(0.01)
+            return value
+
+        results = await asyncio.gather(
+            *(flight.run("a", lambda: load("a")) for _ in range(4)),
+            *(flight.run("b", lambda: load("b")) for _ in range(2))
+        )
+        return results, flight
+
+    results, flight = asyncio.run(main())
+    assert results == ["a"] * 4 + ["b"] * 2
+    assert flight.stats() == {"in_flight": 0, "calls": 6, "executions": 2, "deduplicated": 4}
+    assert single_flight_stats()["test-counts"] == flight.stats()
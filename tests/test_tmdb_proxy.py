@@ -0,0 +1,152 @@
+"""TMDBProxy against a local HTTP server standing in for TMDB."""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import asyncio
+import json
+import threading
+import time
+import pytest
+from fastapi import HTTPException
+from backend.tmdb_proxy import TMDBProxy
+
+class StandIn(BaseHTTPRequestHandler):
+    """Answers per API key: "limited" gets 429, "revoked" gets 401, anything else 200."""
+
+    requests = []
+    queries = []
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        api_key = query.pop("api_key")[0]
+        self.requests.append((url.path, api_key))
+        self.queries.append(query)
+        if api_key == "limited":
+            self.reply(429, {"status_message": "Request count over limit"}, {"Retry-After": "60"})
+        elif api_key == "revoked":
+            self.reply(401, {"status_message": "Invalid API key"})
+        else:
+            # Slow enough for concurrent callers to pile up on one fetch
+            time.sleep(0.2)
+            self.reply(200, {"path": url.path, "results": []})
+
+    def reply(self, status_code, body, headers=None):
+        payload = json.dumps(body).encode()
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json;charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture(scope="module")
+def tmdb_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandIn)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/3"
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture(autouse=True)
+def clear_requests():
+    StandIn.requests.clear()
+    StandIn.queries.clear()
+
+def run(keys, tmdb_url, call):
+    async def main():
+        proxy = TMDBProxy(keys=keys, base_url=tmdb_url)
+        try:
+            return await call(proxy), proxy
+        finally:
+            await proxy.close()
+
+    return asyncio.run(main())
+
+def test_concurrent_requests_share_one_fetch(tmdb_url):
+    async def call(proxy):
+        responses = await asyncio.gather(*(
+            proxy.get("movie/popular", [("page", "1"), ("api_key", f"client-{i}")]) for i in range(10)
+        ))
+        # Served from the cache afterwards
+        responses.append(await proxy.get("/movie/popular/", [("page", "1")]))
+        return responses
+
+    responses, proxy = run(["good"], tmdb_url, call)
+    assert StandIn.requests == [("/3/movie/popular", "good")]
+    assert {(r.status_code, r.media_type) for r in responses} == {(200, "application/json")}
+    assert json.loads(responses[0].body)["path"] == "/3/movie/popular"
+    assert proxy.stats()["coalesced"] == 9
+    assert proxy.stats()["upstream_requests"] == 1
+
+def test_only_accepted_parameters_are_forwarded_and_keyed(tmdb_url):
+    async def call(proxy):
+        return await asyncio.gather(
+            proxy.get("search/multi", [("query", "heat"), ("page", "2")]),
+            proxy.get("search/multi", [("page", "2"), ("query", "heat"), ("x", "cache-buster"), ("page", "3")]),
+            proxy.get("search/multi", [("query", "heat"), ("page", "2"), ("api_key", "theirs"), ("region", "")])
+        )
+
+    responses, proxy = run(["good"], tmdb_url, call)
+    assert [r.status_code for r in responses] == [200, 200, 200]
+    assert StandIn.requests == [("/3/search/multi", "good")]
+    assert StandIn.queries == [{"page": ["2"], "query": ["heat"]}]
+    assert proxy.stats()["coalesced"] == 2
+
+def test_unlisted_path_is_rejected(tmdb_url):
+    async def call(proxy):
+        with pytest.raises(HTTPException) as raised:
+            await proxy.get("account/1/favorite/movies")
+        return raised.value
+
+    error, _ = run(["good"], tmdb_url, call)
+    assert error.status_code == 404
+    assert StandIn.requests == []
+
+def test_rate_limited_key_sits_out_its_window(tmdb_url):
+    async def call(proxy):
+        return [await proxy.get(path) for path in ("movie/popular", "tv/popular", "genre/movie/list")]
+
+    responses, proxy = run(["limited", "good"], tmdb_url, call)
+    assert [r.status_code for r in responses] == [200, 200, 200]
+    assert [key for _, key in StandIn.requests] == ["limited", "good", "good", "good"]
+    assert proxy.stats()["rate_limited"] == 1
+    assert proxy.stats()["keys"]["cooling_down"] == 1
+
+def test_every_key_rate_limited_returns_503_with_retry_after(tmdb_url):
+    async def call(proxy):
+        with pytest.raises(HTTPException) as first:
+            await proxy.get("movie/popular")
+        # Parked keys are not tried again within the window
+        with pytest.raises(HTTPException) as second:
+            await proxy.get("tv/popular")
+        return first.value, second.value
+
+    (first, second), _ = run(["limited"], tmdb_url, call)
+    assert first.status_code == second.status_code == 503
+    assert 55 <= int(second.headers["Retry-After"]) <= 60
+    assert StandIn.requests == [("/3/movie/popular", "limited")]
+
+def test_rejected_key_is_retired(tmdb_url):
+    async def call(proxy):
+        return [await proxy.get(path) for path in ("movie/popular", "tv/popular", "movie/top_rated")]
+
+    responses, proxy = run(["revoked", "good"], tmdb_url, call)
+    assert [r.status_code for r in responses] == [200, 200, 200]
+    assert [key for _, key in StandIn.requests] == ["revoked", "good", "good", "good"]
+    assert proxy.stats()["keys"]["retired"] == 1
+
+def test_only_rejected_keys_returns_503(tmdb_url):
+    async def call(proxy):
+        with pytest.raises(HTTPException) as raised:
+            await proxy.get("movie/popular")
+        return raised.value
+
+    error, proxy = run(["revoked"], tmdb_url, call)
+    assert error.status_code == 503
+    assert error.detail == "No usable TMDB API key"
+    assert proxy.stats()["keys"]["retired"] == 1
@@ -0,0 +1,28 @@
+from datetime import datetime
+import asyncio
+from mongomock_motor import AsyncMongoMockClient
+from backend.cache import MemoryCacheBackend
+from backend.recommendation_engine import RecommendationEngine
+from backend.trending import TrendingView
+
+def engine_with_snapshot(content_ids, size=100):
+    db = AsyncMongoMockClient()["test"]
+    cache = MemoryCacheBackend().namespace("trending", ttl=60, maxsize=1)
+    trending = TrendingView(db, size=size, cache=cache)
+    trending._apply({"content_ids": content_ids, "scores": [1.0] * len(content_ids), "refreshed_at": datetime.utcnow()})
+    engine = RecommendationEngine(db, trending=trending)
+
+    def no_scan(*args, **kwargs):
+        raise AssertionError("trending fell back to aggregating content")
+
+    db.content.aggregate = no_scan
+    return engine
+
+def test_short_snapshot_is_served_without_aggregating():
+    engine = engine_with_snapshot(["a", "b", "c"])
+    assert asyncio.run(engine.get_trending_recommendations(20)) == ["a", "b", "c"]
+
+def test_limit_beyond_snapshot_size_is_clamped():
+    engine = engine_with_snapshot([f"c{i}" for i in range(5)], size=5)
+    assert asyncio.run(engine.get_trending_recommendations(50)) == [f"c{i}" for i in range(5)]
+    assert asyncio.run(engine.get_trending_recommendations(2)) == ["c0", "c1"]
@@ -0,0 +1,48 @@
+from datetime import datetime, timedelta
+import asyncio
+from mongomock_motor import AsyncMongoMockClient
+from pymongo import UpdateOne
+from backend.watch_buffer import progress_update
+
+KEY = {"profile_id": "profile-1", "content_id": "content-1"}
+WATCHED = datetime(2026, 1, 1, 20, 0)
+
+def entry(progress, last_watched, row_id="row-1"):
+    return {
+        **KEY,
+        "id": row_id,
+        "progress": progress,
+        "watch_time": int(progress * 60),
+        "status": "watching",
+        "last_watched": last_watched,
+        "created_at": WATCHED
+    }
+
+def flush_all(*entries):
+    """Flush each entry in turn, as separate workers would, and return the row."""
+    collection = AsyncMongoMockClient()["test"]["watch_history"]
+
+    async def run():
+        for item in entries:
+            await collection.bulk_write([UpdateOne(KEY, progress_update(item), upsert=True)], ordered=False)
+        return await collection.find_one(KEY, {"_id": 0})
+
+    return asyncio.run(run())
+
+def test_insert_sets_identity():
+    row = flush_all(entry(10.0, WATCHED))
+    assert row["id"] == "row-1"
+    assert row["created_at"] == WATCHED
+    assert row["progress"] == 10.0
+
+def test_older_heartbeat_does_not_move_progress_back():
+    row = flush_all(entry(60.0, WATCHED), entry(20.0, WATCHED - timedelta(seconds=30)))
+    assert row["progress"] == 60.0
+    assert row["watch_time"] == 3600
+    assert row["last_watched"] == WATCHED
+
+def test_newer_heartbeat_wins_and_keeps_identity():
+    row = flush_all(entry(20.0, WATCHED), entry(60.0, WATCHED + timedelta(seconds=30), row_id="row-2"))
+    assert row["progress"] == 60.0
+    assert row["last_watched"] == WATCHED + timedelta(seconds=30)
+    assert row["id"] == "row-1"